@@ -1,25 +1,43 @@
 #!/usr/bin/python3
 """ Flask Application """
 from models import storage
-from api.v1.views import app_views
+from api.v1.views import app_views, internal_views
+from api.v1.views.streaming import pretty
 from os import environ
-from flask import Flask, render_template, make_response, jsonify
+from flask import Flask, render_template, make_response, jsonify, json
 from flask_cors import CORS
 from flasgger import Swagger
 from flasgger.utils import swag_from
 
 app = Flask(__name__)
-app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+app.config['INTERNAL_VIEWS'] = environ.get('HBNB_API_INTERNAL') == '1'
 app.register_blueprint(app_views)
+app.register_blueprint(internal_views)
 cors = CORS(app, resources={r"/*": {"origins": "0.0.0.0"}})
 
 
+@app.before_request
+def sync_storage():
+    """ Apply the writes of the other workers sharing the JSON file """
+    if getattr(storage, "shared", False):
+        storage.sync()
+
+
 @app.teardown_appcontext
 def close_db(error):
     """ Close Storage """
     storage.close()
 
 
+@app.after_request
+def pretty_print(response):
+    """ Indent JSON responses when asked with ?pretty=1 """
+    if response.is_json and not response.is_streamed and pretty():
+        response.set_data(json.dumps(response.get_json(), indent=2) + "\n")
+    return response
+
+
 @app.errorhandler(404)
 def not_found(error):
     """ 404 Error
@@ -3,11 +3,15 @@
 from flask import Blueprint
 
 app_views = Blueprint("app_views", __name__, url_prefix="/api/v1")
+# statistics of the service, only served when enabled to local clients
+internal_views = Blueprint("internal_views", __name__,
+                           url_prefix="/api/v1/internal")
 
 if app_views is not None:
     from api.v1.views.amenities import *
     from api.v1.views.cities import *
     from api.v1.views.index import *
+    from api.v1.views.internal import *
     from api.v1.views.places import *
     from api.v1.views.places_reviews import *
     from api.v1.views.places_amenities import *
@@ -4,20 +4,21 @@
 from flask import abort, jsonify, make_response, request
 
 from api.v1.views import app_views
+from api.v1.views.caching import cached
+from api.v1.views.pagination import paginate
 from models import storage
 from models.amenity import Amenity
 
 
 @app_views.route("/amenities", methods=["GET"])
+@cached(Amenity)
 def get_amenities():
-    """Get all amenities"""
-    amenities = [
-            amenity.to_dict() for amenity in storage.all("Amenity").values()
-            ]
-    return jsonify(amenities), 200
+    """Get all amenities, by pages"""
+    return paginate(Amenity), 200
 
 
 @app_views.route("/amenities/<string:amenity_id>", methods=["GET"])
+@cached(Amenity)
 def get_amenity(amenity_id):
     """Get a specific amenity by its ID"""
     amenity = storage.get(Amenity, amenity_id)
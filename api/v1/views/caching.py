@@ -0,0 +1,279 @@
+#!/usr/bin/python3
+"""HTTP caching of the read endpoints
+
+A cached view declares the classes its response depends on. Its ETag is
+derived from the URL of the request, host included, and the versions
+storage bumps on every write to these classes, and its Last-Modified is
+the time of the latest of these writes, once its second is over. A
+request whose If-None-Match,
+or else whose If-Modified-Since, still matches gets a 304 response before
+the view runs, so that nothing is read from storage nor serialized.
+Versions are kept by the database, or read from the journal of a shared
+JSON file, so that every worker sees the writes of the others.
+
+The other requests are answered from a cache of the bodies the view
+returned, keyed by their ETag so that a write, by any worker, makes every
+body depending on the class written unreachable. The bodies of a class
+are also dropped as soon as this worker writes to it, and the least
+recently used ones once the cache outgrows HBNB_API_CACHE_BYTES.
+
+Conditional requests are counted, with the size of the bodies the 304
+responses did not send, and so is the cache of bodies, for
+/internal/cache.
+"""
+
+import collections
+from datetime import datetime
+from functools import partial, wraps
+import hashlib
+from os import getenv
+import threading
+
+from flask import current_app, make_response, request
+
+from models import storage
+from models.engine.versions import Versions
+
+# Cache-Control of the cached views not given theirs
+CACHE_CONTROL = getenv("HBNB_API_CACHE_CONTROL", "no-cache")
+# number of ETags whose body size is remembered
+SIZES = 10000
+# size in bytes of the bodies the response cache keeps, 0 to disable it
+CACHE_BYTES = int(getenv("HBNB_API_CACHE_BYTES", str(16 * 2 ** 20)))
+
+
+class _Stats:
+    """counts of the requests to the cached views"""
+
+    def __init__(self):
+        """Instantiate empty counts"""
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        # ordered dictionary - ETag -> size of the last body sent with it
+        self.sizes = collections.OrderedDict()
+
+    def sent(self, etag, size):
+        """counts a body of size bytes sent with etag"""
+        with self.lock:
+            self.bytes_sent += size
+            self.sizes[etag] = size
+            self.sizes.move_to_end(etag)
+            if len(self.sizes) > SIZES:
+                self.sizes.popitem(last=False)
+
+    def to_dict(self):
+        """returns the counts, with the rate of 304 responses"""
+        with self.lock:
+            return {"requests": self.requests, "hits": self.hits,
+                    "misses": self.requests - self.hits,
+                    "hit_rate": self.hits / self.requests
+                    if self.requests else 0.0,
+                    "bytes_sent": self.bytes_sent,
+                    "bytes_saved": self.bytes_saved}
+
+
+stats = _Stats()
+
+
+class _Responses:
+    """least recently used cache of the 200 responses of the cached views,
+    by ETag"""
+
+    def __init__(self, limit):
+        """Instantiate an empty cache of limit bytes of bodies"""
+        self.lock = threading.Lock()
+        # integer - size in bytes the bodies may not exceed
+        self.limit = limit
+        # integer - size in bytes of the bodies kept
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # ordered dictionary - ETag -> (body, headers, whether the view
+        # streamed it, class names), the least recently used first
+        self.__entries = collections.OrderedDict()
+        # dictionary - <class name> -> set of the ETags of its bodies
+        self.__etags = collections.defaultdict(set)
+
+    def get(self, etag):
+        """returns the response kept for etag, or None"""
+        with self.lock:
+            entry = self.__entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__entries.move_to_end(etag)
+        body, headers, streamed, _ = entry
+        # a streamed body stays streamed, as the view returned it
+        return current_app.response_class(
+            iter([body]) if streamed else body, headers=headers)
+
+    def put(self, etag, names, body, headers, streamed):
+        """keeps the body and headers of the response for etag, which
+        depends on the objects of the class names"""
+        if len(body) > self.limit:
+            return
+        headers = [(name, value) for name, value in headers
+                   if name.lower() != "content-length"]
+        with self.lock:
+            if etag in self.__entries:
+                return
+            self.__entries[etag] = (body, headers, streamed, names)
+            self.size += len(body)
+            for name in names:
+                self.__etags[name].add(etag)
+            while self.size > self.limit:
+                self.__drop(next(iter(self.__entries)))
+                self.evictions += 1
+
+    def invalidate(self, names):
+        """drops the bodies depending on the objects of the class names"""
+        with self.lock:
+            for name in names:
+                etags = self.__etags.pop(name, ())
+                for etag in etags:
+                    if etag in self.__entries:
+                        self.__drop(etag)
+                        self.invalidations += 1
+
+    def clear(self):
+        """drops every body"""
+        with self.lock:
+            self.__entries.clear()
+            self.__etags.clear()
+            self.size = 0
+
+    def __drop(self, etag):
+        """drops the body of etag, the lock being held"""
+        body, _, _, names = self.__entries.pop(etag)
+        self.size -= len(body)
+        for name in names:
+            etags = self.__etags.get(name)
+            if etags is not None:
+                etags.discard(etag)
+                if not etags:
+                    del self.__etags[name]
+
+    def to_dict(self):
+        """returns the counts of the cache"""
+        with self.lock:
+            return {"entries": len(self.__entries), "bytes": self.size,
+                    "limit": self.limit, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions,
+                    "invalidations": self.invalidations}
+
+
+responses = _Responses(CACHE_BYTES)
+Versions.listeners.append(responses.invalidate)
+
+
+def validators(classes):
+    """returns the ETag and Last-Modified of the response to the request,
+    depending on the objects of classes, Last-Modified being None while
+    the second of the last write is not over"""
+    versions = storage.versions(classes)
+    # the host too, as the links of the responses are absolute URLs
+    digest = hashlib.sha1((request.host_url + request.full_path).encode())
+    for epoch, number, _ in versions:
+        digest.update("{}:{};".format(epoch, number).encode())
+    # HTTP dates have no fraction of a second, so that a write later in
+    # the second of the last one would not change it
+    last_modified = max(last for _, _, last in versions).replace(
+        microsecond=0)
+    if last_modified >= datetime.utcnow().replace(microsecond=0):
+        last_modified = None
+    return digest.hexdigest(), last_modified
+
+
+def not_modified(etag, last_modified):
+    """tells whether the request already holds the current response"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    return last_modified is not None and \
+        request.if_modified_since is not None and \
+        last_modified <= request.if_modified_since.replace(tzinfo=None)
+
+
+def counted(chunks, etag, keep=None):
+    """yields chunks, then counts their size as the body sent with etag
+
+    keep: called with the whole body once sent, if it fits the response
+    cache
+    """
+    size = 0
+    body = []
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            size += len(chunk)
+            if keep is not None and size <= responses.limit:
+                body.append(chunk)
+            yield chunk
+        stats.sent(etag, size)
+        if keep is not None and size <= responses.limit:
+            keep(b"".join(body))
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def cached(*classes, cache_control=None):
+    """decorates a GET view whose response only depends on the objects of
+    classes, to answer conditional requests with 304 responses and the
+    others from the response cache
+
+    cache_control: Cache-Control header of the responses, CACHE_CONTROL
+    if None
+    """
+    names = frozenset(cls.__name__ for cls in classes)
+
+    def decorator(view):
+        """returns the view answering conditional requests"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            """answers with a 304 response, or the response of the view"""
+            # read before the view, so that a write while it runs changes
+            # the ETag of the next request
+            etag, last_modified = validators(classes)
+            hit = not_modified(etag, last_modified)
+            with stats.lock:
+                stats.requests += 1
+                if hit:
+                    stats.hits += 1
+                    stats.bytes_saved += stats.sizes.get(etag, 0)
+            if hit:
+                response = make_response("", 304)
+            else:
+                response = responses.get(etag) if responses.limit else None
+                keep = None
+                if response is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if responses.limit:
+                        keep = partial(responses.put, etag, names,
+                                       headers=list(response.headers),
+                                       streamed=response.is_streamed)
+                if response.is_streamed:
+                    response.response = counted(response.response, etag,
+                                                keep)
+                else:
+                    if keep is not None:
+                        keep(response.get_data())
+                    # once sent, as after_request hooks may change it
+                    response.call_on_close(lambda: stats.sent(
+                        etag, response.calculate_content_length()))
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = cache_control or \
+                CACHE_CONTROL
+            return response
+        return wrapper
+    return decorator
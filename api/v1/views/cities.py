@@ -4,22 +4,24 @@
 from flask import abort, jsonify, make_response, request
 
 from api.v1.views import app_views
+from api.v1.views.caching import cached
+from api.v1.views.pagination import paginate
 from models import storage
 from models.state import State
 from models.city import City
 
 
 @app_views.route("/states/<string:state_id>/cities", methods=["GET"])
+@cached(State, City)
 def get_cities(state_id):
-    """Get all cities of a state"""
-    state = storage.get(State, state_id)
-    if state is None:
+    """Get all cities of a state, by pages"""
+    if storage.get(State, state_id) is None:
         abort(404)
-    cities = [city.to_dict() for city in state.cities]
-    return jsonify(cities), 200
+    return paginate(City, state_id=state_id), 200
 
 
 @app_views.route("/cities/<string:city_id>", methods=["GET"])
+@cached(City)
 def get_city(city_id):
     """Get a specific city by its ID"""
     city = storage.get(City, city_id)
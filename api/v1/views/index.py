@@ -3,6 +3,7 @@
 from flask import jsonify
 
 from api.v1.views import app_views
+from api.v1.views.caching import cached
 from models import storage
 from models.amenity import Amenity
 from models.city import City
@@ -29,7 +30,10 @@ def status():
 
 
 @app_views.route("/stats", methods=["GET"])
+@cached(*MODEL_CLASSES.values())
 def get_storage_stats():
     """Returns the count of all instances of each class in storage."""
-    stats = {key: storage.count(value) for key, value in MODEL_CLASSES.items()}
+    counts = storage.counts()
+    stats = {key: counts[value.__name__]
+             for key, value in MODEL_CLASSES.items()}
     return jsonify(stats)
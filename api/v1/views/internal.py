@@ -0,0 +1,38 @@
+#!/usr/bin/python3
+"""Internal statistics endpoints
+
+They are only served when the app is configured with INTERNAL_VIEWS, set
+by HBNB_API_INTERNAL=1, and to clients on the same host; any other
+request gets a 404 as for a missing route.
+"""
+from flask import abort, current_app, jsonify, request
+
+from api.v1.views import internal_views
+from api.v1.views.caching import responses, stats
+from models import storage
+
+# addresses of the clients allowed to the internal endpoints
+LOCAL = ("127.0.0.1", "::1")
+
+
+@internal_views.before_request
+def restrict():
+    """Hides the internal endpoints unless enabled, to local clients"""
+    if not current_app.config.get("INTERNAL_VIEWS") or \
+            request.remote_addr not in LOCAL:
+        abort(404)
+
+
+@internal_views.route("/pool", methods=["GET"])
+def get_pool_stats():
+    """Returns the statistics of the database connection pool"""
+    if not hasattr(storage, "pool_stats"):
+        abort(404)
+    return jsonify(storage.pool_stats())
+
+
+@internal_views.route("/cache", methods=["GET"])
+def get_cache_stats():
+    """Returns the statistics of the conditional requests of the cached
+    routes, and of their response cache"""
+    return jsonify(dict(stats.to_dict(), responses=responses.to_dict()))
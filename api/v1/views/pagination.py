@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""Pagination of the list endpoints
+
+Lists are returned by pages of objects ordered by (created_at, id). The
+page size is the limit query parameter, and the page after the current
+one is fetched by passing the cursor of the X-Next-Cursor header, or by
+following the rel="next" link of the Link header. The last page has
+neither header.
+"""
+
+import base64
+from datetime import datetime
+import json
+from os import getenv
+
+from flask import abort, request, url_for
+
+from api.v1.views.streaming import stream_json
+
+from models import storage
+from models.base_model import time
+
+# number of objects of a page when no limit is given
+PAGE_SIZE = int(getenv("HBNB_API_PAGE_SIZE", "100"))
+# largest limit accepted
+MAX_PAGE_SIZE = int(getenv("HBNB_API_MAX_PAGE_SIZE", "1000"))
+
+
+def encode_cursor(after):
+    """returns the cursor of the (created_at, id) a page starts after,
+    without padding so that it needs no quoting in a URL"""
+    return base64.urlsafe_b64encode(
+        json.dumps(after).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """returns the (created_at, id) of a cursor, aborting if invalid"""
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(
+            cursor + "=" * (-len(cursor) % 4)))
+        datetime.strptime(created_at, time)
+        return created_at, str(id)
+    except (TypeError, ValueError):
+        abort(400, "Invalid cursor")
+
+
+def page_args():
+    """returns the limit and the (created_at, id) the page starts after
+    given in the query string, aborting if invalid"""
+    try:
+        limit = int(request.args.get("limit", PAGE_SIZE))
+    except ValueError:
+        abort(400, "Invalid limit")
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        abort(400, "Invalid limit")
+    cursor = request.args.get("cursor")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def sort_key(obj):
+    """returns the (created_at, id) pages are ordered by"""
+    return obj.created_at.strftime(time), obj.id
+
+
+def paginate(cls, objs=None, **filters):
+    """returns the streamed response of a page of the objects of cls
+    matching filters, or of the list objs already loaded"""
+    limit, after = page_args()
+    if objs is None:
+        objs, last = storage.page(cls, limit, after, **filters)
+    else:
+        objs = sorted((obj for obj in objs
+                       if after is None or sort_key(obj) > after),
+                      key=sort_key)
+        last = sort_key(objs[limit - 1]) if len(objs) > limit else None
+        objs = objs[:limit]
+    response = stream_json(obj.to_dict() for obj in objs)
+    if last is not None:
+        cursor = encode_cursor(last)
+        args = dict(request.args.to_dict(), limit=limit, cursor=cursor,
+                    **request.view_args)
+        response.headers["Link"] = '<{}>; rel="next"'.format(
+            url_for(request.endpoint, _external=True, **args))
+        response.headers["X-Next-Cursor"] = cursor
+    return response
@@ -6,25 +6,33 @@ import logging
 from flask import abort, jsonify, make_response, request
 
 from api.v1.views import app_views
+from api.v1.views.caching import cached
+from api.v1.views.pagination import paginate
+from api.v1.views.streaming import stream_json
 from models import storage
 from models.amenity import Amenity
 from models.city import City
+from models.engine.search import is_number
 from models.place import Place
-from models.state import State
 from models.user import User
 
+# numeric attributes places can be searched by range of and ordered by
+RANGES = ("number_rooms", "number_bathrooms", "max_guest", "price_by_night")
+# sides of the boxes places can be searched in
+BOX = ("south", "west", "north", "east")
+
 
 @app_views.route("/cities/<string:city_id>/places", methods=["GET"])
+@cached(City, Place)
 def get_places(city_id):
-    """Get all places of a city"""
-    city = storage.get(City, city_id)
-    if city is None:
+    """Get all places of a city, by pages"""
+    if storage.get(City, city_id) is None:
         abort(404)
-    places = [place.to_dict() for place in city.places]
-    return jsonify(places), 200
+    return paginate(Place, city_id=city_id), 200
 
 
 @app_views.route("/places/<string:place_id>", methods=["GET"])
+@cached(Place)
 def get_place(place_id):
     """Get a specific place by its ID"""
     place = storage.get(Place, place_id)
@@ -96,45 +104,92 @@ def search_places():
         abort(400, "Not a JSON")
 
     data = request.get_json()
-    states = data.get("states", [])
-    cities = data.get("cities", [])
-    amenity_ids = data.get("amenities", [])
-
-    # Initialize a set to store the ids of the cities to be searched
-    city_ids = set()
-
-    if states:
-        for state_id in states:
-            state = storage.get(State, state_id)
-            if state:
-                city_ids.update(city.id for city in state.cities)
-
-    if cities:
-        city_ids.update(cities)
-
-    if not city_ids:
-        places = storage.all(Place).values()
-    else:
-        places = [
-            place for place in storage.all(Place).values()
-            if place.city_id in city_ids
-        ]
-
-    # If amenities are provided, further filter the places based on amenities
-    if amenity_ids:
-        places = [
-            place
-            for place in places
-            if all(
-                amenity_id in (a.id for a in place.amenities)
-                for amenity_id in amenity_ids
-            )
-        ]
-
-    result = []
-    for place in places:
+    if not isinstance(data, dict):
+        abort(400, "Not a JSON")
+
+    # The places are in the cities of states and in cities, and have all
+    # amenities, given as lists of ids
+    for ids in ("states", "cities", "amenities"):
+        if not isinstance(data.get(ids, []), list) or \
+                not all(isinstance(id, str) for id in data.get(ids, [])):
+            abort(400, "Invalid " + ids)
+
+    # Ranges are given as {"min": number, "max": number}, both optional
+    ranges = {}
+    for attr in RANGES:
+        if attr in data:
+            bounds = data[attr]
+            if not isinstance(bounds, dict) or \
+                    not set(bounds) <= {"min", "max"} or \
+                    not all(is_number(v) for v in bounds.values()):
+                abort(400, "Invalid " + attr)
+            ranges[attr] = (bounds.get("min"), bounds.get("max"))
+
+    order_by = data.get("order_by")
+    # "-" before the attribute orders by decreasing values
+    if order_by is not None and order_by not in RANGES and \
+            order_by not in ["-" + attr for attr in RANGES]:
+        abort(400, "Invalid order_by")
+    limit = data.get("limit")
+    if limit is not None and (isinstance(limit, bool) or
+                              not isinstance(limit, int) or limit < 1):
+        abort(400, "Invalid limit")
+
+    # The box is given as {"south", "west", "north", "east"} in degrees,
+    # crossing the antimeridian if west > east
+    bbox = data.get("bbox")
+    if bbox is not None:
+        if not isinstance(bbox, dict) or set(bbox) != set(BOX) or \
+                not all(is_number(v) for v in bbox.values()) or \
+                not -90 <= bbox["south"] <= bbox["north"] <= 90 or \
+                not all(-180 <= bbox[side] <= 180
+                        for side in ("west", "east")):
+            abort(400, "Invalid bbox")
+        bbox = tuple(bbox[side] for side in BOX)
+
+    # The point is given as {"latitude", "longitude", "radius"}, the
+    # radius in km being optional; places are then ordered by distance
+    near = data.get("near")
+    if near is not None:
+        if not isinstance(near, dict) or \
+                not {"latitude", "longitude"} <= set(near) <= \
+                {"latitude", "longitude", "radius"} or \
+                not all(is_number(v) for v in near.values()) or \
+                not -90 <= near["latitude"] <= 90 or \
+                not -180 <= near["longitude"] <= 180 or \
+                near.get("radius", 1) <= 0:
+            abort(400, "Invalid near")
+        if order_by is not None:
+            abort(400, "order_by and near are exclusive")
+        near = (near["latitude"], near["longitude"], near.get("radius"))
+
+    # Words the descriptions must all hold, ranking the places by relevance
+    # unless they are ordered otherwise
+    text = data.get("text")
+    if text is not None and not isinstance(text, str):
+        abort(400, "Invalid text")
+
+    # The places found, whatever the limit, are then counted by state, city
+    # and amenity, and sent as {"facets": {...}, "places": [...]}
+    facets = data.get("facets", False)
+    if not isinstance(facets, bool):
+        abort(400, "Invalid facets")
+
+    search = (data.get("states", []), data.get("cities", []),
+              data.get("amenities", []), ranges)
+    counts = storage.place_facets(*search, bbox=bbox, near=near,
+                                  text=text) if facets else None
+    # places are read by batches while the response is sent
+    places = storage.search_places(*search, order_by=order_by, limit=limit,
+                                   bbox=bbox, near=near, text=text)
+
+    def to_dict(place):
+        """returns the dictionary of a place without its amenities"""
         _dict = place.to_dict()
         _dict.pop('amenities', None)
-        result.append(_dict)
+        return _dict
 
-    return jsonify(result), 200
+    places = (to_dict(place) for place in places)
+    if facets:
+        return stream_json(places, "places", {"facets": counts}), 200
+    return stream_json(places), 200
@@ -6,30 +6,30 @@ from os import environ
 from flask import abort, jsonify
 
 from api.v1.views import app_views
+from api.v1.views.caching import cached
+from api.v1.views.pagination import paginate
 from models import storage
 from models.amenity import Amenity
 from models.place import Place
 
 
 @app_views.route("/places/<place_id>/amenities", methods=["GET"])
+@cached(Place, Amenity)
 def get_place_amenities(place_id):
     """
     Retrieves the list of all Amenity objects of a Place
     """
-    place = storage.get(Place, place_id)
+    place = storage.get(Place, place_id, load={"amenities": "joined"})
 
     if not place:
         abort(404)
 
     if environ.get("HBNB_TYPE_STORAGE") == "db":
-        amenities = [amenity.to_dict() for amenity in place.amenities]
+        amenities = place.amenities
     else:
-        amenities = [
-            storage.get(Amenity, amenity_id).to_dict()
-            for amenity_id in place.amenity_ids
-        ]
+        amenities = storage.get_many(Amenity, place.amenity_ids)
 
-    return jsonify(amenities)
+    return paginate(Amenity, amenities)
 
 
 @app_views.route(
@@ -52,9 +52,11 @@ def delete_place_amenity(place_id, amenity_id):
     else:
         if amenity_id not in place.amenity_ids:
             abort(404)
-        place.amenity_ids.remove(amenity_id)
+        place.amenity_ids = [
+            linked for linked in place.amenity_ids if linked != amenity_id
+        ]
 
-    storage.save()
+    place.save()
     return jsonify({}), 200
 
 
@@ -76,7 +78,7 @@ def post_place_amenity(place_id, amenity_id):
     else:
         if amenity_id in place.amenity_ids:
             return jsonify(amenity.to_dict()), 200
-        place.amenity_ids.append(amenity_id)
+        place.amenity_ids = place.amenity_ids + [amenity_id]
 
-    storage.save()
+    place.save()
     return jsonify(amenity.to_dict()), 201
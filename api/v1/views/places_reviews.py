@@ -1,9 +1,12 @@
-i#!/usr/bin/python3
+#!/usr/bin/python3
 """Place_Reviews Endpoints"""
 
 from flask import abort, jsonify, make_response, request
 
 from api.v1.views import app_views
+from api.v1.views.caching import cached
+from api.v1.views.pagination import paginate
+from api.v1.views.streaming import stream_json
 from models import storage
 from models.review import Review
 from models.place import Place
@@ -11,18 +14,16 @@ from models.user import User
 
 
 @app_views.route("/places/<place_id>/reviews", methods=["GET"])
+@cached(Place, Review)
 def get_review_place(place_id):
-    """Get a specific place by its ID"""
-    place = storage.get(Place, place_id)
-    if place is None:
+    """Get the reviews of a place, by pages"""
+    if storage.get(Place, place_id) is None:
         abort(404)
-    reviews = [
-        review.to_dict() for review in place.reviews
-    ]
-    return jsonify(reviews), 200
+    return paginate(Review, place_id=place_id), 200
 
 
 @app_views.route("/reviews/<review_id>", methods=["GET"])
+@cached(Review)
 def get_review_id(review_id):
     """Get a specific review by its ID"""
     review = storage.get(Review, review_id)
@@ -88,3 +89,27 @@ def update_review(review_id):
             setattr(review, key, value)
     review.save()
     return jsonify(review.to_dict()), 200
+
+
+@app_views.route("/reviews_search", methods=["POST"])
+def search_reviews():
+    """Search for reviews holding all the words of a text, by relevance"""
+    if request.content_type != "application/json":
+        abort(400, "Not a JSON")
+    data = request.get_json()
+    if not isinstance(data, dict):
+        abort(400, "Not a JSON")
+    text = data.get("text")
+    if not isinstance(text, str):
+        abort(400, "Missing text")
+    for ids in ("places", "users"):
+        if not isinstance(data.get(ids, []), list) or \
+                not all(isinstance(id, str) for id in data.get(ids, [])):
+            abort(400, "Invalid " + ids)
+    limit = data.get("limit")
+    if limit is not None and (isinstance(limit, bool) or
+                              not isinstance(limit, int) or limit < 1):
+        abort(400, "Invalid limit")
+    reviews = storage.search_reviews(text, data.get("places", []),
+                                     data.get("users", []), limit)
+    return stream_json(review.to_dict() for review in reviews), 200
@@ -4,18 +4,21 @@
 from flask import abort, jsonify, make_response, request
 
 from api.v1.views import app_views
+from api.v1.views.caching import cached
+from api.v1.views.pagination import paginate
 from models import storage
 from models.state import State
 
 
 @app_views.route("/states", methods=["GET"])
+@cached(State)
 def get_states():
-    """Get all states"""
-    states = [state.to_dict() for state in storage.all("State").values()]
-    return jsonify(states), 200
+    """Get all states, by pages"""
+    return paginate(State), 200
 
 
 @app_views.route("/states/<string:state_id>", methods=["GET"])
+@cached(State)
 def get_state(state_id):
     """Get a specific state by its ID"""
     state = storage.get(State, state_id)
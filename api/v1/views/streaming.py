@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+"""Streaming of JSON arrays
+
+Collections are sent as a JSON array written while the objects are read
+from storage, so that neither the list of their dictionaries nor the
+whole document is built in memory. The array may be the last member of
+an object whose other members are sent first. The output is compact,
+unless the request asks for an indented one with the pretty query
+parameter.
+"""
+
+from flask import Response, current_app, request, stream_with_context
+
+# number of characters gathered before they are sent
+CHUNK_SIZE = 8192
+
+
+def pretty():
+    """tells whether the request asks for indented JSON"""
+    return request.args.get("pretty", "0").lower() not in ("", "0", "false")
+
+
+def stream_json(values, key=None, fields=None):
+    """returns a response streaming the JSON array of values, an iterable
+    of dictionaries only read as the array is sent, or an object of the
+    members of fields then of this array as member key if key is given"""
+    indent = 2 if pretty() else None
+    # one encoder configured like jsonify() for every value
+    encoder = current_app.json_encoder(
+        ensure_ascii=current_app.config["JSON_AS_ASCII"],
+        sort_keys=current_app.config["JSON_SORT_KEYS"], indent=indent,
+        separators=(",", ": ") if indent else (",", ":"))
+
+    # members and values indented once more within an object
+    margin = "\n  " if key is not None else "\n"
+    colon = ": " if indent else ":"
+
+    def member(name):
+        """returns the start of the member name of the object"""
+        return (margin if indent else "") + encoder.encode(name) + colon
+
+    def generate():
+        """yields the JSON array of values by chunks"""
+        chunk = []
+        if key is not None:
+            chunk.append("{")
+            for name, value in (fields or {}).items():
+                text = encoder.encode(value)
+                if indent:
+                    text = text.replace("\n", margin)
+                chunk.append(member(name) + text + ",")
+            chunk.append(member(key))
+        chunk.append("[")
+        size = 0
+        sep = ""
+        for value in values:
+            text = encoder.encode(value)
+            if indent:
+                text = margin + "  " + text.replace("\n", margin + "  ")
+            chunk.append(sep + text)
+            sep = ","
+            size += len(text)
+            if size >= CHUNK_SIZE:
+                yield "".join(chunk)
+                chunk = []
+                size = 0
+        if indent and sep:
+            chunk.append(margin)
+        chunk.append("]")
+        if key is not None:
+            chunk.append("\n}" if indent else "}")
+        chunk.append("\n")
+        yield "".join(chunk)
+
+    # the request context, and so the storage session, stays open until
+    # the last chunk is sent
+    return Response(stream_with_context(generate()),
+                    mimetype=current_app.config["JSONIFY_MIMETYPE"])
@@ -4,20 +4,21 @@
 from flask import abort, jsonify, make_response, request
 
 from api.v1.views import app_views
+from api.v1.views.caching import cached
+from api.v1.views.pagination import paginate
 from models import storage
 from models.user import User
 
 
 @app_views.route("/users", methods=["GET"])
+@cached(User)
 def get_users():
-    """Get all Users"""
-    users = [
-        user.to_dict() for user in storage.all("User").values()
-    ]
-    return jsonify(users), 200
+    """Get all Users, by pages"""
+    return paginate(User), 200
 
 
 @app_views.route("/users/<string:user_id>", methods=["GET"])
+@cached(User)
 def get_user(user_id):
     """Get a specific user by its ID"""
     user = storage.get(User, user_id)
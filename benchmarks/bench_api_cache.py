@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""
+Benchmarks the throughput of the cached read endpoints with and without
+the response cache, and with conditional requests answered by 304
+
+Usage: python3 -m benchmarks.bench_api_cache [amenities]
+"""
+
+import sys
+import time
+from api.v1.app import app
+from api.v1.views import caching
+from models import storage
+from models.amenity import Amenity
+from models.engine.file_storage import FileStorage
+
+AMENITIES = 1000
+# seconds each endpoint is requested for
+DURATION = 2.0
+
+
+def populate(amenities):
+    """fills storage with amenities"""
+    FileStorage._FileStorage__objects = {}
+    for i in range(amenities):
+        storage.new(Amenity(name="amenity {}".format(i)))
+
+
+def throughput(client, url, headers=None):
+    """returns the number of requests of url answered per second"""
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        client.get(url, headers=headers).get_data()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main(amenities):
+    """runs the benchmark for each endpoint"""
+    saved = FileStorage._FileStorage__objects
+    limit = caching.responses.limit
+    try:
+        populate(amenities)
+        client = app.test_client()
+        urls = ["/api/v1/amenities", "/api/v1/amenities?limit=1000",
+                "/api/v1/amenities/" + next(iter(
+                    storage.all(Amenity).values())).id,
+                "/api/v1/stats"]
+        print("{} amenities".format(amenities))
+        print("{:>40} {:>10} {:>10} {:>10}".format(
+            "GET", "no cache", "cache", "304"))
+        for url in urls:
+            caching.responses.limit = 0
+            uncached = throughput(client, url)
+            expected = client.get(url).get_data()
+            caching.responses.limit = limit
+            assert client.get(url).get_data() == expected, url
+            rate = throughput(client, url)
+            etag = client.get(url).headers["ETag"]
+            revalidated = throughput(client, url, {"If-None-Match": etag})
+            print("{:>40} {:>8.0f}/s {:>8.0f}/s {:>8.0f}/s".format(
+                url[:40], uncached, rate, revalidated))
+        print(caching.responses.to_dict())
+    finally:
+        caching.responses.limit = limit
+        caching.responses.clear()
+        FileStorage._FileStorage__objects = saved
+
+
+if __name__ == "__main__":
+    main(*([int(arg) for arg in sys.argv[1:2]] or [AMENITIES]))
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+"""
+Benchmarks the FileStorage snapshot codecs: save time, load time with
+objects built eagerly or lazily, and size
+
+Usage: python3 -m benchmarks.bench_codec [size ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+from models.engine.codec import codecs
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+SIZES = (10000, 100000)
+
+
+def timed(func):
+    """returns the time taken by func(), in seconds"""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    """runs the benchmark for every dataset size in sizes"""
+    print("{:>9} {:>9} {:>10} {:>10} {:>10} {:>10}".format(
+        "objects", "codec", "save (s)", "load (s)", "lazy (s)", "size (MB)"))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "file.json")
+        for size in sizes:
+            places = [Place(name="Place {}".format(i), city_id="c",
+                            user_id="u",
+                            description="Nice place {} ".format(i) * 8,
+                            number_rooms=i % 5, price_by_night=i % 300,
+                            latitude=37.77, longitude=-122.41)
+                      for i in range(size)]
+            for name, codec in codecs.items():
+                with mock.patch.object(
+                        FileStorage, "_FileStorage__file_path", path), \
+                        mock.patch.object(
+                            FileStorage, "_FileStorage__objects", {}), \
+                        mock.patch.object(FileStorage, "codec", codec), \
+                        mock.patch.object(FileStorage, "fsync", "never"):
+                    storage = FileStorage()
+                    for place in places:
+                        storage.new(place)
+                    save = timed(storage.compact)
+                    FileStorage._FileStorage__objects = {}
+                    load = timed(storage.reload)
+                    FileStorage._FileStorage__objects = {}
+                    with mock.patch.object(FileStorage, "lazy", True):
+                        lazy = timed(storage.reload)
+                    print("{:>9} {:>9} {:>10.3f} {:>10.3f} {:>10.3f} "
+                          "{:>10.2f}".format(size, name, save, load, lazy,
+                                             os.path.getsize(path) / 1e6))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
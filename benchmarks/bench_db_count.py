@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+"""
+Benchmarks DBStorage.count(), DBStorage.counts() and GET /api/v1/stats as
+tables grow, against counting the objects loaded by all() as count() used
+to
+
+Needs a MySQL database: run with HBNB_TYPE_STORAGE=db and the HBNB_MYSQL_*
+variables set. The Amenity rows inserted are deleted at the end.
+
+Usage: python3 -m benchmarks.bench_db_count [size ...]
+"""
+
+from datetime import datetime
+import sys
+import timeit
+import uuid
+from api.v1.app import app
+from models import storage
+from models.amenity import Amenity
+from models.engine.db_storage import classes
+
+SIZES = (1000, 10000, 100000)
+# name of the Amenity rows inserted by the benchmark
+NAME = "bench_db_count"
+
+
+def measure(stmt, number=5):
+    """returns the mean time of one call of stmt, in milliseconds"""
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e3
+
+
+def loaded_count():
+    """counts all the objects the way count() used to"""
+    return sum(len(storage.all(cls)) for cls in classes.values())
+
+
+def main(sizes):
+    """runs the benchmark for every dataset size in sizes"""
+    session = storage._DBStorage__session
+    client = app.test_client()
+    print("{:>9} {:>13} {:>13} {:>13} {:>12}".format(
+        "amenities", "loaded (ms)", "count (ms)", "counts (ms)",
+        "stats (ms)"))
+    inserted = 0
+    try:
+        for size in sizes:
+            now = datetime.utcnow()
+            session.execute(Amenity.__table__.insert(), [
+                {"id": str(uuid.uuid4()), "name": NAME,
+                 "created_at": now, "updated_at": now}
+                for _ in range(size - inserted)])
+            session.commit()
+            inserted = size
+            print("{:>9} {:>13.2f} {:>13.2f} {:>13.4f} {:>12.2f}".format(
+                size, measure(loaded_count), measure(storage.count),
+                measure(storage.counts),
+                measure(lambda: client.get("/api/v1/stats"))))
+            session.expunge_all()
+    finally:
+        session.query(Amenity).filter(Amenity.name == NAME).delete()
+        session.commit()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
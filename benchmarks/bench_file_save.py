@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""
+Benchmarks the latency of saving one change to FileStorage for each
+persistence mode and fsync policy
+
+Usage: python3 -m benchmarks.bench_file_save [size ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+from models.engine.file_storage import FileStorage
+from models.review import Review
+
+SIZES = (1000, 10000, 100000)
+# (name, journal, write_behind) of each persistence mode
+MODES = (("snapshot", False, False), ("journal", True, False),
+         ("behind", False, True))
+POLICIES = ("never", "batched", "always")
+# number of single-object saves timed for each combination
+SAVES = 20
+
+
+def measure(storage):
+    """returns the mean time of new() + save() of one Review, in ms"""
+    start = time.perf_counter()
+    for i in range(SAVES):
+        storage.new(Review(text="review " + str(i)))
+        storage.save()
+    return (time.perf_counter() - start) / SAVES * 1e3
+
+
+def main(sizes):
+    """runs the benchmark for every dataset size in sizes"""
+    print("{:>9} {:>9} {:>8} {:>14}".format(
+        "objects", "mode", "fsync", "save (ms)"))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "file.json")
+        for size in sizes:
+            for mode, journal, write_behind in MODES:
+                for policy in POLICIES:
+                    with mock.patch.object(
+                            FileStorage, "_FileStorage__file_path", path), \
+                            mock.patch.object(
+                                FileStorage, "_FileStorage__objects", {}), \
+                            mock.patch.object(FileStorage, "journal",
+                                              journal), \
+                            mock.patch.object(FileStorage, "journal_limit",
+                                              SAVES + 1), \
+                            mock.patch.object(FileStorage, "write_behind",
+                                              write_behind), \
+                            mock.patch.object(FileStorage, "fsync", policy):
+                        storage = FileStorage()
+                        for i in range(size):
+                            storage.new(Review(text="review " + str(i)))
+                        storage.compact()
+                        print("{:>9} {:>9} {:>8} {:>14.3f}".format(
+                            size, mode, policy, measure(storage)))
+                        storage.flush()
+                        storage.compact()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+"""
+Benchmarks FileStorage saves by layout: time to save one new Amenity in a
+store of Place objects, as a single JSON file and as shard files, and time
+to reload the store
+
+Usage: python3 -m benchmarks.bench_file_shards [size ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+from models.amenity import Amenity
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+SIZES = (10000, 100000)
+LAYOUTS = (0, 1, 8)
+SAVES = 5
+
+
+def main(sizes):
+    """runs the benchmark for every dataset size in sizes"""
+    print("{:>9} {:>7} {:>10} {:>11}".format(
+        "objects", "shards", "save (ms)", "reload (s)"))
+    for size in sizes:
+        places = [Place(name="Place {}".format(i), city_id="c", user_id="u",
+                        description="Nice place " * 8)
+                  for i in range(size)]
+        for shards in LAYOUTS:
+            with tempfile.TemporaryDirectory() as tmp, \
+                    mock.patch.object(
+                        FileStorage, "_FileStorage__file_path",
+                        os.path.join(tmp, "file.json")), \
+                    mock.patch.object(
+                        FileStorage, "_FileStorage__objects", {}), \
+                    mock.patch.object(FileStorage, "journal", False), \
+                    mock.patch.object(FileStorage, "fsync", "never"), \
+                    mock.patch.object(FileStorage, "shards", shards):
+                storage = FileStorage()
+                for place in places:
+                    storage.new(place)
+                storage.save()
+                start = time.perf_counter()
+                for i in range(SAVES):
+                    storage.new(Amenity(name="Amenity {}".format(i)))
+                    storage.save()
+                save = (time.perf_counter() - start) / SAVES * 1e3
+                FileStorage._FileStorage__objects = {}
+                start = time.perf_counter()
+                storage.reload()
+                reload = time.perf_counter() - start
+                FileStorage._FileStorage__stale = set()
+                print("{:>9} {:>7} {:>10.2f} {:>11.3f}".format(
+                    size, shards, save, reload))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+"""
+Benchmarks FileStorage lookups as the number of stored objects grows
+
+Usage: python3 -m benchmarks.bench_file_storage [size ...]
+"""
+
+import sys
+import timeit
+from models.amenity import Amenity
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+SIZES = (10000, 100000, 1000000)
+# number of Amenity objects kept fixed whatever the dataset size
+AMENITIES = 50
+
+
+def populate(storage, size):
+    """fills storage with size objects, all Places but for AMENITIES"""
+    FileStorage._FileStorage__objects = {}
+    for i in range(size - AMENITIES):
+        storage.new(Place(id=str(i), name="place"))
+    for i in range(AMENITIES):
+        storage.new(Amenity(id="a" + str(i), name="amenity"))
+
+
+def measure(stmt, number=1000):
+    """returns the mean time of one call of stmt, in microseconds"""
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e6
+
+
+def main(sizes):
+    """runs the benchmark for every dataset size in sizes"""
+    storage = FileStorage()
+    saved = FileStorage._FileStorage__objects
+    print("{:>9} {:>12} {:>18} {:>18}".format(
+        "objects", "get (us)", "count(Place) (us)", "all(Amenity) (us)"))
+    try:
+        for size in sizes:
+            populate(storage, size)
+            middle = str((size - AMENITIES) // 2)
+            print("{:>9} {:>12.3f} {:>18.3f} {:>18.3f}".format(
+                size,
+                measure(lambda: storage.get(Place, middle)),
+                measure(lambda: storage.count(Place)),
+                measure(lambda: storage.all(Amenity))))
+    finally:
+        FileStorage._FileStorage__objects = saved
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
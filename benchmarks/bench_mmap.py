@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""
+Benchmarks the memory-mapped read path of FileStorage against a full
+load: resident memory once loaded, load time and get() latency
+
+Each load runs in its own process so that its resident memory is its own.
+
+Usage: python3 -m benchmarks.bench_mmap [size ...]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+from models.engine.codec import codecs
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+SIZES = (10000, 100000, 1000000)
+GETS = 10000
+
+
+def rss():
+    """returns the resident memory of this process, in MB"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def load(path, memory_map):
+    """loads the snapshot at path and prints rss, load and get() times"""
+    with mock.patch.object(FileStorage, "_FileStorage__file_path", path), \
+            mock.patch.object(FileStorage, "_FileStorage__objects", {}), \
+            mock.patch.object(FileStorage, "memory_map", memory_map):
+        storage = FileStorage()
+        start = time.perf_counter()
+        storage.reload()
+        loaded = time.perf_counter() - start
+        ids = [line.split(b"\t", 1)[0].decode()[len("Place."):]
+               for _, line in zip(range(GETS), open(path, 'rb'))][1:]
+        start = time.perf_counter()
+        for place_id in ids:
+            storage.get(Place, place_id)
+        per_get = (time.perf_counter() - start) / len(ids) * 1e6
+        print(rss(), loaded, per_get)
+
+
+def main(sizes):
+    """runs the benchmark for every dataset size in sizes"""
+    print("{:>9} {:>7} {:>9} {:>10} {:>10}".format(
+        "objects", "mode", "rss (MB)", "load (s)", "get (us)"))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "file.json")
+        for size in sizes:
+            with mock.patch.object(
+                    FileStorage, "_FileStorage__file_path", path), \
+                    mock.patch.object(
+                        FileStorage, "_FileStorage__objects", {}), \
+                    mock.patch.object(FileStorage, "codec", codecs["jsonl"]), \
+                    mock.patch.object(FileStorage, "fsync", "never"):
+                storage = FileStorage()
+                for i in range(size):
+                    storage.new(Place(name="Place {}".format(i), city_id="c",
+                                      user_id="u", number_rooms=i % 5,
+                                      description="Nice place " * 8))
+                storage.compact()
+            for mode in ("full", "mmap"):
+                out = subprocess.check_output(
+                    [sys.executable, "-m", "benchmarks.bench_mmap",
+                     "--load", mode, path])
+                mb, loaded, per_get = map(float, out.split())
+                print("{:>9} {:>7} {:>9.1f} {:>10.3f} {:>10.2f}".format(
+                    size, mode, mb, loaded, per_get))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--load"]:
+        load(sys.argv[3], sys.argv[2] == "mmap")
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or SIZES)
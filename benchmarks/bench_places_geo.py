@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+"""
+Benchmarks the box, radius and nearest searches of
+FileStorage.search_places() against scanning the distance to every place
+
+Usage: python3 -m benchmarks.bench_places_geo [places]
+"""
+
+import random
+import sys
+import timeit
+from models.city import City
+from models.engine.file_storage import FileStorage
+from models.engine.search import haversine, in_box
+from models.place import Place
+
+PLACES = 1000000
+CITIES = 200
+
+
+def populate(storage, places):
+    """fills storage with places spread over the inhabited latitudes"""
+    FileStorage._FileStorage__objects = {}
+    rand = random.Random(0)
+    cities = [City(name=str(i), state_id="") for i in range(CITIES)]
+    for city in cities:
+        storage.new(city)
+    for i in range(places):
+        storage.new(Place(name=str(i), city_id=rand.choice(cities).id,
+                          latitude=rand.uniform(-60, 70),
+                          longitude=rand.uniform(-180, 180)))
+
+
+def scan(storage, bbox=None, near=None, limit=None):
+    """searches places by computing the distance to all of them"""
+    places = list(storage.all(Place).values())
+    if bbox:
+        places = [place for place in places
+                  if in_box(bbox, place.latitude, place.longitude)]
+    if near:
+        latitude, longitude, radius = near
+        distances = haversine(latitude, longitude,
+                              [place.latitude for place in places],
+                              [place.longitude for place in places])
+        found = sorted((distance, place.id, place)
+                       for distance, place in zip(distances, places)
+                       if radius is None or distance <= radius)
+        places = [place for _, _, place in found]
+    return places[:limit]
+
+
+def measure(stmt, number=3):
+    """returns the mean time of one call of stmt, in milliseconds"""
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e3
+
+
+def main(places):
+    """runs the benchmark for each kind of search"""
+    storage = FileStorage()
+    saved = FileStorage._FileStorage__objects
+    try:
+        populate(storage, places)
+        searches = {
+            "1x1 degree box": {"bbox": (48, 2, 49, 3)},
+            "box across antimeridian": {"bbox": (-20, 179, -10, -179)},
+            "50 km around Paris": {"near": (48.86, 2.35, 50)},
+            "500 km around Paris": {"near": (48.86, 2.35, 500)},
+            "20 nearest to Paris": {"near": (48.86, 2.35, None),
+                                    "limit": 20},
+            "20 nearest to a pole": {"near": (90, 0, None), "limit": 20},
+        }
+        print("{} places".format(places))
+        print("{:>25} {:>8} {:>10} {:>12}".format(
+            "search", "places", "scan (ms)", "index (ms)"))
+        for name, search in searches.items():
+            found = [p.id for p in storage.search_places(**search)]
+            expected = [p.id for p in scan(storage, **search)]
+            if "near" not in search:
+                found, expected = sorted(found), sorted(expected)
+            assert found == expected, name
+            print("{:>25} {:>8} {:>10.1f} {:>12.2f}".format(
+                name, len(found),
+                measure(lambda: scan(storage, **search), 1),
+                measure(lambda: list(storage.search_places(**search)))))
+    finally:
+        FileStorage._FileStorage__objects = saved
+
+
+if __name__ == "__main__":
+    main(*([int(arg) for arg in sys.argv[1:2]] or [PLACES]))
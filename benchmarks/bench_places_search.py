@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+"""
+Benchmarks FileStorage.search_places() against scanning every place and
+its amenities as POST /api/v1/places_search used to, then filtering,
+sorting and limiting the places found
+
+Usage: python3 -m benchmarks.bench_places_search [places [amenities]]
+"""
+
+import random
+import sys
+import timeit
+from models.amenity import Amenity
+from models.city import City
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.state import State
+
+PLACES = 100000
+AMENITIES = 50
+STATES = 20
+# cities of each state
+CITIES = 10
+# amenities of each place
+PLACE_AMENITIES = 5
+
+
+def populate(storage, places, amenities):
+    """fills storage with places linked to random cities and amenities"""
+    FileStorage._FileStorage__objects = {}
+    rand = random.Random(0)
+    amenity_ids = [Amenity(name=str(i)).id for i in range(amenities)]
+    for amenity_id in amenity_ids:
+        storage.new(Amenity(id=amenity_id, name="amenity"))
+    states = [State(name=str(i)) for i in range(STATES)]
+    cities = [City(name=str(i), state_id=states[i % STATES].id)
+              for i in range(STATES * CITIES)]
+    for obj in states + cities:
+        storage.new(obj)
+    for i in range(places):
+        storage.new(Place(name=str(i), city_id=rand.choice(cities).id,
+                          amenity_ids=rand.sample(amenity_ids,
+                                                  PLACE_AMENITIES),
+                          price_by_night=rand.randrange(20, 500),
+                          number_rooms=rand.randrange(1, 6)))
+    return states, amenity_ids
+
+
+def scan(storage, states=(), cities=(), amenities=(), ranges=None,
+         order_by=None, limit=None):
+    """searches places the way the view used to, then filters ranges,
+    sorts and keeps the first limit places"""
+    city_ids = set(cities)
+    for state in storage.get_many(State, states):
+        city_ids.update(city.id for city in state.cities)
+    places = storage.all(Place).values()
+    if city_ids:
+        places = [place for place in places if place.city_id in city_ids]
+    places = [place for place in places
+              if all(amenity_id in (a.id for a in place.amenities)
+                     for amenity_id in amenities)]
+    for attr, (low, high) in (ranges or {}).items():
+        places = [place for place in places
+                  if (low is None or getattr(place, attr) >= low) and
+                  (high is None or getattr(place, attr) <= high)]
+    if order_by:
+        places.sort(key=lambda place: (getattr(place, order_by), place.id))
+    return places[:limit]
+
+
+def measure(stmt, number=3):
+    """returns the mean time of one call of stmt, in milliseconds"""
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e3
+
+
+def main(places, amenities):
+    """runs the benchmark for each kind of search"""
+    storage = FileStorage()
+    saved = FileStorage._FileStorage__objects
+    try:
+        states, amenity_ids = populate(storage, places, amenities)
+        searches = {
+            "1 amenity": {"amenities": amenity_ids[:1]},
+            "2 amenities": {"amenities": amenity_ids[:2]},
+            "1 state": {"states": [states[0].id]},
+            "1 state, 1 amenity": {"states": [states[0].id],
+                                   "amenities": amenity_ids[:1]},
+            "price 100-109": {"ranges": {"price_by_night": (100, 109)}},
+            "20 cheapest": {"order_by": "price_by_night", "limit": 20},
+            "20 cheapest, 3+ rooms, 1 state": {
+                "states": [states[0].id],
+                "ranges": {"number_rooms": (3, None)},
+                "order_by": "price_by_night", "limit": 20},
+        }
+        print("{} places, {} amenities".format(places, amenities))
+        print("{:>30} {:>8} {:>10} {:>12}".format(
+            "search", "places", "scan (ms)", "index (ms)"))
+        for name, search in searches.items():
+            found = [p.id for p in storage.search_places(**search)]
+            expected = [p.id for p in scan(storage, **search)]
+            if "order_by" not in search:
+                found, expected = sorted(found), sorted(expected)
+            assert found == expected, name
+            print("{:>30} {:>8} {:>10.1f} {:>12.2f}".format(
+                name, len(found),
+                measure(lambda: scan(storage, **search), 1),
+                measure(lambda: list(storage.search_places(**search)))))
+    finally:
+        FileStorage._FileStorage__objects = saved
+
+
+if __name__ == "__main__":
+    main(*([int(arg) for arg in sys.argv[1:3]] or [PLACES, AMENITIES]))
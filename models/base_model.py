@@ -23,7 +23,8 @@ class BaseModel:
     """The BaseModel class from which future classes will be derived"""
     if models.storage_t == "db":
         id = Column(String(60), primary_key=True)
-        created_at = Column(DateTime, default=datetime.utcnow)
+        # indexed for pages ordered by (created_at, id)
+        created_at = Column(DateTime, default=datetime.utcnow, index=True)
         updated_at = Column(DateTime, default=datetime.utcnow)
 
     def __init__(self, *args, **kwargs):
@@ -34,11 +35,11 @@ class BaseModel:
                     setattr(self, key, value)
             if kwargs.get("created_at", None) and type(self.created_at) is str:
                 self.created_at = datetime.strptime(kwargs["created_at"], time)
-            else:
+            elif not isinstance(kwargs.get("created_at"), datetime):
                 self.created_at = datetime.utcnow()
             if kwargs.get("updated_at", None) and type(self.updated_at) is str:
                 self.updated_at = datetime.strptime(kwargs["updated_at"], time)
-            else:
+            elif not isinstance(kwargs.get("updated_at"), datetime):
                 self.updated_at = datetime.utcnow()
             if kwargs.get("id", None) is None:
                 self.id = str(uuid.uuid4())
@@ -67,7 +68,10 @@ class BaseModel:
             new_dict["updated_at"] = new_dict["updated_at"].strftime(time)
         new_dict["__class__"] = self.__class__.__name__
         if "_sa_instance_state" in new_dict:
-            del new_dict["_sa_instance_state"]
+            # loaded relationships hold objects, not attributes
+            mapper = new_dict.pop("_sa_instance_state").mapper
+            for key in mapper.relationships.keys():
+                new_dict.pop(key, None)
         if models.storage_t == 'db' and 'password' in new_dict:
             del new_dict['password']
         return new_dict
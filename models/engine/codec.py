@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+"""
+Contains the snapshot codecs of FileStorage
+
+A codec turns the records of a FileStorage, dictionaries of attributes
+by <class name>.id with the class name under "__class__", into the bytes
+of a snapshot file and back. Snapshots are recognized by their first
+bytes, so a store can switch codec and still load the snapshot written
+by the previous one.
+
+Usage: python3 -m models.engine.codec <codec> <source> <target>
+converts the snapshot at <source> into a <target> snapshot of that codec.
+"""
+
+from datetime import datetime, timedelta
+import io
+import json
+import pickle
+import sys
+from models.base_model import time
+
+# start of the integer timestamps of the columnar codec
+EPOCH = datetime(1970, 1, 1)
+# attributes stored as integer microseconds by the columnar codec
+DATETIMES = ("created_at", "updated_at")
+
+
+def _strftime(value):
+    """serializes the datetimes found by json.dumps like to_dict() does"""
+    if isinstance(value, datetime):
+        return value.strftime(time)
+    raise TypeError("{!r} is not JSON serializable".format(value))
+
+
+class JSONCodec:
+    """stores a snapshot as one JSON object of records by <class>.id"""
+
+    name = "json"
+
+    def encode(self, records):
+        """returns the snapshot bytes of records"""
+        return json.dumps(records, default=_strftime).encode()
+
+    def decode(self, data):
+        """yields the (key, attributes) pairs stored in snapshot data"""
+        return json.loads(data).items()
+
+
+class _Unpickler(pickle.Unpickler):
+    """unpickler limited to builtin containers and scalars"""
+
+    def find_class(self, module, name):
+        """refuses to load any class or function from a snapshot"""
+        raise pickle.UnpicklingError(
+            "global '{}.{}' is forbidden".format(module, name))
+
+
+class ColumnarCodec:
+    """stores a snapshot as binary tables of rows by class and attributes
+
+    Objects of a class with the same attribute names share a table whose
+    rows hold only values, with datetimes as integer microseconds since
+    EPOCH. Tables are pickled without any class reference and loaded with
+    an unpickler that refuses them.
+    """
+
+    name = "columnar"
+    magic = b"HBNBCOL1"
+
+    def encode(self, records):
+        """returns the snapshot bytes of records"""
+        tables = {}
+        for attrs in records.values():
+            attrs = attrs.copy()
+            name = attrs.pop("__class__")
+            for attr in DATETIMES:
+                if isinstance(attrs.get(attr), str):
+                    attrs[attr] = datetime.strptime(attrs[attr], time)
+                if isinstance(attrs.get(attr), datetime):
+                    attrs[attr] = (attrs[attr] - EPOCH) // timedelta(
+                        microseconds=1)
+            columns = tuple(sorted(attrs))
+            table = tables.setdefault((name, columns), [])
+            table.append(tuple(attrs[column] for column in columns))
+        return self.magic + pickle.dumps(
+            [(name, columns, rows)
+             for (name, columns), rows in tables.items()], protocol=4)
+
+    def decode(self, data):
+        """yields the (key, attributes) pairs stored in snapshot data"""
+        stream = io.BytesIO(data)
+        stream.seek(len(self.magic))
+        for name, columns, rows in _Unpickler(stream).load():
+            times = [i for i, column in enumerate(columns)
+                     if column in DATETIMES]
+            for row in rows:
+                attrs = dict(zip(columns, row))
+                for i in times:
+                    attrs[columns[i]] = EPOCH + timedelta(
+                        microseconds=row[i])
+                attrs["__class__"] = name
+                yield name + "." + attrs["id"], attrs
+
+
+class JSONLinesCodec:
+    """stores a snapshot as one line per object, grouped by class, made of
+    <class name>.id, a tab and the JSON record, so that any record can be
+    read on its own"""
+
+    name = "jsonl"
+    magic = b"HBNBJSONL1\n"
+
+    def encode(self, records):
+        """returns the snapshot bytes of records"""
+        return b"".join(self.iterencode(sorted(
+            records.items(), key=lambda item: item[1]["__class__"])))
+
+    def iterencode(self, items):
+        """yields the snapshot bytes of (key, record) pairs in class order"""
+        yield self.magic
+        for key, attrs in items:
+            yield (key + "\t" + json.dumps(attrs, default=_strftime) +
+                   "\n").encode()
+
+    def decode(self, data):
+        """yields the (key, attributes) pairs stored in snapshot data"""
+        for line in data[len(self.magic):].splitlines():
+            key, _, attrs = line.partition(b"\t")
+            yield key.decode(), json.loads(attrs)
+
+
+codecs = {codec.name: codec
+          for codec in (JSONCodec(), ColumnarCodec(), JSONLinesCodec())}
+
+
+def sniff(data):
+    """returns the codec that wrote the snapshot data"""
+    if data.startswith(ColumnarCodec.magic):
+        return codecs["columnar"]
+    if data.startswith(JSONLinesCodec.magic):
+        return codecs["jsonl"]
+    return codecs["json"]
+
+
+def convert(target, source_path, target_path):
+    """rewrites the snapshot at source_path with the codec named target"""
+    with open(source_path, 'rb') as f:
+        data = f.read()
+    records = dict(sniff(data).decode(data))
+    with open(target_path, 'wb') as f:
+        f.write(codecs[target].encode(records))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in codecs:
+        print("Usage: {} <{}> <source> <target>".format(
+            sys.argv[0], "|".join(codecs)), file=sys.stderr)
+        sys.exit(1)
+    convert(*sys.argv[1:])
@@ -3,27 +3,87 @@
 Contains the class DBStorage
 """
 
+from datetime import datetime
 import models
 from models.amenity import Amenity
-from models.base_model import BaseModel, Base
+from models.base_model import BaseModel, Base, time as time_format
 from models.city import City
 from models.place import Place
 from models.review import Review
+from models.engine.search import bounding_box, nearest, tokenize, \
+    MAX_DISTANCE
+from models.engine.versions import Versions
 from models.state import State
 from models.user import User
 from os import getenv
+import collections
+import itertools
+import logging
 import sqlalchemy
-from sqlalchemy import create_engine
+from sqlalchemy import Column, DateTime, Integer, String, Table, \
+    create_engine, event, func
+from sqlalchemy.orm import joinedload, selectinload, subqueryload
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.expression import Delete, Insert
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
 
 classes = {"Amenity": Amenity, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
+# loader options of the eager loading strategies accepted by load=
+strategies = {"joined": joinedload, "selectin": selectinload,
+              "subquery": subqueryload}
+
+if models.storage_t == 'db':
+    # writes committed to the objects of each class, kept by the database
+    # so that every process using it agrees on the versions
+    class_versions = Table('class_versions', Base.metadata,
+                           Column('name', String(60), primary_key=True),
+                           Column('epoch', String(32), nullable=False),
+                           Column('number', Integer, nullable=False),
+                           Column('updated_at', DateTime, nullable=False))
+
+
+class _TimedQueuePool(QueuePool):
+    """queue pool recording how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        """Instantiate a pool with empty statistics"""
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        """takes a connection from the pool, timing the wait"""
+        start = time.monotonic()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except sqlalchemy.exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            wait = time.monotonic() - start
+            with self.stats_lock:
+                self.checkouts += 1
+                self.timeouts += timed_out
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
 
 
 class DBStorage:
     """interaacts with the MySQL database"""
     __engine = None
     __session = None
+    # boolean - check counts() against the database, for tests
+    check_counts = getenv('HBNB_CHECK_COUNTS') == '1'
 
     def __init__(self):
         """Instantiate a DBStorage object"""
@@ -32,22 +92,53 @@ class DBStorage:
         HBNB_MYSQL_HOST = getenv('HBNB_MYSQL_HOST')
         HBNB_MYSQL_DB = getenv('HBNB_MYSQL_DB')
         HBNB_ENV = getenv('HBNB_ENV')
-        self.__engine = create_engine('mysql+mysqldb://{}:{}@{}/{}'.
-                                      format(HBNB_MYSQL_USER,
-                                             HBNB_MYSQL_PWD,
-                                             HBNB_MYSQL_HOST,
-                                             HBNB_MYSQL_DB))
+        self.__engine = create_engine(
+            'mysql+mysqldb://{}:{}@{}/{}'.format(HBNB_MYSQL_USER,
+                                                 HBNB_MYSQL_PWD,
+                                                 HBNB_MYSQL_HOST,
+                                                 HBNB_MYSQL_DB),
+            poolclass=_TimedQueuePool,
+            pool_size=int(getenv('HBNB_MYSQL_POOL_SIZE', '5')),
+            max_overflow=int(getenv('HBNB_MYSQL_MAX_OVERFLOW', '10')),
+            pool_timeout=float(getenv('HBNB_MYSQL_POOL_TIMEOUT', '30')),
+            # below the 8 hours of the MySQL wait_timeout default
+            pool_recycle=int(getenv('HBNB_MYSQL_POOL_RECYCLE', '3600')),
+            pool_pre_ping=getenv('HBNB_MYSQL_POOL_PRE_PING', '1') == '1')
         if HBNB_ENV == "test":
             Base.metadata.drop_all(self.__engine)
 
         self.is_closed = False
+        # writes committed through this storage to the objects of each
+        # class, for the listeners of Versions; version() reads those of
+        # class_versions
+        self.__versions = Versions()
+        # dictionary - <class name> -> number of rows, counted by reload()
+        # and whenever another process committed a write, then kept up to
+        # date by the transactions committed through the engine
+        self.__counts = {}
+        # dictionary - <class name> -> (epoch, number) of class_versions
+        # the counts are those of
+        self.__counted = {}
+        self.__counts_lock = threading.Lock()
+        # set - names of the tables holding their FULLTEXT index, searched
+        # by LIKE otherwise
+        self.__fulltext = set()
+        event.listen(self.__engine, "after_execute", self.__executed)
+        event.listen(self.__engine, "commit", self.__committed_rows)
+        event.listen(self.__engine, "rollback", self.__rolled_back_rows)
+
+    def all(self, cls=None, load=None):
+        """query on the current database session
 
-    def all(self, cls=None):
-        """query on the current database session"""
+        load: relationships of cls to load with the objects, see __options
+        """
         new_dict = {}
         for clss in classes:
             if cls is None or cls is classes[clss] or cls is clss:
-                objs = self.__session.query(classes[clss]).all()
+                query = self.__session.query(classes[clss])
+                if cls is not None:
+                    query = query.options(*self.__options(classes[clss], load))
+                objs = query.all()
                 for obj in objs:
                     key = obj.__class__.__name__ + '.' + obj.id
                     new_dict[key] = obj
@@ -70,8 +161,178 @@ class DBStorage:
         """reloads data from the database"""
         Base.metadata.create_all(self.__engine)
         sess_factory = sessionmaker(bind=self.__engine, expire_on_commit=False)
+        event.listen(sess_factory, "after_flush", self.__flushed)
+        event.listen(sess_factory, "before_commit", self.__committing)
+        event.listen(sess_factory, "after_commit", self.__committed)
+        event.listen(sess_factory, "after_rollback", self.__rolled_back)
         Session = scoped_session(sess_factory)
         self.__session = Session
+        self.__add_indexes()
+        self.__add_versions()
+        self.__recount()
+
+    def __add_indexes(self):
+        """adds the indexes missing from the tables created before them,
+        as create_all() only creates the tables missing, then records the
+        tables holding their FULLTEXT index"""
+        inspector = sqlalchemy.inspect(self.__engine)
+        for table in Base.metadata.sorted_tables:
+            found = self.__index_names(inspector, table)
+            for index in table.indexes:
+                if index.name in found:
+                    continue
+                try:
+                    index.create(self.__engine)
+                except sqlalchemy.exc.DBAPIError:
+                    # added by another process in the meantime, or not
+                    # allowed to this user
+                    logger.warning("could not add the index %s to %s",
+                                   index.name, table.name, exc_info=True)
+        self.__fulltext = set()
+        # another inspector, not to read the indexes cached by the first
+        inspector = sqlalchemy.inspect(self.__engine)
+        for table in Base.metadata.sorted_tables:
+            found = self.__index_names(inspector, table)
+            if any(index.name in found and
+                   index.dialect_options["mysql"]["prefix"] == "FULLTEXT"
+                   for index in table.indexes):
+                self.__fulltext.add(table.name)
+
+    @staticmethod
+    def __index_names(inspector, table):
+        """returns the names of the indexes of table in the database"""
+        return {index["name"] for index in inspector.get_indexes(table.name)}
+
+    def __recount(self):
+        """counts the rows of every class in one query, reading in the same
+        transaction the versions of class_versions they are the counts of
+
+        A transaction of this process committing meanwhile leaves the
+        versions behind, so that the rows are counted again.
+        """
+        with self.__engine.begin() as connection:
+            counts = connection.execute(sqlalchemy.select(
+                self.__counting(classes.values()))).first()
+            counted = self.__read_versions(connection)
+        with self.__counts_lock:
+            self.__counts = dict(zip(classes, counts))
+            self.__counted = counted
+
+    @staticmethod
+    def __read_versions(connection):
+        """returns {class name: (epoch, number)} of class_versions"""
+        return {row.name: (row.epoch, row.number)
+                for row in connection.execute(sqlalchemy.select([
+                    class_versions.c.name, class_versions.c.epoch,
+                    class_versions.c.number]))}
+
+    def __add_versions(self):
+        """adds the rows of class_versions missing, for writes unknown"""
+        with self.__engine.connect() as connection:
+            found = {row.name for row in connection.execute(
+                sqlalchemy.select([class_versions.c.name]))}
+            for name in classes:
+                if name in found:
+                    continue
+                try:
+                    connection.execute(class_versions.insert().values(
+                        name=name, epoch=uuid.uuid4().hex, number=0,
+                        updated_at=datetime.utcnow()))
+                except sqlalchemy.exc.IntegrityError:
+                    # added by another process in the meantime
+                    pass
+
+    @staticmethod
+    def __flushed(session, context):
+        """records the classes of the objects a flush wrote, until the
+        transaction ends"""
+        session.info.setdefault("written", set()).update(
+            obj.__class__.__name__ for obj in itertools.chain(
+                session.new, session.dirty, session.deleted))
+
+    @staticmethod
+    def __committing(session):
+        """counts a write to each class the transaction wrote in
+        class_versions, before it commits and with its writes"""
+        session.flush()
+        names = sorted(session.info.get("written", ()))
+        if names:
+            # in the same order for every transaction, not to deadlock
+            session.execute(class_versions.update().where(
+                class_versions.c.name.in_(names)).values(
+                    number=class_versions.c.number + 1,
+                    updated_at=datetime.utcnow()))
+            # counted with the rows it inserted and deleted as it commits
+            session.connection().info["bumped"] = names
+
+    def __committed(self, session):
+        """counts a write to each class the committed transaction wrote"""
+        self.__versions.bump(session.info.pop("written", ()))
+
+    @staticmethod
+    def __rolled_back(session):
+        """forgets the classes the rolled back transaction wrote"""
+        session.info.pop("written", None)
+
+    @staticmethod
+    def __executed(connection, clause, multiparams, params, result):
+        """records the rows of a class a statement inserted or deleted,
+        until the transaction ends"""
+        if not isinstance(clause, (Insert, Delete)):
+            return
+        for name, cls in classes.items():
+            if clause.table is cls.__table__:
+                rows = result.rowcount
+                counted = connection.info.setdefault(
+                    "counted", collections.Counter())
+                counted[name] += rows if isinstance(clause, Insert) else -rows
+                return
+
+    def __committed_rows(self, connection):
+        """adds the rows the committed transaction inserted or deleted to
+        the counts, and its writes to the versions they are those of"""
+        counted = connection.info.pop("counted", None) or {}
+        bumped = connection.info.pop("bumped", ())
+        with self.__counts_lock:
+            for name, rows in counted.items():
+                self.__counts[name] = self.__counts.get(name, 0) + rows
+            for name in bumped:
+                if name in self.__counted:
+                    epoch, number = self.__counted[name]
+                    self.__counted[name] = (epoch, number + 1)
+
+    @staticmethod
+    def __rolled_back_rows(connection):
+        """forgets the rows the rolled back transaction inserted or
+        deleted, and its writes"""
+        connection.info.pop("counted", None)
+        connection.info.pop("bumped", None)
+
+    def version(self, cls):
+        """Return the (epoch, number of writes, UTC datetime of the last one)
+        of the objects of a class committed to the database, by any process
+
+        They are read in the transaction of the session, so that they are
+        those of the objects it reads next.
+        """
+        return self.versions([cls])[0]
+
+    def versions(self, clss):
+        """Return the versions of the objects of each class of clss, as
+        version() does, read in one query"""
+        clss = [classes.get(cls, cls) for cls in clss]
+        names = [cls.__name__ for cls in clss if cls in classes.values()]
+        rows = {}
+        if names:
+            rows = {row.name: (row.epoch, row.number, row.updated_at)
+                    for row in self.__session.execute(sqlalchemy.select([
+                        class_versions.c.name, class_versions.c.epoch,
+                        class_versions.c.number,
+                        class_versions.c.updated_at]).where(
+                            class_versions.c.name.in_(names)))}
+        return [rows[cls.__name__] if cls in classes.values() and
+                cls.__name__ in rows else self.__versions.get(cls.__name__)
+                for cls in clss]
 
     def close(self):
         """call remove() method on the private session attribute"""
@@ -80,24 +341,360 @@ class DBStorage:
         self.__session.remove()
         self.is_closed = True
 
-    def get(self, cls, id):
-        """Get One Object"""
-        obj = None
-        if cls is not None and issubclass(cls, BaseModel):
-            obj = self.__session.query(cls).filter(cls.id == id).first()
-        return obj
+    def get(self, cls, id, load=None):
+        """Get One Object, from the session without a query if loaded
+
+        load: relationships to load with the object, see __options; the
+        object is then always queried so that they are loaded
+        """
+        cls = classes.get(cls, cls)
+        if cls not in classes.values():
+            return None
+        if load:
+            return self.__session.query(cls).options(
+                *self.__options(cls, load)).filter(cls.id == id).first()
+        return self.__session.query(cls).get(id)
+
+    def get_many(self, cls, ids, load=None):
+        """Get the objects of a class with the given ids, in one query
+
+        load: relationships to load with the objects, see __options
+        Return: list of the objects found, in the order of ids
+        """
+        cls = classes.get(cls, cls)
+        ids = list(dict.fromkeys(ids))
+        if cls not in classes.values() or not ids:
+            return []
+        query = self.__session.query(cls).options(*self.__options(cls, load))
+        found = {obj.id: obj for obj in query.filter(cls.id.in_(ids))}
+        return [found[id] for id in ids if id in found]
+
+    def page(self, cls, limit, after=None, load=None, **filters):
+        """Get objects of a class by pages, ordered by creation
+
+        after: (created_at, id) the page starts after, as returned for the
+        previous page
+        load: relationships to load with the objects, as for all()
+        filters: attribute values the objects must have
+        Return: (list of objects, (created_at, id) of the last one if more
+        objects follow, else None)
+        """
+        cls = classes.get(cls, cls)
+        if cls not in classes.values():
+            return [], None
+        query = self.__session.query(cls).options(
+            *self.__options(cls, load)).filter_by(**filters)
+        if after:
+            query = query.filter(self.__after(
+                (cls.created_at, cls.id),
+                (datetime.strptime(after[0], time_format), after[1])))
+        objs = query.order_by(cls.created_at, cls.id).limit(limit + 1).all()
+        if len(objs) > limit:
+            last = objs[limit - 1]
+            return objs[:limit], (last.created_at.strftime(time_format),
+                                  last.id)
+        return objs, None
+
+    @staticmethod
+    def __after(columns, values, reverse=False):
+        """returns the condition on the rows ordered by columns, decreasing
+        if reverse, that come after the row of values"""
+        condition = None
+        for column, value in reversed(list(zip(columns, values))):
+            after = column < value if reverse else column > value
+            condition = after if condition is None else sqlalchemy.or_(
+                after, sqlalchemy.and_(column == value, condition))
+        return condition
+
+    def iterate(self, cls, batch=1000, load=None, **filters):
+        """Yield the objects of a class ordered by creation, reading them
+        by pages of batch objects so that they are not all in memory"""
+        after = None
+        while True:
+            objs, after = self.page(cls, batch, after, load, **filters)
+            yield from objs
+            if after is None:
+                return
+
+    def search_places(self, states=(), cities=(), amenities=(), ranges=None,
+                      order_by=None, limit=None, bbox=None, near=None,
+                      text=None, batch=1000):
+        """Yield the places in the cities of states and in cities, or in all
+        cities if there are none, having all amenities and words of text
+        and within ranges, bbox and the radius of near, read by pages of
+        batch places
+
+        ranges: {column: (minimum, maximum)} the places must be within,
+        None being no bound
+        order_by: column the places are ordered by, decreasing if prefixed
+        by "-", instead of creation
+        limit: maximum number of places yielded
+        bbox: (south, west, north, east) box in degrees the places must be
+        in, crossing the antimeridian if west > east
+        near: (latitude, longitude, radius) point the places are ordered by
+        the distance to instead of order_by, within radius km of it unless
+        radius is None
+        text: words the descriptions must all hold, matched by the FULLTEXT
+        index and ranked by relevance unless ordered otherwise
+        """
+        words = tokenize(text)
+        query = self.__place_query(states, cities, amenities, ranges, bbox,
+                                   words)
+        if words and not (order_by or near):
+            relevance = self.__against(Place.description, words)
+            yield from self.__ranked(query, relevance, limit, batch)
+            return
+        if near:
+            yield from self.__nearest(query, near, limit)
+            return
+        reverse = bool(order_by) and order_by.startswith("-")
+        columns = (getattr(Place, order_by.lstrip("-")), Place.id) \
+            if order_by else (Place.created_at, Place.id)
+        query = query.order_by(*(column.desc() if reverse else column
+                                 for column in columns))
+        after = None
+        while limit is None or limit > 0:
+            size = batch if limit is None else min(batch, limit)
+            page = query
+            if after is not None:
+                page = page.filter(self.__after(columns, after, reverse))
+            places = page.limit(size + 1).all()
+            yield from places[:size]
+            if len(places) <= size:
+                return
+            if limit is not None:
+                limit -= size
+            after = [getattr(places[size - 1], column.key)
+                     for column in columns]
+
+    def __place_query(self, states, cities, amenities, ranges, bbox, words):
+        """returns the query of the places search_places() finds, unordered
+        and without the radius of near"""
+        city_ids = set(cities)
+        if states:
+            city_ids.update(id for id, in self.__session.query(
+                City.id).filter(City.state_id.in_(set(states))))
+        query = self.__session.query(Place)
+        if city_ids:
+            query = query.filter(Place.city_id.in_(city_ids))
+        amenities = set(amenities)
+        if amenities:
+            # places linked to as many of the amenities as there are
+            links = Base.metadata.tables["place_amenity"].c
+            matches = self.__session.query(links.place_id).filter(
+                links.amenity_id.in_(amenities)).group_by(
+                links.place_id).having(
+                func.count() == len(amenities)).subquery()
+            query = query.join(matches, matches.c.place_id == Place.id)
+        for attr, (low, high) in (ranges or {}).items():
+            if low is not None:
+                query = query.filter(getattr(Place, attr) >= low)
+            if high is not None:
+                query = query.filter(getattr(Place, attr) <= high)
+        if bbox:
+            query = query.filter(self.__in_box(bbox))
+        if words:
+            query = query.filter(self.__against(Place.description, words))
+        return query
+
+    def place_facets(self, states=(), cities=(), amenities=(), ranges=None,
+                     bbox=None, near=None, text=None):
+        """Return the number of the places search_places() finds by state,
+        city and amenity, grouped by the database in one query
+
+        near: as for search_places(), only filtering by its radius
+        Return: {"states": {id: number of places}, "cities": {...},
+        "amenities": {...}} for the ids of some places found
+        """
+        query = self.__place_query(states, cities, amenities, ranges, bbox,
+                                   tokenize(text))
+        if near and near[2] is not None:
+            # distances are refined out of the database
+            ids = [place.id for place in self.__nearest(query, near, None)]
+            query = self.__session.query(Place).filter(Place.id.in_(ids))
+        found = query.with_entities(Place.id, Place.city_id).subquery()
+        links = Base.metadata.tables["place_amenity"]
+        select, literal = sqlalchemy.select, sqlalchemy.literal
+        by_state = select([literal("states"), City.state_id,
+                           func.count()]).select_from(found.join(
+                               City, City.id == found.c.city_id)).group_by(
+                                   City.state_id)
+        by_city = select([literal("cities"), found.c.city_id,
+                          func.count()]).group_by(found.c.city_id)
+        by_amenity = select([literal("amenities"), links.c.amenity_id,
+                             func.count()]).select_from(found.join(
+                                 links, links.c.place_id == found.c.id)
+                             ).group_by(links.c.amenity_id)
+        facets = sqlalchemy.union_all(by_state, by_city, by_amenity)
+        counts = {"states": {}, "cities": {}, "amenities": {}}
+        for facet, id, count in self.__session.execute(facets):
+            counts[facet][id] = count
+        return counts
+
+    def search_reviews(self, text, places=(), users=(), limit=None,
+                       batch=1000):
+        """Yield the reviews of places and of users, or of all if there are
+        none, holding all the words of text, ranked by relevance and read
+        by pages of batch reviews, none if text holds no words
+        """
+        words = tokenize(text)
+        if not words:
+            return
+        query = self.__session.query(Review)
+        if places:
+            query = query.filter(Review.place_id.in_(set(places)))
+        if users:
+            query = query.filter(Review.user_id.in_(set(users)))
+        relevance = self.__against(Review.text, words)
+        yield from self.__ranked(query.filter(relevance), relevance, limit,
+                                 batch)
+
+    def __against(self, column, words):
+        """returns the FULLTEXT relevance of column to a query requiring
+        all of words, in boolean mode, or the condition that column holds
+        them all if its table has no FULLTEXT index"""
+        if column.class_.__tablename__ not in self.__fulltext:
+            return sqlalchemy.and_(*(column.contains(word, autoescape=True)
+                                     for word in words))
+        return column.match(" ".join("+" + word for word in words))
+
+    @staticmethod
+    def __ranked(query, relevance, limit, batch):
+        """yields the objects of query by decreasing relevance then id,
+        ranking their ids first then reading them by pages of batch"""
+        entity = query.column_descriptions[0]["entity"]
+        ids = [id for id, in query.with_entities(entity.id).order_by(
+            relevance.desc(), entity.id).limit(limit)]
+        for start in range(0, len(ids), batch):
+            page = ids[start:start + batch]
+            objs = {obj.id: obj for obj in query.filter(entity.id.in_(page))}
+            yield from (objs[id] for id in page)
+
+    def __nearest(self, query, near, limit):
+        """returns the places of query nearest to the point of near, read
+        from the bounding box of its radius, or of growing radiuses until
+        limit places are found if it is None"""
+        latitude, longitude, radius = near
+        if radius is None and not limit:
+            places = query.filter(Place.latitude.isnot(None),
+                                  Place.longitude.isnot(None)).all()
+            return nearest(places, latitude, longitude)
+        # the side of a cell of the FileStorage grid, to start with
+        step = radius or 27.8
+        while True:
+            places = query.filter(self.__in_box(
+                bounding_box(latitude, longitude, step))).all()
+            places = nearest(places, latitude, longitude, step, limit)
+            if radius is not None or len(places) >= limit or \
+                    step >= MAX_DISTANCE:
+                return places
+            step *= 4
+
+    @staticmethod
+    def __in_box(box):
+        """returns the condition of the places in a (south, west, north,
+        east) box, which crosses the antimeridian if west > east"""
+        south, west, north, east = box
+        condition = Place.latitude.between(south, north)
+        if west <= east:
+            return sqlalchemy.and_(condition,
+                                   Place.longitude.between(west, east))
+        return sqlalchemy.and_(condition, sqlalchemy.or_(
+            Place.longitude >= west, Place.longitude <= east))
+
+    @staticmethod
+    def __options(cls, load):
+        """returns the loader options of the relationships in load
+
+        load: {relationship path: strategy} with paths like "places" or
+        "places.amenities" from cls, and strategies among strategies, or
+        a list of paths to load with "selectin"
+        """
+        if not load:
+            return []
+        if not isinstance(load, dict):
+            load = dict.fromkeys(load, "selectin")
+        options = []
+        for path, strategy in load.items():
+            option = None
+            entity = cls
+            for name in path.split("."):
+                attr = getattr(entity, name)
+                if option is None:
+                    option = strategies[strategy](attr)
+                else:
+                    option = getattr(option, strategy + "load")(attr)
+                entity = attr.property.mapper.class_
+            options.append(option)
+        return options
 
     def count(self, cls=None):
-        """Returns the number of objects in storage matching the given class"""
+        """Returns the number of objects in storage matching the given class
+
+        Rows are counted by the database, for all classes in one query.
+        """
         if cls is None:
-            total = 0
-            for cls in classes.values():
-                total += len(self.all(cls))
-            return total
-        elif cls not in classes.values():
+            return sum(self.__count(classes.values()))
+        cls = classes.get(cls, cls)
+        if cls not in classes.values():
             return 0
-        else:
-            return len(self.all(cls))
+        return self.__count([cls])[0]
+
+    def counts(self):
+        """Returns the number of objects of every class committed to the
+        database
+
+        The rows are counted by reload(), then the rows inserted and deleted
+        are counted as their transactions commit, so that no query is
+        needed; with check_counts they are checked against a count query.
+        The rows are counted again once class_versions differ from the
+        versions the counts are those of, as another process committed a
+        write, so that the counts are never older than the versions.
+        """
+        with self.__engine.connect() as connection:
+            versions = self.__read_versions(connection)
+        with self.__counts_lock:
+            recount = versions != self.__counted
+        if recount:
+            self.__recount()
+        with self.__counts_lock:
+            counts = {name: self.__counts.get(name, 0) for name in classes}
+        if self.check_counts:
+            with self.__engine.connect() as connection:
+                found = dict(zip(classes, connection.execute(
+                    sqlalchemy.select(self.__counting(
+                        classes.values()))).first()))
+            if counts != found:
+                raise RuntimeError("counts {} differ from the database "
+                                   "{}".format(counts, found))
+        return counts
+
+    def __count(self, clss):
+        """returns the number of rows of each class of clss, in one query"""
+        return self.__session.query(*self.__counting(clss)).one()
+
+    @staticmethod
+    def __counting(clss):
+        """returns the subqueries of the number of rows of each class of
+        clss"""
+        return [sqlalchemy.select([func.count()]).select_from(
+            cls.__table__).as_scalar() for cls in clss]
+
+    def pool_stats(self):
+        """Returns the state and checkout statistics of the connection pool
+
+        wait_total and wait_max are in seconds.
+        """
+        pool = self.__engine.pool
+        with pool.stats_lock:
+            return {"size": pool.size(),
+                    "checked_in": pool.checkedin(),
+                    "checked_out": pool.checkedout(),
+                    "overflow": max(pool.overflow(), 0),
+                    "checkouts": pool.checkouts,
+                    "timeouts": pool.timeouts,
+                    "wait_total": pool.wait_total,
+                    "wait_max": pool.wait_max}
 
     def close_session(self):
         """Close the current database session"""
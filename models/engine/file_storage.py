@@ -3,17 +3,55 @@
 Contains the FileStorage class
 """
 
+import atexit
+import bisect
+import collections
+import contextlib
+from datetime import datetime
+import functools
+import heapq
+import itertools
 import json
+import logging
+import os
+from os import getenv
+import threading
+import time
+import uuid
+import zlib
 from models.amenity import Amenity
-from models.base_model import BaseModel
+from models.base_model import BaseModel, time as time_format
 from models.city import City
+from models.engine.codec import codecs, sniff
+from models.engine.mmap_snapshot import MappedSnapshot, write_index
+from models.engine.search import Bitsets, GeoGrid, SortedIndex, TextIndex, \
+    in_box, is_number, nearest, tokenize, MAX_DISTANCE
+from models.engine.versions import Versions
 from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
 
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
+# foreign key attributes reverse-indexed for each class name
+relations = {"City": ("state_id",), "Place": ("city_id", "user_id"),
+             "Review": ("place_id", "user_id")}
+# list attributes indexed by Bitsets for each class name
+lists = {"Place": ("amenity_ids",)}
+# numeric attributes indexed by SortedIndex for each class name
+sortable = {"Place": ("number_rooms", "number_bathrooms", "max_guest",
+                      "price_by_night")}
+# (latitude, longitude) attributes indexed by GeoGrid for each class name
+locations = {"Place": ("latitude", "longitude")}
+# text attribute indexed by TextIndex for each class name
+texts = {"Place": "description", "Review": "text"}
 
 
 class FileStorage:
@@ -23,77 +61,1589 @@ class FileStorage:
     __file_path = "file.json"
     # dictionary - empty but will store all objects by <class name>.id
     __objects = {}
+    # dictionary - <class name>.id -> attributes of the objects reload()
+    # left to build on first access in lazy mode
+    __raw = {}
+    # MappedSnapshot - JSON file read in place in memory_map mode; __objects
+    # and __raw hold the objects added or changed since it was written
+    __mapped = None
+    # dictionary - <class name> -> keys of __mapped records changed in
+    # __objects or __raw, or deleted
+    __shadowed = {}
+    # dictionary - <class name> -> sorted (created_at, id) of its __mapped
+    # records, built on first use
+    __mapped_order = {}
+    # dictionary - <class name> -> {<class name>.id: obj}, mirrors __objects
+    # and __raw, with None for the objects not built yet
+    __by_class = {}
+    # dictionary - (<class name>, attribute) -> {value: {key: obj or None}}
+    __children = {}
+    # dictionary - <class name>.id -> ((attribute, value), ...) as indexed
+    __parents = {}
+    # dictionary - (<class name>, attribute) -> Bitsets of a list attribute
+    __bitsets = {}
+    # dictionary - (<class name>, attribute) -> SortedIndex of a numeric one
+    __sorted = {}
+    # dictionary - <class name> -> GeoGrid of the points of its locations
+    __geo = {}
+    # dictionary - <class name> -> TextIndex of the words of its text
+    __texts = {}
+    # Versions - writes to the objects of each class since the last reload
+    __versions = Versions()
+    # dictionary - <class name> -> sorted list of the (created_at, id) of
+    # its objects, kept up to date once page() built it
+    __order = {}
+    # dictionary - <class name>.id -> (created_at, id) as sorted in __order
+    __order_keys = {}
+    # dictionary - the __objects dictionary the indexes were built from
+    __indexed = None
+    # dictionary - <class name>.id -> obj, or None if deleted, since save
+    __dirty = {}
+    # integer - number of records in the journal file
+    __journal_len = 0
+    # float - time of the last fsync of the journal
+    __journal_synced = 0.0
+    # boolean - appends to the journal were not fsynced yet
+    __journal_unsynced = False
+    # Timer - fsyncs the journal once fsync_interval passed since the last
+    # fsync, so that "batched" appends followed by no other are synced too
+    __sync_timer = None
+    # float - time at which __sync_timer fires
+    __sync_deadline = 0.0
+    # boolean - __sync_journal is registered to run at exit
+    __journal_synced_at_exit = False
+    # lock - guards __objects, the indexes and the files against the flusher
+    __lock = threading.RLock()
+    # lock - held while writing the files, taken before __lock; outside
+    # the shared and memory_map modes __lock is only held to copy the
+    # changes to write, so that reads and writes go on during the write
+    __write_lock = threading.RLock()
+    # boolean - the files are being written outside __lock
+    __writing = False
+    # condition - signals the flusher thread that save() was called
+    __pending = threading.Condition(__lock)
+    # boolean - save() was called since the last flush
+    __save_requested = False
+    # thread - background flusher of the write-behind mode
+    __flusher = None
+    # tuple - (inode, size, mtime) of the JSON and journal files at the
+    # last load or save
+    __file_sig = None
+    # dictionary - <class name> -> paths of the shard files of the class
+    # that reload() left to read on first access in lazy sharded mode
+    __unread = {}
+    # set - (<class name>, shard) of the shard files that miss changes
+    __stale = set()
+    # set - paths of snapshot files of another layout to remove once their
+    # objects are written to the current one
+    __obsolete = set()
+    # integer - generation of the snapshot loaded, bumped by compactions
+    __generation = 0
+    # integer - number of bytes of the journal applied to __objects
+    __journal_pos = 0
+    # integer - inode of the journal whose bytes were applied
+    __journal_ino = None
+    # integer - descriptor of the lock file while the lock is held
+    __lock_fd = None
 
     is_closed = False
+    # boolean - append changes to a journal instead of rewriting the file
+    journal = getenv("HBNB_FILE_JOURNAL") == "1"
+    # integer - number of journal records that triggers a compaction
+    journal_limit = int(getenv("HBNB_FILE_JOURNAL_LIMIT", "1000"))
+    # string - when to fsync writes: "always", "batched" or "never";
+    # "batched" syncs snapshots and the journal once per fsync_interval
+    fsync = getenv("HBNB_FILE_FSYNC", "batched")
+    # float - seconds between two journal fsyncs in "batched" mode
+    fsync_interval = float(getenv("HBNB_FILE_FSYNC_INTERVAL", "1"))
+    # boolean - leave writes to a background thread instead of save()
+    write_behind = getenv("HBNB_FILE_WRITE_BEHIND") == "1"
+    # float - seconds the flusher waits to coalesce changes after a save()
+    flush_interval = float(getenv("HBNB_FILE_FLUSH_INTERVAL", "0.1"))
+    # integer - number of pending changes that triggers an early flush
+    flush_batch = int(getenv("HBNB_FILE_FLUSH_BATCH", "100"))
+    # codec - format of the snapshots written to the JSON file; any format
+    # is recognized when loading
+    codec = codecs[getenv("HBNB_FILE_CODEC", "json")]
+    # boolean - build objects on first access instead of in reload()
+    lazy = getenv("HBNB_FILE_LAZY") == "1"
+    # boolean - read a JSON lines snapshot in place through a memory map and
+    # build objects from it on each access; snapshots are then written as
+    # JSON lines with a sidecar index
+    memory_map = getenv("HBNB_FILE_MMAP") == "1"
+    # boolean - check counts() against a scan of every object, for tests
+    check_counts = getenv("HBNB_CHECK_COUNTS") == "1"
+    # integer - number of snapshot files per class, by hash of the id, in
+    # place of the single JSON file; 0 keeps the single file
+    shards = int(getenv("HBNB_FILE_SHARDS", "0"))
+    # boolean - share the files with other processes: writes are appended
+    # to the journal under an advisory lock, and sync() applies the records
+    # the other processes appended since
+    shared = getenv("HBNB_FILE_SHARED") == "1"
+
+    def all(self, cls=None, load=None):
+        """returns the dictionary __objects
 
-    def all(self, cls=None):
-        """returns the dictionary __objects"""
-        if cls is not None:
-            new_dict = {}
-            for key, value in self.__objects.items():
-                if cls == value.__class__ or cls == value.__class__.__name__:
-                    new_dict[key] = value
-            return new_dict
-        return self.__objects
+        load is accepted for DBStorage compatibility: relationships are
+        read from the in-memory indexes, so there is nothing to preload.
+        """
+        with self.__lock:
+            if cls is None:
+                self.__need()
+                self.__promote()
+                for key in list(self.__raw):
+                    self.__load(key)
+                return self.__objects
+            name = self.__class_name(cls)
+            self.__need(name)
+            objs = self.__index().get(name, {})
+            if self.__raw:
+                for key in [key for key, obj in objs.items() if obj is None]:
+                    self.__load(key)
+            objs = dict(objs)
+            if self.__mapped is not None:
+                shadowed = self.__shadowed.get(name, ())
+                for key, attrs in self.__mapped.items(name):
+                    if key not in shadowed:
+                        objs[key] = classes[name](**attrs)
+            return objs
 
     def new(self, obj):
         """sets in __objects the obj with key <obj class name>.id"""
         if obj is not None:
             key = obj.__class__.__name__ + "." + obj.id
-            self.__objects[key] = obj
+            with self.__lock:
+                self.__need(obj.__class__.__name__)
+                self.__put(key, obj)
+                self.__dirty[key] = obj
+                self.__touch(key)
+                self.__versions.bump([obj.__class__.__name__])
 
     def save(self):
-        """serializes __objects to the JSON file (path: __file_path)"""
-        json_objects = {}
-        for key in self.__objects:
-            json_objects[key] = self.__objects[key].to_dict()
-        with open(self.__file_path, 'w') as f:
-            json.dump(json_objects, f)
+        """persists the changes made to __objects since the last save
 
-    def reload(self):
-        """deserializes the JSON file to __objects"""
-        try:
-            with open(self.__file_path, 'r') as f:
+        In write-behind mode the changes are left to a background thread
+        that flushes them flush_interval seconds later, or as soon as
+        flush_batch changes are pending; otherwise they are flushed now.
+        """
+        if not self.write_behind:
+            self.flush()
+            return
+        with self.__lock:
+            FileStorage.__save_requested = True
+            if self.__flusher is None or not self.__flusher.is_alive():
+                FileStorage.__flusher = threading.Thread(
+                    target=self.__flush_loop, name="FileStorage flusher",
+                    daemon=True)
+                FileStorage.__flusher.start()
+                atexit.register(self.flush)
+            self.__pending.notify()
+
+    def flush(self):
+        """synchronously writes the changes made since the last flush
+
+        In journal mode the changes are appended to the journal, which is
+        folded into the JSON file once it holds journal_limit records;
+        otherwise the whole of __objects is rewritten to the JSON file.
+        In shared mode the journal is always used, and the changes of the
+        other processes are applied first.
+        """
+        with self.__write_lock:
+            if self.shared or self.memory_map:
+                with self.__lock, self.__locked():
+                    FileStorage.__save_requested = False
+                    if self.shared:
+                        self.sync()
+                    elif not self.journal:
+                        self.compact()
+                        return
+                    self.__append()
+                    if FileStorage.__journal_len >= self.journal_limit:
+                        self.compact()
+                    FileStorage.__file_sig = self.__stat()
+                return
+            if not self.journal:
+                self.compact()
+                return
+            with self.__lock:
+                FileStorage.__save_requested = False
+                dirty, records = self.__take_dirty()
+            self.__write_out(dirty, lambda: self.__write_journal(records))
+            if FileStorage.__journal_len >= self.journal_limit:
+                self.compact()
+
+    def compact(self):
+        """serializes __objects to the JSON file and empties the journal
+
+        In sharded mode only the shard files holding objects changed since
+        the last compaction are rewritten. In shared mode the journal is
+        replaced by one starting a new generation, so that the other
+        processes can tell whether they need to reload.
+        """
+        with self.__write_lock:
+            if not self.shared and not self.memory_map:
+                self.__compact_unlocked()
+                return
+            with self.__lock, self.__locked():
+                self.__compact_locked()
+
+    def __compact_unlocked(self):
+        """compacts copies of the objects taken under __lock, then encodes
+        and writes them outside it; __write_lock is held"""
+        with self.__lock:
+            FileStorage.__save_requested = False
+            journal = os.path.exists(self.__journal_path())
+            dirty, journaled = self.__take_dirty(journal)
+            if self.__sharded():
+                stale = self.__stale
+                FileStorage.__stale = set()
+                shards = self.__stale_shards(stale)
+            else:
+                stale = set()
+                records = dict(self.__records())
+            obsolete = set(self.__obsolete)
+            if not self.__sharded():
+                obsolete.add(self.__stamp_path())
+
+        def write():
+            """writes the journal, then the snapshot replacing it"""
+            if journal:
+                # keep the journal complete until the JSON file replaces it
+                self.__write_journal(journaled)
+            if self.__sharded():
+                self.__write_shard_files(shards)
+            else:
+                self.__write_snapshot([self.codec.encode(records)])
+            for path in obsolete | {self.__journal_path()}:
                 try:
-                    jo = json.load(f)
-                    for key in jo:
-                        self.__objects[key] = classes[
-                                jo[key]["__class__"]
-                                ](**jo[key])
-                except json.JSONDecodeError:
+                    os.remove(path)
+                except FileNotFoundError:
                     pass
-        except (FileExistsError, FileNotFoundError):
-            pass
+
+        try:
+            self.__write_out(dirty, write)
+        except BaseException:
+            with self.__lock:
+                FileStorage.__stale |= stale
+            raise
+        with self.__lock:
+            FileStorage.__obsolete -= obsolete
+            FileStorage.__journal_len = 0
+
+    def __compact_locked(self):
+        """compacts the objects with __lock held for the whole write, as
+        the shared and memory_map modes need"""
+        if self.shared:
+            self.sync()
+        if os.path.exists(self.__journal_path()):
+            # keep the journal complete until the JSON file replaces it
+            self.__append()
+        if self.memory_map:
+            self.__write_snapshot(
+                codecs["jsonl"].iterencode(self.__records()))
+        elif self.__sharded():
+            self.__write_shards()
+        else:
+            self.__write_snapshot(
+                [self.codec.encode(dict(self.__records()))])
+        obsolete = set(self.__obsolete)
+        if not self.__sharded():
+            obsolete.add(self.__stamp_path())
+        if self.shared:
+            self.__start_generation()
+        else:
+            obsolete.add(self.__journal_path())
+        for path in obsolete:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        FileStorage.__obsolete = set()
+        FileStorage.__stale = set()
+        if self.memory_map:
+            # everything is in the new snapshot: map it and empty
+            # __objects so that memory does not grow with the changes
+            write_index(self.__file_path)
+            self.__unmap()
+            self.__objects.clear()
+            self.__reset()
+            FileStorage.__mapped = MappedSnapshot(self.__file_path)
+        FileStorage.__dirty = {}
+        FileStorage.__journal_len = 0
+        FileStorage.__file_sig = self.__stat()
+
+    def sync(self):
+        """applies the journal records other processes appended since the
+        last load or save, reloading only if one of them compacted
+
+        Objects changed or deleted since the last save stay so.
+        """
+        with self.__lock, self.__locked(False):
+            try:
+                st = os.stat(self.__journal_path())
+            except FileNotFoundError:
+                st = None
+            header = self.__journal_header() if st is not None else None
+            # a compaction may reuse the inode of the journal it replaces,
+            # but it starts the next generation, shorter at first
+            if st is not None and st.st_ino == self.__journal_ino and \
+                    st.st_size >= self.__journal_pos and \
+                    (header or {}).get("generation", 0) == self.__generation:
+                if st.st_size > self.__journal_pos:
+                    self.__tail()
+                return
+            if st is None and self.__journal_ino is None and \
+                    not self.changed_on_disk():
+                return
+            if st is not None and header is not None and (
+                    (header.get("from"), header.get("at")) ==
+                    (self.__generation, self.__journal_pos) or
+                    (header["generation"] == self.__generation and
+                     self.__journal_ino is None)):
+                # a journal started on the snapshot loaded, or compacted
+                # right where this process was: only its records are new
+                FileStorage.__journal_pos = 0
+                FileStorage.__journal_ino = st.st_ino
+                FileStorage.__journal_len = 0
+                self.__tail()
+                return
+            self.__reload_dirty()
+
+    def __reload_dirty(self):
+        """reloads the store from disk, then applies again the changes not
+        flushed yet in write-behind mode"""
+        dirty = self.__dirty
+        self.__unmap()
+        self.__objects.clear()
+        self.__reset()
+        self.reload()
+        for key, obj in dirty.items():
+            # read first, not to be overwritten by the shard files left
+            self.__need(key.partition(".")[0])
+            if obj is not None:
+                self.__put(key, obj)
+            else:
+                self.__drop(key)
+        FileStorage.__dirty = dirty
+
+    def reload(self):
+        """deserializes the JSON file then replays the journal to __objects
+
+        In lazy mode only the attributes of the objects are kept, and each
+        object is built the first time all(), get() or related() return it;
+        in lazy sharded mode the shard files of a class are not even read
+        before then.
+
+        Snapshots of the other layout, single file or shards, are loaded
+        first and removed by the next compaction.
+        """
+        with self.__lock, self.__locked(False):
+            put = self.__put_raw if self.lazy else self.__put_attrs
+            # every object may have changed
+            FileStorage.__versions = Versions()
+            FileStorage.__file_sig = self.__stat()
+            if self.memory_map and self.__map():
+                pass
+            elif self.__sharded():
+                self.__index()
+                if os.path.exists(self.__file_path):
+                    self.__read_obsolete(self.__file_path, put)
+                for path, name in self.__shard_files().items():
+                    if path not in self.__shard_paths(name):
+                        self.__read_obsolete(path, put)
+                    elif self.lazy:
+                        self.__unread.setdefault(name, []).append(path)
+                    else:
+                        self.__read(path, put)
+            else:
+                for path in self.__shard_files():
+                    self.__read_obsolete(path, put)
+                self.__read(self.__file_path, put)
+            FileStorage.__generation = 0
+            FileStorage.__journal_len = 0
+            FileStorage.__journal_pos = 0
+            FileStorage.__journal_ino = None
+            try:
+                with open(self.__journal_path(), 'rb') as f:
+                    data = f.read()
+                    FileStorage.__journal_ino = os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                return
+            self.__replay(data, put)
+            FileStorage.__journal_pos = data.rfind(b"\n") + 1
 
     def delete(self, obj=None):
         """delete obj from __objects if it’s inside"""
         if obj is not None:
             key = obj.__class__.__name__ + '.' + obj.id
-            if key in self.__objects:
-                del self.__objects[key]
+            with self.__lock:
+                self.__need(obj.__class__.__name__)
+                if self.__has(key):
+                    self.__drop(key)
+                    self.__dirty[key] = None
+                    self.__touch(key)
+                    self.__versions.bump([obj.__class__.__name__])
 
     def close(self):
-        """call reload() method for deserializing the JSON file to objects"""
-        self.reload()
-        self.is_closed = True
+        """ends a session, reloading only if the JSON file changed on disk,
+        or applying the changes of the other processes in shared mode"""
+        with self.__lock:
+            if self.shared:
+                self.sync()
+            elif not self.__writing and self.changed_on_disk():
+                # a write of this process out of the lock is not a change
+                self.__reload_dirty()
+            self.is_closed = True
+
+    def changed_on_disk(self):
+        """tells whether the JSON file or journal changed since last used"""
+        return self.__stat() != self.__file_sig
+
+    def __stat(self):
+        """returns the (inode, size, mtime) signatures of the JSON file and
+        of the journal, and of the stamp rewritten with the shard files in
+        sharded mode"""
+        paths = [self.__file_path, self.__journal_path()]
+        if self.__sharded():
+            paths.append(self.__stamp_path())
+        sig = ()
+        for path in paths:
+            try:
+                st = os.stat(path)
+                sig += ((st.st_ino, st.st_size, st.st_mtime_ns),)
+            except OSError:
+                sig += (None,)
+        return sig
+
+    def __flush_loop(self):
+        """flushes the changes saved in write-behind mode, forever
+
+        The storage lock is released while flushing, and a failed flush
+        is logged then retried flush_interval seconds later.
+        """
+        while True:
+            with self.__lock:
+                while not self.__save_requested:
+                    self.__pending.wait()
+                deadline = time.monotonic() + self.flush_interval
+                remaining = self.flush_interval
+                while (remaining > 0 and
+                       len(self.__dirty) < self.flush_batch):
+                    self.__pending.wait(remaining)
+                    remaining = deadline - time.monotonic()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("FileStorage flush failed, retrying in "
+                                 "%s seconds", self.flush_interval)
+                with self.__lock:
+                    FileStorage.__save_requested = True
+                time.sleep(self.flush_interval)
+
+    def __journal_path(self):
+        """returns the path to the journal of the JSON file"""
+        return self.__file_path + ".log"
+
+    def __stamp_path(self):
+        """returns the path to the file rewritten with the shard files"""
+        return self.__file_path + ".stamp"
+
+    def __append(self):
+        """appends the changes made since the last save to the journal"""
+        dirty, records = self.__take_dirty()
+        try:
+            self.__write_journal(records)
+        except BaseException:
+            self.__restore_dirty(dirty)
+            raise
+
+    def __take_dirty(self, journal=True):
+        """returns the changes made since the last save, and the journal
+        records of them if journal, then forgets them; __lock is held so
+        that the records are copies of the objects as saved"""
+        dirty = self.__dirty
+        FileStorage.__dirty = {}
+        records = [(key, None if obj is None else obj.to_dict())
+                   for key, obj in dirty.items()] if journal else []
+        return dirty, records
+
+    def __restore_dirty(self, dirty):
+        """puts back the changes of a failed write, unless changed since"""
+        with self.__lock:
+            for key, obj in dirty.items():
+                self.__dirty.setdefault(key, obj)
+
+    def __write_out(self, dirty, write):
+        """calls write outside __lock, putting back the changes dirty if it
+        fails so that the next flush writes them"""
+        with self.__lock:
+            FileStorage.__writing = True
+        try:
+            write()
+        except BaseException:
+            self.__restore_dirty(dirty)
+            raise
+        finally:
+            with self.__lock:
+                FileStorage.__writing = False
+                FileStorage.__file_sig = self.__stat()
+
+    def __write_journal(self, records):
+        """appends the (key, attributes or None if deleted) records to the
+        journal"""
+        if not records:
+            return
+        lines = []
+        for key, attrs in records:
+            if attrs is None:
+                record = {"op": "delete", "key": key}
+            else:
+                record = {"op": "upsert", "key": key, "obj": attrs}
+            lines.append(json.dumps(record) + "\n")
+        with open(self.__journal_path(), 'ab+') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    # terminate a record torn by a crash
+                    lines.insert(0, "\n")
+            elif self.shared:
+                lines.insert(0, json.dumps(
+                    {"op": "generation",
+                     "generation": self.__generation}) + "\n")
+            data = "".join(lines).encode()
+            f.write(data)
+            now = time.monotonic()
+            synced = self.fsync == "always" or (
+                self.fsync == "batched" and
+                now - self.__journal_synced >= self.fsync_interval)
+            if synced:
+                f.flush()
+                os.fsync(f.fileno())
+            ino = os.fstat(f.fileno()).st_ino
+        with self.__lock:
+            FileStorage.__journal_pos = end + len(data)
+            FileStorage.__journal_ino = ino
+            if synced:
+                FileStorage.__journal_synced = now
+                FileStorage.__journal_unsynced = False
+            elif self.fsync == "batched":
+                FileStorage.__journal_unsynced = True
+                self.__schedule_sync(
+                    self.__journal_synced + self.fsync_interval - now)
+            FileStorage.__journal_len += len(records)
+
+    def __schedule_sync(self, delay):
+        """starts the timer fsyncing the journal in delay seconds, unless
+        one started already fsyncs it by then"""
+        deadline = time.monotonic() + delay
+        if self.__sync_timer is not None:
+            if self.__sync_deadline <= deadline:
+                return
+            self.__sync_timer.cancel()
+        if not self.__journal_synced_at_exit:
+            atexit.register(self.__sync_journal)
+            FileStorage.__journal_synced_at_exit = True
+        FileStorage.__sync_deadline = deadline
+        FileStorage.__sync_timer = threading.Timer(
+            max(delay, 0), self.__sync_journal)
+        FileStorage.__sync_timer.daemon = True
+        FileStorage.__sync_timer.start()
+
+    def __sync_journal(self):
+        """fsyncs the appends to the journal left unsynced in "batched"
+        mode, outside the lock"""
+        with self.__lock:
+            FileStorage.__sync_timer = None
+            if not self.__journal_unsynced:
+                return
+            FileStorage.__journal_unsynced = False
+            FileStorage.__journal_synced = time.monotonic()
+            path = self.__journal_path()
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            # compacted: the snapshot replacing it was fsynced
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def __replay(self, data, put):
+        """applies the journal records in data to __objects"""
+        for line in data.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # a crash may leave the last record incomplete
+                continue
+            if record["op"] == "generation":
+                FileStorage.__generation = record["generation"]
+                continue
+            FileStorage.__journal_len += 1
+            name = record["key"].partition(".")[0]
+            self.__need(name)
+            self.__touch(record["key"])
+            self.__versions.bump([name])
+            if record["op"] == "delete":
+                self.__drop(record["key"])
+            else:
+                put(record["key"], record["obj"])
+
+    def __tail(self):
+        """applies the complete journal records past __journal_pos"""
+        with open(self.__journal_path(), 'rb') as f:
+            f.seek(self.__journal_pos)
+            data = f.read()
+        # appends hold the lock, so only a crash leaves a record incomplete
+        end = data.rfind(b"\n") + 1
+        self.__replay(data[:end], self.__put_raw if self.lazy
+                      else self.__put_attrs)
+        FileStorage.__journal_pos += end
+        FileStorage.__file_sig = self.__stat()
+
+    def __journal_header(self):
+        """returns the generation record starting the journal, or None"""
+        try:
+            with open(self.__journal_path(), 'rb') as f:
+                record = json.loads(f.readline())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return record if record.get("op") == "generation" else None
+
+    def __start_generation(self):
+        """replaces the journal folded into the snapshot by one starting the
+        next generation, telling where the previous one was folded"""
+        header = {"op": "generation", "generation": self.__generation + 1,
+                  "from": self.__generation, "at": self.__journal_pos}
+        self.__write_snapshot([(json.dumps(header) + "\n").encode()],
+                              self.__journal_path())
+        FileStorage.__generation += 1
+        FileStorage.__journal_pos = 0
+        FileStorage.__journal_ino = os.stat(self.__journal_path()).st_ino
+        self.__tail()
+
+    @contextlib.contextmanager
+    def __locked(self, exclusive=True):
+        """holds the advisory lock of the JSON file in shared mode; the
+        outermost lock taken by a thread covers the nested ones"""
+        if not self.shared or fcntl is None or self.__lock_fd is not None:
+            yield
+            return
+        fd = os.open(self.__file_path + ".lock", os.O_RDWR | os.O_CREAT,
+                     0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            FileStorage.__lock_fd = fd
+            yield
+        finally:
+            FileStorage.__lock_fd = None
+            # closing the only descriptor of the lock file releases the lock
+            os.close(fd)
+
+    def __write_snapshot(self, chunks, path=None):
+        """atomically replaces the JSON file, or the snapshot file at path,
+        with the snapshot bytes chunks"""
+        path = path or self.__file_path
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.writelines(chunks)
+                if self.fsync != "never":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.fsync != "never":
+            self.__fsync_dir()
+
+    def __write_shards(self):
+        """rewrites the shard files of __stale, removing the emptied ones"""
+        self.__write_shard_files(self.__stale_shards(self.__stale))
+
+    def __stale_shards(self, stale):
+        """returns the records of each (<class name>, shard) of stale"""
+        shards = {shard: {} for shard in stale}
+        names = {name for name, _ in stale}
+        for key, attrs in self.__records(names):
+            shard = self.__shard_of(key)
+            if shard in shards:
+                shards[shard][key] = attrs
+        return shards
+
+    def __write_shard_files(self, shards):
+        """writes the records of each (<class name>, shard) of shards to
+        its file, removing the emptied ones"""
+        for (name, shard), records in sorted(shards.items()):
+            path = self.__shard_paths(name)[shard]
+            if records:
+                self.__write_snapshot([self.codec.encode(records)], path)
+            elif os.path.exists(path):
+                os.remove(path)
+        if shards:
+            # the processes tell the shard files changed by the stamp only,
+            # rather than by their directory which any file changes
+            self.__write_snapshot([uuid.uuid4().hex.encode()],
+                                  self.__stamp_path())
+
+    def __read(self, path, put):
+        """puts the records of the snapshot file at path, if any"""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except (FileExistsError, FileNotFoundError):
+            return
+        # snapshots are replaced atomically, so a file that does not parse
+        # is corrupt: fail rather than let save() empty it
+        if data.strip():
+            for key, attrs in sniff(data).decode(data):
+                put(key, attrs)
+
+    def __read_obsolete(self, path, put):
+        """puts the records of a snapshot file of another layout, to be
+        written to the current one by the next compaction"""
+        def put_stale(key, attrs):
+            self.__touch(key)
+            put(key, attrs)
+        self.__read(path, put_stale)
+        self.__obsolete.add(path)
+
+    def __sharded(self):
+        """tells whether snapshots are split in shard files"""
+        return self.shards > 0 and not self.memory_map
+
+    def __shard_of(self, key):
+        """returns the (<class name>, shard) of the object at key"""
+        name, _, id = key.partition(".")
+        return name, zlib.crc32(id.encode()) % self.shards
+
+    def __shard_paths(self, name):
+        """returns the paths of the shard files of the class name"""
+        root, ext = os.path.splitext(self.__file_path)
+        if self.shards == 1:
+            return ["{}.{}{}".format(root, name, ext)]
+        return ["{}.{}.{}{}".format(root, name, shard, ext)
+                for shard in range(self.shards)]
+
+    def __shard_files(self):
+        """returns {path: <class name>} of the shard files of any number of
+        shards found next to the JSON file"""
+        root, ext = os.path.splitext(self.__file_path)
+        directory, prefix = os.path.split(root)
+        try:
+            entries = os.listdir(directory or ".")
+        except FileNotFoundError:
+            return {}
+        files = {}
+        for entry in entries:
+            if not (entry.startswith(prefix + ".") and entry.endswith(ext)):
+                continue
+            name, _, shard = entry[len(prefix) + 1:-len(ext)].partition(".")
+            if name in classes and (not shard or shard.isdigit()):
+                files[os.path.join(directory, entry)] = name
+        return files
 
-    def get(self, cls, id):
+    def __touch(self, key):
+        """records that the shard file of key misses a change"""
+        if self.__sharded():
+            self.__stale.add(self.__shard_of(key))
+
+    def __need(self, name=None):
+        """reads the shard files of the class name, or of every class, that
+        reload() left unread"""
+        if not self.__unread:
+            return
+        # not while another process compacts, in shared mode
+        with self.__locked(False):
+            for name in list(self.__unread) if name is None else [name]:
+                for path in self.__unread.pop(name, ()):
+                    self.__read(path, self.__put_raw)
+
+    def __fsync_dir(self):
+        """flushes the directory entry of the JSON file to disk"""
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.__file_path)),
+                         os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def get(self, cls, id, load=None):
         """ A method to retrieve one object
             cls: class passed
             id: string representing the object ID
+            load: ignored, see all()
             Return: object based on the class
         """
-        all_class = self.all(cls)
+        if cls is None:
+            for obj in self.all().values():
+                if id == str(obj.id):
+                    return obj
+            return None
+        name = self.__class_name(cls)
+        key = name + "." + str(id)
+        with self.__lock:
+            self.__index()
+            self.__need(name)
+            if key in self.__raw:
+                return self.__load(key)
+            obj = self.__objects.get(key)
+            if obj is None and self.__mapped is not None and \
+                    key not in self.__shadowed.get(name, ()):
+                attrs = self.__mapped.get(key)
+                if attrs is not None:
+                    obj = classes[name](**attrs)
+            return obj
 
-        for obj in all_class.values():
-            if id == str(obj.id):
-                return obj
+    def get_many(self, cls, ids, load=None):
+        """ A method to retrieve several objects of a class
+            cls: class or class name
+            ids: iterable of object IDs
+            load: ignored, see all()
+            Return: list of the objects found, in the order of ids
+        """
+        objs = [self.get(cls, id) for id in dict.fromkeys(ids)]
+        return [obj for obj in objs if obj is not None]
 
-        return None
+    def page(self, cls, limit, after=None, load=None, **filters):
+        """ A method to retrieve objects of a class by pages, ordered by
+            creation
+            cls: class or class name
+            limit: maximum number of objects to return
+            after: (created_at, id) the page starts after, as returned for
+                   the previous page
+            load: ignored, relationships are read from memory
+            filters: attribute values the objects must have
+            Return: (list of objects, (created_at, id) of the last one if
+                    more objects follow, else None)
+        """
+        name = self.__class_name(cls)
+        with self.__lock:
+            self.__need(name)
+            self.__index()
+            get = self.__obj
+            indexed = [attr for attr in filters
+                       if attr in relations.get(name, ())]
+            if self.__mapped is not None:
+                # the mapped records not changed since are merged in order
+                # with the others, read from the cursor on
+                get = self.__stored
+                shadowed = self.__shadowed.get(name, ())
+                order = heapq.merge(
+                    self.__following(self.__ordered(name), after),
+                    (sort_key for sort_key in self.__following(
+                        self.__mapped_ordered(name), after)
+                     if name + "." + sort_key[1] not in shadowed))
+            elif indexed:
+                keys = FileStorage.__children.get(
+                    (name, indexed[0]), {}).get(filters[indexed[0]], {})
+                order = self.__following(sorted(
+                    self.__order_keys.get(key) or self.__sort_key(
+                        key, self.__objects.get(key), self.__raw.get(key))
+                    for key in keys), after)
+            else:
+                order = self.__following(self.__ordered(name), after)
+            objs = []
+            for sort_key in order:
+                if len(objs) > limit:
+                    break
+                obj = get(name + "." + sort_key[1])
+                # attributes changed since the last save are not reindexed
+                if all(getattr(obj, attr, None) == value
+                       for attr, value in filters.items()):
+                    objs.append(obj)
+        if len(objs) > limit:
+            last = objs[limit - 1]
+            return objs[:limit], self.__sort_key(name + "." + last.id, last)
+        return objs, None
+
+    def iterate(self, cls, batch=1000, load=None, **filters):
+        """ A method to yield the objects of a class ordered by creation,
+            one page of batch objects at a time, so that the storage lock
+            is not held while the caller reads them
+            cls: class or class name
+            load: ignored, relationships are read from memory
+            filters: attribute values the objects must have
+        """
+        after = None
+        while True:
+            objs, after = self.page(cls, batch, after, **filters)
+            yield from objs
+            if after is None:
+                return
+
+    def version(self, cls):
+        """ A method to tell whether the objects of a class changed
+            cls: class or class name
+            Return: (epoch, number of writes, UTC datetime of the last one)
+                    of the objects of cls since the last reload, which
+                    changes the epoch
+            In shared mode the writes of the other processes are applied
+            first, so that they count as well.
+        """
+        return self.versions([cls])[0]
+
+    def versions(self, clss):
+        """ A method to tell whether the objects of classes changed
+            clss: classes or class names
+            Return: list of the versions of the objects of each class of
+                    clss, as version() returns, synced once
+        """
+        if self.shared:
+            self.sync()
+        return [self.__versions.get(self.__class_name(cls)) for cls in clss]
 
     def count(self, cls=None):
         """ count the number of objects in storage
         cls: class passed
         Return: the number of objects in storage matching the given class.
         """
-        return len(self.all(cls))
+        with self.__lock:
+            self.__need(None if cls is None else self.__class_name(cls))
+            self.__index()
+            if cls is None:
+                total = len(self.__objects) + len(self.__raw)
+                if self.__mapped is not None:
+                    total += self.__mapped.count() - sum(
+                        len(keys) for keys in self.__shadowed.values())
+                return total
+            return self.__count(self.__class_name(cls))
+
+    def counts(self):
+        """ count the objects of every class in storage at once
+            Return: dictionary of <class name> -> number of objects
+
+            The counts are the sizes of the class index new(), delete()
+            and reload() keep up to date, so they cost no scan; with
+            check_counts they are checked against one.
+        """
+        with self.__lock:
+            self.__need()
+            self.__index()
+            counts = {name: self.__count(name) for name in classes}
+            if self.check_counts:
+                self.__check_counts(counts)
+            return counts
+
+    def __count(self, name):
+        """returns the number of objects of class name, indexes built"""
+        total = len(self.__by_class.get(name, {}))
+        if self.__mapped is not None:
+            total += self.__mapped.count(name) - len(
+                self.__shadowed.get(name, ()))
+        return total
+
+    def __check_counts(self, counts):
+        """raises RuntimeError unless counts are the numbers of objects of
+        each class found by scanning the store"""
+        found = collections.Counter(key.partition(".")[0] for key in
+                                    itertools.chain(self.__objects,
+                                                    self.__raw))
+        if self.__mapped is not None:
+            for name in self.__mapped.names():
+                shadowed = self.__shadowed.get(name, ())
+                found[name] += sum(1 for key, _ in self.__mapped.items(name)
+                                   if key not in shadowed)
+        found = {name: found[name] for name in classes}
+        if counts != found:
+            raise RuntimeError("counts {} differ from the objects stored "
+                               "{}".format(counts, found))
+
+    def related(self, cls, attr, value):
+        """ list the objects of a class whose attribute equals a value
+            cls: class or class name of the objects
+            attr: attribute to match, reverse-indexed if in relations
+            value: value of attr, usually the id of the parent object
+            Return: list of matching objects
+        """
+        name = self.__class_name(cls)
+        if attr not in relations.get(name, ()):
+            return [obj for obj in self.all(name).values()
+                    if getattr(obj, attr, None) == value]
+        with self.__lock:
+            self.__index()
+            self.__need(name)
+            objs = FileStorage.__children.get((name, attr), {}).get(value, {})
+            objs = [obj if obj is not None else self.__load(key)
+                    for key, obj in list(objs.items())]
+            if self.__mapped is not None:
+                # the snapshot has no foreign key index: scan the class
+                shadowed = self.__shadowed.get(name, ())
+                objs += [classes[name](**attrs)
+                         for key, attrs in self.__mapped.items(name)
+                         if key not in shadowed and attrs.get(attr) == value]
+        # an attribute changed since the object was last saved is not
+        # reindexed yet, so filter out children that moved elsewhere
+        return [obj for obj in objs if getattr(obj, attr, None) == value]
+
+    def search_places(self, states=(), cities=(), amenities=(), ranges=None,
+                      order_by=None, limit=None, bbox=None, near=None,
+                      text=None):
+        """ A method to search places by location, amenities, ranges of
+            numeric attributes, coordinates and words of their description
+            states: ids of the states whose cities are searched
+            cities: ids of other cities searched
+            amenities: ids of the amenities the places must all have
+            ranges: {attribute: (minimum, maximum)} the numeric attributes
+                    in sortable must be within, None being no bound
+            order_by: attribute in sortable the places are ordered by,
+                      decreasing if prefixed by "-", instead of creation
+            limit: maximum number of places returned
+            bbox: (south, west, north, east) box in degrees the places
+                  must be in, crossing the antimeridian if west > east
+            near: (latitude, longitude, radius) point the places are
+                  ordered by the distance to instead of order_by, within
+                  radius km of it unless radius is None
+            text: words the descriptions must all hold, the places being
+                  ranked by BM25 score unless ordered otherwise
+            Return: iterable of the places in the cities of states and in
+                    cities, or in all cities if there are none, having all
+                    amenities and words and within ranges, bbox and radius
+        """
+        city_ids = set(cities)
+        for state_id in states:
+            city_ids.update(city.id for city in self.related(
+                City, "state_id", state_id))
+        amenities = set(amenities)
+        ranges = dict(ranges or {})
+        reverse = not near and bool(order_by) and order_by.startswith("-")
+        order_by = None if near else order_by[1:] if reverse else order_by
+        words = set(tokenize(text))
+        ranked = bool(words) and not (order_by or near)
+        scores = None
+
+        def match(place):
+            """tells whether place is searched, as attributes changed since
+            the last save are not reindexed"""
+            if city_ids and place.city_id not in city_ids or \
+                    not amenities.issubset(place.amenity_ids):
+                return False
+            for attr, (low, high) in ranges.items():
+                value = getattr(place, attr, None)
+                if not is_number(value) or low is not None and value < low \
+                        or high is not None and value > high:
+                    return False
+            if bbox or near:
+                point = place.latitude, place.longitude
+                if not all(is_number(value) for value in point) or \
+                        bbox and not in_box(bbox, *point):
+                    return False
+            if words and not text_index.holds(
+                    "Place." + place.id, place.description, words):
+                return False
+            return not order_by or is_number(getattr(place, order_by, None))
+
+        def sort_key(place):
+            """returns what the places found are ordered by"""
+            if order_by:
+                return getattr(place, order_by), place.id
+            if ranked:
+                return -scores.get("Place." + place.id, 0.0), place.id
+            return place.created_at, place.id
+
+        with self.__lock:
+            self.__need("Place")
+            self.__index()
+            text_index = self.__text_index("Place")
+            if self.__mapped is not None:
+                # mapped records are not indexed: scan the places
+                candidates = None
+            else:
+                if words:
+                    scores = text_index.scores(words)
+                sources = self.__place_sources(city_ids, amenities, ranges,
+                                               bbox, near, scores)
+                size, keys = min(sources, key=lambda source: source[0],
+                                 default=(None, None))
+                if near and limit and near[2] is None:
+                    grid = self.__geo_index("Place")
+                    # as for walking a sorted index below
+                    if size is None or limit * len(grid) < size * size:
+                        return self.__nearest(grid, near, limit, match)
+                elif order_by and limit:
+                    index = self.__sorted_index("Place", order_by)
+                    low, high = ranges.get(order_by, (None, None))
+                    # walking the index in order stops after limit places,
+                    # so after about limit * total / size keys when the
+                    # smallest source is independent of the order
+                    if size is None or \
+                            limit * index.count(low, high) < size * size:
+                        found = (self.__obj(key) for key in index.keys(
+                            low, high, reverse))
+                        return list(itertools.islice(
+                            filter(match, found), limit))
+                if keys is not None:
+                    candidates = [self.__obj(key) for key in keys()]
+                elif order_by or near:
+                    candidates = list(self.all(Place).values())
+                else:
+                    candidates = None
+        if candidates is None and ranked:
+            places, scores = self.__scan(Place, match, words)
+        elif candidates is None:
+            places = filter(match, self.iterate(Place))
+            if not (order_by or near):
+                return itertools.islice(places, limit)
+        else:
+            places = filter(match, candidates)
+        if near:
+            return nearest(places, *near, limit=limit)
+        if limit:
+            top = heapq.nlargest if reverse else heapq.nsmallest
+            return top(limit, places, key=sort_key)
+        return sorted(places, key=sort_key, reverse=reverse)
+
+    def __nearest(self, grid, near, limit, match):
+        """returns the limit places matching nearest to the point of near,
+        searched in circles of growing radius until enough are found"""
+        latitude, longitude = near[:2]
+        radius = grid.cell_size()
+        while True:
+            # by the distances to the indexed points, then by key and so id
+            found = sorted(grid.around(latitude, longitude, radius))
+            places = list(itertools.islice(filter(match, (
+                self.__obj(key) for _, key in found)), limit))
+            if len(places) == limit or radius >= MAX_DISTANCE:
+                return places
+            radius *= 2
+
+    def place_facets(self, states=(), cities=(), amenities=(), ranges=None,
+                     bbox=None, near=None, text=None):
+        """ A method to count the places search_places() finds by state,
+            city and amenity, in one pass over them
+            near: as for search_places(), only filtering by its radius
+            Return: {"states": {id: number of places}, "cities": {...},
+                     "amenities": {...}} for the ids of some places found
+        """
+        if near and near[2] is None:
+            # the point only orders the places
+            near = None
+        places = list(self.search_places(states, cities, amenities, ranges,
+                                         bbox=bbox, near=near, text=text))
+        by_city = collections.Counter(place.city_id for place in places)
+        by_state = collections.Counter()
+        for city_id, count in by_city.items():
+            city = self.get(City, city_id)
+            if city is not None:
+                by_state[city.state_id] += count
+        with self.__lock:
+            if self.__mapped is None:
+                # the places found intersected with each amenity's places
+                bitsets = self.__bitset_index("Place", "amenity_ids")
+                by_amenity = bitsets.counts(bitsets.bitset(
+                    "Place." + place.id for place in places))
+            else:
+                by_amenity = collections.Counter(
+                    amenity_id for place in places
+                    for amenity_id in set(place.amenity_ids))
+        return {"states": dict(by_state), "cities": dict(by_city),
+                "amenities": dict(by_amenity)}
+
+    def search_reviews(self, text, places=(), users=(), limit=None):
+        """ A method to search reviews by words of their text
+            text: words the texts must all hold
+            places: ids of the places whose reviews are searched, all if
+                    there are none
+            users: ids of the users whose reviews are searched, all if
+                   there are none
+            limit: maximum number of reviews returned
+            Return: list of the reviews holding all the words of text,
+                    ranked by BM25 score, none if text holds no words
+        """
+        words = set(tokenize(text))
+        if not words:
+            return []
+        place_ids = set(places)
+        user_ids = set(users)
+
+        def match(review):
+            """tells whether review is searched, as texts changed since the
+            last save are not reindexed"""
+            return (not place_ids or review.place_id in place_ids) and \
+                (not user_ids or review.user_id in user_ids) and \
+                text_index.holds("Review." + review.id, review.text, words)
+
+        def sort_key(review):
+            """returns what the reviews found are ranked by"""
+            return -scores.get("Review." + review.id, 0.0), review.id
+
+        with self.__lock:
+            self.__need("Review")
+            self.__index()
+            text_index = self.__text_index("Review")
+            if self.__mapped is None:
+                scores = text_index.scores(words)
+                reviews = filter(match, [self.__obj(key) for key in scores])
+            else:
+                reviews = None
+        if reviews is None:
+            reviews, scores = self.__scan(Review, match, words)
+        if limit:
+            return heapq.nsmallest(limit, reviews, key=sort_key)
+        return sorted(reviews, key=sort_key)
+
+    def __scan(self, cls, match, words):
+        """returns the objects of cls matching, and the BM25 scores of the
+        words of their texts among all of them, as mapped records are not
+        indexed"""
+        name = cls.__name__
+        index = TextIndex()
+        found = []
+        for obj in self.iterate(cls):
+            key = name + "." + obj.id
+            index.add(key, getattr(obj, texts[name]))
+            if match(obj):
+                found.append(obj)
+        return found, index.scores(words)
+
+    def __place_sources(self, city_ids, amenities, ranges, bbox, near,
+                        scores):
+        """returns the (number, function returning them) of the keys of
+        the places in city_ids having amenities, of those within each of
+        ranges, of those in bbox and within the radius of near, and of
+        those scored, from the indexes"""
+        sources = []
+        bitset = None
+        if amenities:
+            bitsets = self.__bitset_index("Place", "amenity_ids")
+            bitset = bitsets.match(amenities)
+        if city_ids:
+            children = FileStorage.__children.get(("Place", "city_id"), {})
+            located = [key for city_id in city_ids
+                       for key in children.get(city_id, ())]
+            if bitset is not None:
+                located = [key for key in located
+                           if bitsets.has(bitset, key)]
+            sources.append((len(located), lambda: located))
+        elif bitset is not None:
+            equipped = bitsets.keys(bitset)
+            sources.append((len(equipped), lambda: equipped))
+        for attr, (low, high) in ranges.items():
+            index = self.__sorted_index("Place", attr)
+            sources.append((index.count(low, high),
+                            functools.partial(index.keys, low, high)))
+        if bbox:
+            boxed = self.__geo_index("Place").within(*bbox)
+            sources.append((len(boxed), lambda: boxed))
+        if near and near[2] is not None:
+            circled = [key for _, key in
+                       self.__geo_index("Place").around(*near)]
+            sources.append((len(circled), lambda: circled))
+        if scores is not None:
+            sources.append((len(scores), lambda: list(scores)))
+        return sources
+
+    @staticmethod
+    def __class_name(cls):
+        """returns the class name for a class or a class name"""
+        return cls if isinstance(cls, str) else cls.__name__
+
+    def __index(self):
+        """returns __by_class, rebuilding indexes if __objects was replaced
+
+        Replacing __objects replaces the whole store, so the attributes
+        left to build for the previous one are dropped.
+        """
+        if FileStorage.__indexed is not self.__objects:
+            self.__unmap()
+            self.__reset()
+            FileStorage.__indexed = self.__objects
+            for key, obj in self.__objects.items():
+                self.__link(key, obj)
+        return FileStorage.__by_class
+
+    @staticmethod
+    def __sort_key(key, obj, attrs=None):
+        """returns the (created_at, id) of obj, or of the object to build
+        from attrs, at key"""
+        created_at = attrs.get("created_at") if obj is None else \
+            getattr(obj, "created_at", None)
+        if isinstance(created_at, datetime):
+            created_at = created_at.strftime(time_format)
+        return created_at or "", key.partition(".")[2]
+
+    def __ordered(self, name):
+        """returns the sorted (created_at, id) of the objects of class name"""
+        if name not in FileStorage.__order:
+            keys = {key: self.__sort_key(key, obj, self.__raw.get(key))
+                    for key, obj in self.__index().get(name, {}).items()}
+            FileStorage.__order_keys.update(keys)
+            FileStorage.__order[name] = sorted(keys.values())
+        return FileStorage.__order[name]
+
+    def __mapped_ordered(self, name):
+        """returns the sorted (created_at, id) of the records of class name
+        in __mapped, changed since or not, built once per mapping"""
+        if name not in FileStorage.__mapped_order:
+            FileStorage.__mapped_order[name] = sorted(
+                self.__sort_key(key, None, attrs)
+                for key, attrs in self.__mapped.items(name))
+        return FileStorage.__mapped_order[name]
+
+    @staticmethod
+    def __following(order, after):
+        """yields the (created_at, id) of the sorted list order that follow
+        after, or all of them if after is None"""
+        start = bisect.bisect_right(order, tuple(after)) if after else 0
+        for i in range(start, len(order)):
+            yield order[i]
+
+    def __stored(self, key):
+        """returns the object at key, built from __mapped if it is neither
+        in __objects nor in __raw"""
+        if key in self.__objects or key in self.__raw:
+            return self.__obj(key)
+        return classes[key.partition(".")[0]](**self.__mapped.get(key))
+
+    def __obj(self, key):
+        """returns the object at key, built if it was not yet"""
+        obj = self.__objects.get(key)
+        return obj if obj is not None else self.__load(key)
+
+    def __reset(self):
+        """empties __raw, the indexes and the shard files left to read"""
+        FileStorage.__raw = {}
+        FileStorage.__unread = {}
+        FileStorage.__by_class = {}
+        FileStorage.__children = {}
+        FileStorage.__order = {}
+        FileStorage.__order_keys = {}
+        FileStorage.__parents = {}
+        FileStorage.__bitsets = {}
+        FileStorage.__sorted = {}
+        FileStorage.__geo = {}
+        FileStorage.__texts = {}
+
+    def __map(self):
+        """maps the JSON file in place of loading it, if it is in JSON lines
+
+        Objects in __objects or __raw that the file holds are dropped, as
+        reload() replaces them.
+        """
+        try:
+            snapshot = MappedSnapshot(self.__file_path)
+        except (FileNotFoundError, ValueError):
+            return False
+        self.__index()
+        self.__unmap()
+        for key in list(self.__objects) + list(self.__raw):
+            if snapshot.has(key):
+                self.__drop(key)
+        FileStorage.__mapped = snapshot
+        return True
+
+    def __unmap(self):
+        """closes the memory map of the JSON file, if any"""
+        if self.__mapped is not None:
+            self.__mapped.close()
+        FileStorage.__mapped = None
+        FileStorage.__shadowed = {}
+        FileStorage.__mapped_order = {}
+
+    def __promote(self):
+        """builds every record of __mapped into __objects"""
+        if self.__mapped is None:
+            return
+        for name in self.__mapped.names():
+            shadowed = set(self.__shadowed.get(name, ()))
+            for key, attrs in self.__mapped.items(name):
+                if key not in shadowed:
+                    self.__put_attrs(key, attrs)
+
+    def __has(self, key):
+        """tells whether the store holds an object at key"""
+        if key in self.__objects or key in self.__raw:
+            return True
+        return self.__mapped is not None and \
+            key not in self.__shadowed.get(key.partition(".")[0], ()) and \
+            self.__mapped.has(key)
+
+    def __records(self, names=None):
+        """yields the (key, attributes) of every object, or of the objects
+        of the class names, class by class"""
+        for name in [None] if names is None else names:
+            self.__need(name)
+        by_class = self.__index()
+        if names is None:
+            names = set(by_class)
+            if self.__mapped is not None:
+                names.update(self.__mapped.names())
+        for name in sorted(names):
+            if self.__mapped is not None:
+                shadowed = self.__shadowed.get(name, ())
+                for key, attrs in self.__mapped.items(name):
+                    if key not in shadowed:
+                        yield key, attrs
+            for key, obj in by_class.get(name, {}).items():
+                if obj is None:
+                    yield key, self.__raw[key]
+                    continue
+                attrs = obj.__dict__.copy()
+                attrs.pop("_sa_instance_state", None)
+                attrs["__class__"] = name
+                yield key, attrs
+
+    def __put(self, key, obj):
+        """sets obj in __objects and in the indexes"""
+        self.__drop(key)
+        self.__objects[key] = obj
+        self.__link(key, obj)
+
+    def __put_attrs(self, key, attrs):
+        """builds the object of attrs and sets it in __objects"""
+        self.__put(key, classes[attrs["__class__"]](**attrs))
+
+    def __put_raw(self, key, attrs):
+        """sets attrs in __raw and the object to build in the indexes"""
+        self.__drop(key)
+        self.__raw[key] = attrs
+        self.__link(key, None, attrs)
+
+    def __load(self, key):
+        """builds the object of the attributes in __raw at key"""
+        attrs = self.__raw.pop(key)
+        name = attrs["__class__"]
+        obj = classes[name](**attrs)
+        self.__objects[key] = obj
+        FileStorage.__by_class[name][key] = obj
+        for attr, value in FileStorage.__parents[key]:
+            FileStorage.__children[(name, attr)][value][key] = obj
+        return obj
+
+    def __drop(self, key):
+        """removes the object stored at key from __objects and the indexes"""
+        self.__index()
+        if key in self.__objects:
+            self.__unlink(key, self.__objects.pop(key).__class__.__name__)
+        elif key in self.__raw:
+            self.__unlink(key, self.__raw.pop(key)["__class__"])
+        if self.__mapped is not None and self.__mapped.has(key):
+            self.__shadowed.setdefault(key.partition(".")[0], set()).add(key)
+
+    def __link(self, key, obj, attrs=None):
+        """adds obj to the class and foreign key indexes, or adds None for
+        the object to build from attrs"""
+        if obj is None:
+            name = attrs["__class__"]
+            links = tuple((attr, attrs[attr] if attr in attrs else
+                           getattr(classes[name], attr, None))
+                          for attr in relations.get(name, ()))
+        else:
+            name = obj.__class__.__name__
+            links = tuple((attr, getattr(obj, attr, None))
+                          for attr in relations.get(name, ()))
+        FileStorage.__by_class.setdefault(name, {})[key] = obj
+        for attr, value in links:
+            children = FileStorage.__children.setdefault((name, attr), {})
+            children.setdefault(value, {})[key] = obj
+        FileStorage.__parents[key] = links
+        # the other indexes are built on first use, then kept up to date
+        for attr in lists.get(name, ()):
+            if (name, attr) in FileStorage.__bitsets:
+                FileStorage.__bitsets[(name, attr)].add(
+                    key, self.__attr(key, obj, attr))
+        for attr in sortable.get(name, ()):
+            if (name, attr) in FileStorage.__sorted:
+                FileStorage.__sorted[(name, attr)].add(
+                    key, self.__attr(key, obj, attr))
+        if name in FileStorage.__geo:
+            FileStorage.__geo[name].add(key, *[
+                self.__attr(key, obj, attr) for attr in locations[name]])
+        if name in FileStorage.__texts:
+            FileStorage.__texts[name].add(
+                key, self.__attr(key, obj, texts[name]))
+        if name in FileStorage.__order:
+            sort_key = self.__sort_key(key, obj, attrs)
+            bisect.insort(FileStorage.__order[name], sort_key)
+            FileStorage.__order_keys[key] = sort_key
+
+    def __attr(self, key, obj, attr):
+        """returns the attribute attr of obj, or of the object to build
+        from __raw at key"""
+        if obj is not None:
+            return getattr(obj, attr)
+        attrs = self.__raw[key]
+        if attr in attrs:
+            return attrs[attr]
+        return getattr(classes[attrs["__class__"]], attr)
+
+    def __bitset_index(self, name, attr):
+        """returns the Bitsets of the list attribute attr of class name,
+        built on first use"""
+        if attr not in lists.get(name, ()):
+            return Bitsets()
+        if (name, attr) not in FileStorage.__bitsets:
+            index = Bitsets()
+            for key, obj in self.__index().get(name, {}).items():
+                index.add(key, self.__attr(key, obj, attr))
+            FileStorage.__bitsets[(name, attr)] = index
+        return FileStorage.__bitsets[(name, attr)]
+
+    def __sorted_index(self, name, attr):
+        """returns the SortedIndex of the numeric attribute attr of class
+        name, built on first use"""
+        if attr not in sortable.get(name, ()):
+            return SortedIndex()
+        if (name, attr) not in FileStorage.__sorted:
+            index = SortedIndex()
+            for key, obj in self.__index().get(name, {}).items():
+                index.add(key, self.__attr(key, obj, attr))
+            FileStorage.__sorted[(name, attr)] = index
+        return FileStorage.__sorted[(name, attr)]
+
+    def __geo_index(self, name):
+        """returns the GeoGrid of the locations of class name, built on
+        first use"""
+        if name not in locations:
+            return GeoGrid()
+        if name not in FileStorage.__geo:
+            index = GeoGrid()
+            for key, obj in self.__index().get(name, {}).items():
+                index.add(key, *[self.__attr(key, obj, attr)
+                                 for attr in locations[name]])
+            FileStorage.__geo[name] = index
+        return FileStorage.__geo[name]
+
+    def __text_index(self, name):
+        """returns the TextIndex of the words of the text of class name,
+        built on first use"""
+        if name not in texts:
+            return TextIndex()
+        if name not in FileStorage.__texts:
+            index = TextIndex()
+            for key, obj in self.__index().get(name, {}).items():
+                index.add(key, self.__attr(key, obj, texts[name]))
+            FileStorage.__texts[name] = index
+        return FileStorage.__texts[name]
+
+    def __unlink(self, key, name):
+        """removes the object of class name at key from the indexes"""
+        FileStorage.__by_class.get(name, {}).pop(key, None)
+        for attr, value in FileStorage.__parents.pop(key, ()):
+            children = FileStorage.__children[(name, attr)]
+            children[value].pop(key, None)
+            if not children[value]:
+                del children[value]
+        for attr in lists.get(name, ()):
+            if (name, attr) in FileStorage.__bitsets:
+                FileStorage.__bitsets[(name, attr)].remove(key)
+        for attr in sortable.get(name, ()):
+            if (name, attr) in FileStorage.__sorted:
+                FileStorage.__sorted[(name, attr)].remove(key)
+        if name in FileStorage.__geo:
+            FileStorage.__geo[name].remove(key)
+        if name in FileStorage.__texts:
+            FileStorage.__texts[name].remove(key)
+        sort_key = FileStorage.__order_keys.pop(key, None)
+        if sort_key is not None:
+            order = FileStorage.__order[name]
+            del order[bisect.bisect_left(order, sort_key)]
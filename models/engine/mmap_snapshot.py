@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+"""
+Contains the MappedSnapshot class
+
+A MappedSnapshot reads the records of a JSON lines snapshot in place
+through a memory map, so that only the pages of the records read stay in
+memory, and the OS page cache holds them rather than the process.
+
+Records are found through a sidecar index, <snapshot>.idx, made of:
+- a header: magic, size and mtime of the snapshot, number of slots
+- the byte ranges and number of records of each class, as JSON
+- an open addressing hash table of (key hash, offset, length) slots
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from models.engine.codec import JSONLinesCodec
+
+MAGIC = b"HBNBIDX1"
+# snapshot size, snapshot mtime in ns, number of slots, classes JSON size
+HEADER = struct.Struct("<QQII")
+# key hash, record offset, record length (0 for an empty slot)
+SLOT = struct.Struct("<QQI")
+
+
+def _hash(key):
+    """returns the 64 bits hash of a key stored in the index"""
+    return int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+def _map(path):
+    """returns a read-only memory map of the file at path"""
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_index(path):
+    """writes the sidecar index of the JSON lines snapshot at path"""
+    st = os.stat(path)
+    data = _map(path)
+    try:
+        if data[:len(JSONLinesCodec.magic)] != JSONLinesCodec.magic:
+            raise ValueError("{} is not a JSON lines snapshot".format(path))
+        slots = []
+        ranges = {}
+        offset = len(JSONLinesCodec.magic)
+        while offset < len(data):
+            end = data.find(b"\n", offset)
+            end = len(data) if end < 0 else end + 1
+            key = data[offset:data.find(b"\t", offset, end)].decode()
+            slots.append((_hash(key), offset, end - offset))
+            name = key.split(".", 1)[0]
+            start, stop, count = ranges.get(name, (offset, end, 0))
+            ranges[name] = (start, end, count + 1)
+            offset = end
+    finally:
+        data.close()
+    # a load factor of 1/2 keeps probes short
+    table = bytearray(SLOT.size * max(2 * len(slots), 1))
+    size = len(table) // SLOT.size
+    for key_hash, offset, length in slots:
+        slot = key_hash % size
+        while SLOT.unpack_from(table, slot * SLOT.size)[2]:
+            slot = (slot + 1) % size
+        SLOT.pack_into(table, slot * SLOT.size, key_hash, offset, length)
+    classes = json.dumps(ranges).encode()
+    tmp_path = "{}.idx.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(st.st_size, st.st_mtime_ns, size, len(classes)))
+        f.write(classes)
+        f.write(table)
+    os.replace(tmp_path, path + ".idx")
+
+
+class MappedSnapshot:
+    """reads the records of a JSON lines snapshot through a memory map"""
+
+    def __init__(self, path):
+        """maps the snapshot at path and its index, rebuilt if stale
+
+        Raises FileNotFoundError if there is no snapshot, and ValueError if
+        it is not a JSON lines snapshot.
+        """
+        st = os.stat(path)
+        if not self.__valid_index(path, st):
+            write_index(path)
+        self.__data = _map(path)
+        self.__index = _map(path + ".idx")
+        size, mtime, self.__size, length = HEADER.unpack_from(
+            self.__index, len(MAGIC))
+        start = len(MAGIC) + HEADER.size
+        self.__classes = json.loads(self.__index[start:start + length])
+        self.__slots = start + length
+
+    @staticmethod
+    def __valid_index(path, st):
+        """tells whether the index at path matches the snapshot stat st"""
+        try:
+            with open(path + ".idx", 'rb') as f:
+                header = f.read(len(MAGIC) + HEADER.size)
+        except FileNotFoundError:
+            return False
+        if len(header) < len(MAGIC) + HEADER.size or \
+                not header.startswith(MAGIC):
+            return False
+        size, mtime, slots, length = HEADER.unpack_from(header, len(MAGIC))
+        return (size, mtime) == (st.st_size, st.st_mtime_ns)
+
+    def get(self, key):
+        """returns the attributes stored for key, or None"""
+        found = self.__find(key)
+        if found is None:
+            return None
+        return json.loads(self.__data[found[0]:found[1]].partition(b"\t")[2])
+
+    def has(self, key):
+        """tells whether the snapshot holds a record for key"""
+        return self.__find(key) is not None
+
+    def names(self):
+        """returns the names of the classes in the snapshot"""
+        return list(self.__classes)
+
+    def count(self, name=None):
+        """returns the number of records of a class name, or of all"""
+        if name is None:
+            return sum(count for _, _, count in self.__classes.values())
+        return self.__classes.get(name, (0, 0, 0))[2]
+
+    def items(self, name):
+        """yields the (key, attributes) pairs of the class name"""
+        offset, stop, count = self.__classes.get(name, (0, 0, 0))
+        while offset < stop:
+            end = self.__data.find(b"\n", offset, stop)
+            end = stop if end < 0 else end + 1
+            key, _, attrs = self.__data[offset:end].partition(b"\t")
+            yield key.decode(), json.loads(attrs)
+            offset = end
+
+    def close(self):
+        """unmaps the snapshot and its index"""
+        self.__data.close()
+        self.__index.close()
+
+    def __find(self, key):
+        """returns the (start, end) offsets of the record of key, or None"""
+        key_hash = _hash(key)
+        slot = key_hash % self.__size
+        prefix = key.encode() + b"\t"
+        while True:
+            stored, offset, length = SLOT.unpack_from(
+                self.__index, self.__slots + slot * SLOT.size)
+            if not length:
+                return None
+            if stored == key_hash and \
+                    self.__data[offset:offset + len(prefix)] == prefix:
+                return offset, offset + length
+            slot = (slot + 1) % self.__size
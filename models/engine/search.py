@@ -0,0 +1,485 @@
+#!/usr/bin/python3
+"""
+Contains the indexes FileStorage searches objects with
+
+Bitsets reverse-indexes a list attribute, like the amenity_ids of a
+Place: the keys of the objects holding a value are the bits set in the
+bitset of this value, so that the objects holding several values are
+found by intersecting their bitsets, and the objects of a set holding
+each value counted by intersecting the bitset of the set with theirs.
+
+SortedIndex keeps the keys sorted by the value of a numeric attribute,
+like the price_by_night of a Place, so that the objects in a range of
+values are counted and listed by bisection, in order of value.
+
+GeoGrid files the keys of points, like the latitude and longitude of a
+Place, in the cells of a grid of degrees, so that the points in a box or
+a circle are found among the points of the cells overlapping it.
+Distances are computed by haversine() on whole lists of points, as numpy
+arrays when numpy is installed.
+
+TextIndex lists the keys of the texts holding each word, like the
+description of a Place, so that the texts holding all the words of a
+query are found by intersecting these postings, and ranked by BM25.
+"""
+
+import bisect
+import collections
+import heapq
+import math
+import re
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# mean radius of the Earth, in km
+EARTH_RADIUS = 6371.0088
+# half the circumference of the Earth, the largest distance, in km
+MAX_DISTANCE = math.pi * EARTH_RADIUS
+# BM25 saturation of the occurrences of a word in a text
+BM25_K1 = 1.2
+# BM25 normalization of the occurrences by the length of a text
+BM25_B = 0.75
+# words of the texts, as split by tokenize()
+_WORD = re.compile(r"\w+")
+# greater than any key, to bisect after all the keys of a value
+_LAST = chr(0x10ffff)
+# positions of the bits set in each byte value
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1)
+         for byte in range(256)]
+
+
+def is_number(value):
+    """tells whether value is a number SortedIndex indexes"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Bitsets:
+    """bitsets of the keys holding each value of a list attribute
+
+    Every indexed key gets a slot, the position of its bit in the bitsets,
+    reused once the key is removed.
+    """
+
+    def __init__(self):
+        """Instantiate empty bitsets"""
+        # dictionary - key -> slot
+        self.__slots = {}
+        # list - slot -> key, or None if free
+        self.__keys = []
+        # list - free slots
+        self.__free = []
+        # dictionary - key -> values indexed for it
+        self.__values = {}
+        # dictionary - value -> bytearray of the bits of its keys
+        self.__bits = {}
+
+    def add(self, key, values):
+        """indexes key under each of values, replacing its previous ones"""
+        self.remove(key)
+        values = frozenset(values or ())
+        if not values:
+            return
+        slot = self.__free.pop() if self.__free else len(self.__keys)
+        if slot == len(self.__keys):
+            self.__keys.append(key)
+        else:
+            self.__keys[slot] = key
+        self.__slots[key] = slot
+        self.__values[key] = values
+        byte, bit = slot >> 3, 1 << (slot & 7)
+        for value in values:
+            bits = self.__bits.setdefault(value, bytearray())
+            if len(bits) <= byte:
+                bits.extend(bytes(byte + 1 - len(bits)))
+            bits[byte] |= bit
+
+    def remove(self, key):
+        """removes key from the bitsets"""
+        values = self.__values.pop(key, None)
+        if values is None:
+            return
+        slot = self.__slots.pop(key)
+        byte, mask = slot >> 3, ~(1 << (slot & 7)) & 0xff
+        for value in values:
+            self.__bits[value][byte] &= mask
+        self.__keys[slot] = None
+        self.__free.append(slot)
+
+    def match(self, values):
+        """returns the bitset of the keys holding all of values, as bytes"""
+        result = None
+        for value in set(values):
+            bits = self.__bits.get(value)
+            if bits is None:
+                return b""
+            bits = int.from_bytes(bits, "little")
+            result = bits if result is None else result & bits
+        if not result:
+            return b""
+        return result.to_bytes((result.bit_length() + 7) // 8, "little")
+
+    def keys(self, bitset):
+        """returns the keys of the bits set in bitset"""
+        keys = self.__keys
+        return [keys[byte << 3 | bit]
+                for byte, value in enumerate(bitset) if value
+                for bit in _BITS[value]]
+
+    def bitset(self, keys):
+        """returns the bitset of keys, as bytes, without those not indexed"""
+        bits = bytearray((len(self.__keys) + 7) >> 3)
+        slots = self.__slots
+        for key in keys:
+            slot = slots.get(key)
+            if slot is not None:
+                bits[slot >> 3] |= 1 << (slot & 7)
+        return bytes(bits)
+
+    def counts(self, bitset):
+        """returns {value: number of the keys of bitset holding it}, for the
+        values some of them hold"""
+        mask = int.from_bytes(bitset, "little")
+        counts = {}
+        for value, bits in self.__bits.items():
+            count = bin(int.from_bytes(bits, "little") & mask).count("1")
+            if count:
+                counts[value] = count
+        return counts
+
+    def has(self, bitset, key):
+        """tells whether the bit of key is set in bitset"""
+        slot = self.__slots.get(key)
+        return slot is not None and slot >> 3 < len(bitset) and \
+            bool(bitset[slot >> 3] >> (slot & 7) & 1)
+
+
+class SortedIndex:
+    """keys sorted by the value of a numeric attribute
+
+    Keys whose value is not a number are not indexed.
+    """
+
+    def __init__(self):
+        """Instantiate an empty index"""
+        # list - (value, key) sorted
+        self.__entries = []
+        # dictionary - key -> value indexed for it
+        self.__values = {}
+        # dictionary - key -> value added but not sorted in yet
+        self.__pending = {}
+
+    def __len__(self):
+        """returns the number of keys indexed"""
+        return len(self.__values)
+
+    def add(self, key, value):
+        """indexes key under value, replacing its previous one"""
+        self.remove(key)
+        if not is_number(value):
+            return
+        self.__values[key] = value
+        self.__pending[key] = value
+
+    def remove(self, key):
+        """removes key from the index"""
+        if key in self.__pending:
+            del self.__pending[key]
+            del self.__values[key]
+        elif key in self.__values:
+            entry = (self.__values.pop(key), key)
+            del self.__entries[bisect.bisect_left(self.__entries, entry)]
+
+    def count(self, low=None, high=None):
+        """returns the number of keys whose value is between low and high
+        included, None being no bound"""
+        start, stop = self.__bounds(low, high)
+        return stop - start
+
+    def keys(self, low=None, high=None, reverse=False):
+        """yields the keys whose value is between low and high included,
+        None being no bound, by increasing value, or decreasing if
+        reverse, then by key"""
+        start, stop = self.__bounds(low, high)
+        entries = self.__entries
+        steps = range(stop - 1, start - 1, -1) if reverse else \
+            range(start, stop)
+        for i in steps:
+            yield entries[i][1]
+
+    def __bounds(self, low, high):
+        """returns the slice of the entries between low and high"""
+        self.__sort_in()
+        start = 0 if low is None else \
+            bisect.bisect_left(self.__entries, (low,))
+        stop = len(self.__entries) if high is None else \
+            bisect.bisect_right(self.__entries, (high, _LAST))
+        return start, stop
+
+    def __sort_in(self):
+        """sorts the pending keys in the entries, one by one if they are
+        few, else all at once, as one run merged by the sort"""
+        pending = [(value, key) for key, value in self.__pending.items()]
+        self.__pending.clear()
+        if len(pending) < 64:
+            for entry in pending:
+                bisect.insort(self.__entries, entry)
+        else:
+            self.__entries.extend(pending)
+            self.__entries.sort()
+
+
+def haversine(latitude, longitude, latitudes, longitudes):
+    """returns the list of the great-circle distances in km from a point
+    to the points of latitudes and longitudes, all in degrees"""
+    lat0 = math.radians(latitude)
+    lng0 = math.radians(longitude)
+    if numpy is not None:
+        lats = numpy.radians(numpy.asarray(latitudes, dtype=float))
+        lngs = numpy.radians(numpy.asarray(longitudes, dtype=float))
+        a = numpy.sin((lats - lat0) / 2) ** 2 + math.cos(lat0) * \
+            numpy.cos(lats) * numpy.sin((lngs - lng0) / 2) ** 2
+        return (2 * EARTH_RADIUS * numpy.arcsin(
+            numpy.sqrt(numpy.minimum(a, 1.0)))).tolist()
+    sin, cos, radians = math.sin, math.cos, math.radians
+    cos0 = cos(lat0)
+    return [2 * EARTH_RADIUS * math.asin(math.sqrt(min(
+        sin((radians(lat) - lat0) / 2) ** 2 + cos0 * cos(radians(lat)) *
+        sin((radians(lng) - lng0) / 2) ** 2, 1.0)))
+        for lat, lng in zip(latitudes, longitudes)]
+
+
+def bounding_box(latitude, longitude, radius):
+    """returns the (south, west, north, east) box in degrees holding the
+    circle of radius km around a point, with west > east if the box
+    crosses the antimeridian"""
+    span = math.degrees(radius / EARTH_RADIUS)
+    south, north = latitude - span, latitude + span
+    if south <= -90 or north >= 90:
+        # the circle holds a pole, so every longitude
+        return max(south, -90), -180, min(north, 90), 180
+    span = math.degrees(math.asin(
+        math.sin(radius / EARTH_RADIUS) / math.cos(math.radians(latitude))))
+    west, east = longitude - span, longitude + span
+    if west < -180:
+        west += 360
+    if east > 180:
+        east -= 360
+    return south, west, north, east
+
+
+def in_box(box, latitude, longitude):
+    """tells whether a point is in the (south, west, north, east) box"""
+    south, west, north, east = box
+    if not south <= latitude <= north:
+        return False
+    if west <= east:
+        return west <= longitude <= east
+    return longitude >= west or longitude <= east
+
+
+def nearest(places, latitude, longitude, radius=None, limit=None):
+    """returns the places within radius km of a point, all if radius is
+    None, by increasing distance then id, at most limit of them"""
+    places = [place for place in places
+              if is_number(place.latitude) and is_number(place.longitude)]
+    distances = haversine(latitude, longitude,
+                          [place.latitude for place in places],
+                          [place.longitude for place in places])
+    found = [(distance, place.id, place)
+             for distance, place in zip(distances, places)
+             if radius is None or distance <= radius]
+    if limit:
+        found = heapq.nsmallest(limit, found)
+    else:
+        found.sort()
+    return [place for _, _, place in found]
+
+
+class GeoGrid:
+    """keys of points filed in the cells of a grid of degrees
+
+    Points outside of the ranges of latitudes and longitudes, or whose
+    coordinates are not numbers, are not indexed.
+    """
+
+    def __init__(self, cell=0.25):
+        """Instantiate an empty grid of cells of cell degrees per side"""
+        # float - degrees of latitude and longitude per side of a cell
+        self.__cell = cell
+        # integer - number of cells between the poles
+        self.__rows = math.ceil(180 / cell)
+        # integer - number of cells around the Earth
+        self.__columns = math.ceil(360 / cell)
+        # dictionary - row -> column -> {key: (latitude, longitude)} of the
+        # cells holding points
+        self.__cells = {}
+        # dictionary - key -> (row, column) of its cell
+        self.__points = {}
+
+    def __len__(self):
+        """returns the number of points indexed"""
+        return len(self.__points)
+
+    def cell_size(self):
+        """returns the side of a cell at the equator, in km"""
+        return math.radians(self.__cell) * EARTH_RADIUS
+
+    def add(self, key, latitude, longitude):
+        """indexes key at a point, replacing its previous one"""
+        self.remove(key)
+        if not is_number(latitude) or not is_number(longitude) or \
+                not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+            return
+        row, column = self.__row(latitude), self.__column(longitude)
+        self.__cells.setdefault(row, {}).setdefault(column, {})[key] = \
+            (latitude, longitude)
+        self.__points[key] = (row, column)
+
+    def remove(self, key):
+        """removes key from the grid"""
+        cell = self.__points.pop(key, None)
+        if cell is not None:
+            row, column = cell
+            columns = self.__cells[row]
+            del columns[column][key]
+            if not columns[column]:
+                del columns[column]
+                if not columns:
+                    del self.__cells[row]
+
+    def within(self, south, west, north, east):
+        """returns the keys of the points in a box, which crosses the
+        antimeridian if west > east"""
+        box = south, west, north, east
+        return [key for key, latitude, longitude in self.__candidates(box)
+                if in_box(box, latitude, longitude)]
+
+    def around(self, latitude, longitude, radius):
+        """returns the (distance, key) of the points within radius km of a
+        point"""
+        points = self.__candidates(
+            bounding_box(latitude, longitude, radius))
+        distances = haversine(latitude, longitude,
+                              [point[1] for point in points],
+                              [point[2] for point in points])
+        return [(distance, point[0])
+                for distance, point in zip(distances, points)
+                if distance <= radius]
+
+    def __candidates(self, box):
+        """returns the (key, latitude, longitude) of the points in the
+        cells overlapping a box"""
+        south, west, north, east = box
+        rows = range(self.__row(max(south, -90)),
+                     self.__row(min(north, 90)) + 1)
+        if west <= east:
+            spans = [range(self.__column(west), self.__column(east) + 1)]
+        else:
+            spans = [range(self.__column(west), self.__columns),
+                     range(0, self.__column(east) + 1)]
+        cells = []
+        for row in rows:
+            columns = self.__cells.get(row)
+            if not columns:
+                continue
+            for span in spans:
+                if len(span) > len(columns):
+                    # fewer cells of the row hold points than the box
+                    # overlaps
+                    cells.extend(points for column, points in columns.items()
+                                 if column in span)
+                else:
+                    cells.extend(columns[column] for column in span
+                                 if column in columns)
+        return [(key, latitude, longitude) for points in cells
+                for key, (latitude, longitude) in points.items()]
+
+    def __row(self, latitude):
+        """returns the row of the cells of a latitude"""
+        return min(int((latitude + 90) // self.__cell), self.__rows - 1)
+
+    def __column(self, longitude):
+        """returns the column of the cells of a longitude"""
+        return min(int((longitude + 180) // self.__cell), self.__columns - 1)
+
+
+def tokenize(text):
+    """returns the lowercase words of text, none if it is not a string"""
+    if not isinstance(text, str):
+        return []
+    return _WORD.findall(text.lower())
+
+
+class TextIndex:
+    """postings of the keys of the texts holding each word
+
+    Texts are split in words by tokenize().
+    """
+
+    def __init__(self):
+        """Instantiate an empty index"""
+        # dictionary - word -> {key: occurrences of the word in its text}
+        self.__postings = {}
+        # dictionary - key -> (number of words, distinct words, text)
+        self.__texts = {}
+        # integer - number of words of all the texts
+        self.__total = 0
+
+    def __len__(self):
+        """returns the number of texts indexed"""
+        return len(self.__texts)
+
+    def add(self, key, text):
+        """indexes the words of the text of key, replacing its previous
+        one"""
+        self.remove(key)
+        words = tokenize(text)
+        if not words:
+            return
+        counts = collections.Counter(words)
+        for word, count in counts.items():
+            self.__postings.setdefault(word, {})[key] = count
+        self.__texts[key] = (len(words), tuple(counts), text)
+        self.__total += len(words)
+
+    def remove(self, key):
+        """removes the text of key from the index"""
+        length, words, _ = self.__texts.pop(key, (0, (), None))
+        for word in words:
+            postings = self.__postings[word]
+            del postings[key]
+            if not postings:
+                del self.__postings[word]
+        self.__total -= length
+
+    def holds(self, key, text, words):
+        """tells whether text, the current text of key, holds all of words,
+        from the postings if it is the text indexed"""
+        indexed = self.__texts.get(key)
+        if indexed is not None and indexed[2] == text:
+            return all(key in self.__postings.get(word, ())
+                       for word in words)
+        return set(words).issubset(tokenize(text))
+
+    def scores(self, words):
+        """returns {key: BM25 score} of the texts holding all of words"""
+        postings = sorted((self.__postings.get(word, {})
+                           for word in set(words)), key=len)
+        if not postings or not postings[0]:
+            return {}
+        keys = set(postings[0]).intersection(*postings[1:])
+        texts = len(self.__texts)
+        average = self.__total / texts
+        scores = dict.fromkeys(keys, 0.0)
+        for found in postings:
+            idf = math.log(1 + (texts - len(found) + 0.5) /
+                           (len(found) + 0.5))
+            for key in keys:
+                count = found[key]
+                length = self.__texts[key][0]
+                scores[key] += idf * count * (BM25_K1 + 1) / (
+                    count + BM25_K1 * (1 - BM25_B + BM25_B * length /
+                                       average))
+        return scores
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+"""
+Contains the Versions class
+"""
+
+from datetime import datetime
+import threading
+import uuid
+
+
+class Versions:
+    """numbers of the writes to the objects of each class since the storage
+    started, with the time of the last one
+
+    The numbers restart from 0 on every start, so the epoch, unique to
+    each start, tells apart the versions of different starts.
+    """
+    # list - callables called with the set of the class names of each write
+    listeners = []
+
+    def __init__(self):
+        """Instantiate versions without writes"""
+        # string - unique to this start of the storage
+        self.epoch = uuid.uuid4().hex
+        # datetime - UTC time of this start, as the writes before are unknown
+        self.started = datetime.utcnow()
+        # dictionary - <class name> -> (number of writes, UTC datetime of
+        # the last one)
+        self.__versions = {}
+        self.__lock = threading.Lock()
+
+    def bump(self, names):
+        """counts a write to the objects of each class name of names"""
+        names = set(names)
+        now = datetime.utcnow()
+        with self.__lock:
+            for name in names:
+                number = self.__versions.get(name, (0, None))[0]
+                self.__versions[name] = (number + 1, now)
+        for listener in Versions.listeners:
+            listener(names)
+
+    def get(self, name):
+        """returns the (epoch, number of writes, UTC datetime of the last
+        one) of the objects of class name"""
+        number, last = self.__versions.get(name, (0, self.started))
+        return self.epoch, number, last
@@ -4,7 +4,7 @@ import models
 from models.base_model import BaseModel, Base
 from os import getenv
 import sqlalchemy
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, Index
 
 
 class Review(BaseModel, Base):
@@ -14,6 +14,9 @@ class Review(BaseModel, Base):
         place_id = Column(String(60), ForeignKey('places.id'), nullable=False)
         user_id = Column(String(60), ForeignKey('users.id'), nullable=False)
         text = Column(String(1024), nullable=False)
+        # for the full-text searches of reviews_search
+        __table_args__ = (Index("ft_reviews_text", "text",
+                                mysql_prefix="FULLTEXT"),)
     else:
         place_id = ""
         user_id = ""
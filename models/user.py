@@ -31,3 +31,16 @@ class User(BaseModel, Base):
         super().__init__(*args, **kwargs)
         if "password" in kwargs:
             self.password = hashlib.md5(self.password.encode()).hexdigest()
+
+    if models.storage_t != "db":
+        @property
+        def places(self):
+            """getter for list of place instances owned by the user"""
+            from models.place import Place
+            return models.storage.related(Place, "user_id", self.id)
+
+        @property
+        def reviews(self):
+            """getter for list of review instances written by the user"""
+            from models.review import Review
+            return models.storage.related(Review, "user_id", self.id)
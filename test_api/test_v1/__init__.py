@@ -1 +0,0 @@
-ii
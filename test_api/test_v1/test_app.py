@@ -4,11 +4,12 @@
 import inspect
 import os
 import unittest
+from unittest import mock
 
 import pep8
 from flask import Flask
 
-from api.v1.app import app, not_found
+from api.v1.app import app, not_found, sync_storage
 from api.v1.views import app_views
 from models import storage
 
@@ -22,6 +23,7 @@ class TestAppPEP8(unittest.TestCase):
         cls.app_f = [
             ("teardown_appcontext", app.teardown_appcontext),
             ("not_found", not_found),
+            ("sync_storage", sync_storage),
         ]
 
     def test_pep8_conformance_app(self):
@@ -83,6 +85,16 @@ class TestApp(unittest.TestCase):
         """Check Blueprint"""
         self.assertIn("app_views", self.app.application.blueprints)
 
+    def test_sync_shared(self):
+        """Test that requests start from the writes of the other workers"""
+        # close() syncs as well, after the request
+        with mock.patch.object(storage, "shared", True, create=True), \
+                mock.patch.object(storage, "sync", create=True) as sync, \
+                mock.patch.object(storage, "close"):
+            response = self.app.get("/api/v1/status")
+        self.assertEqual(response.status_code, 200)
+        sync.assert_called_once_with()
+
     def test_tear_down(self):
         """Test teardown"""
         with self.app.application.app_context():
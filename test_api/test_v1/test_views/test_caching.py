@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+"""Test for the HTTP caching of the read endpoints"""
+from datetime import datetime, timedelta
+import inspect
+import unittest
+from unittest import mock
+
+import pep8
+
+from api.v1.app import app
+from api.v1.views import caching
+from models import storage, storage_t
+from models.amenity import Amenity
+from models.state import State
+
+
+class TestCachingPEP8(unittest.TestCase):
+    """Test Class for PEP8 conformance in the caching of views"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.caching_f = inspect.getmembers(caching, inspect.isfunction)
+
+    def test_pep8_conformance_caching(self):
+        """Test that api/v1/views/caching.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(["api/v1/views/caching.py",
+                                    "test_api/test_v1/test_views/"
+                                    "test_caching.py"])
+        self.assertEqual(
+            result.total_errors, 0, "Found code style errors (and warnings)."
+        )
+
+    def test_caching_func_docstrings(self):
+        """Test for the presence of docstrings in caching functions"""
+        for func in self.caching_f:
+            self.assertTrue(
+                len(func[1].__doc__) >= 1,
+                "{:s} function needs a docstring".format(func[0]),
+            )
+
+
+class TestCaching(unittest.TestCase):
+    """Test Class for the conditional requests of the read endpoints"""
+
+    def setUp(self):
+        """Configure the app and store a state"""
+        self.app = app.test_client()
+        self.app.testing = True
+        self.internal = app.config["INTERNAL_VIEWS"]
+        app.config["INTERNAL_VIEWS"] = True
+        self.state = State(name="Cached State")
+        storage.new(self.state)
+        storage.save()
+        self.state_id = self.state.id
+
+    def tearDown(self):
+        """Tear down test environment"""
+        app.config["INTERNAL_VIEWS"] = self.internal
+        if storage_t == "db":
+            storage.rollback()
+        else:
+            storage.reload()
+
+    def test_etag(self):
+        """Test that responses are validated by ETag until a write"""
+        url = "/api/v1/states/" + self.state_id
+        response = self.app.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+        etag = response.headers["ETag"]
+        response = self.app.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b"")
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.app.get(url + "?pretty=1", headers={
+            "If-None-Match": etag}).status_code, 200)
+        response = self.app.put(url, json={"name": "Renamed"})
+        self.assertEqual(response.status_code, 200)
+        response = self.app.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.get_json()["name"], "Renamed")
+
+    def test_last_modified(self):
+        """Test that responses are validated by Last-Modified"""
+        with mock.patch.object(caching, "datetime") as clock:
+            clock.utcnow.return_value = datetime.utcnow() + timedelta(
+                seconds=2)
+            response = self.app.get("/api/v1/states")
+            self.assertEqual(response.status_code, 200)
+            # the streamed bodies are read to close their request contexts
+            response.get_data()
+            last_modified = response.headers["Last-Modified"]
+            response = self.app.get("/api/v1/states", headers={
+                "If-Modified-Since": last_modified})
+            self.assertEqual(response.status_code, 304)
+        # If-None-Match takes precedence
+        response = self.app.get("/api/v1/states", headers={
+            "If-Modified-Since": last_modified, "If-None-Match": '"other"'})
+        self.assertEqual(response.status_code, 200)
+        response.get_data()
+        response = self.app.get("/api/v1/states", headers={
+            "If-Modified-Since": "Sat, 01 Jan 2000 00:00:00 GMT"})
+        self.assertEqual(response.status_code, 200)
+        response.get_data()
+
+    def test_last_modified_same_second(self):
+        """Test that Last-Modified is neither sent nor validated in the
+        second of the last write, which a later write would not change"""
+        response = self.app.get("/api/v1/states")
+        self.assertEqual(response.status_code, 200)
+        response.get_data()
+        self.assertNotIn("Last-Modified", response.headers)
+        self.assertIn("ETag", response.headers)
+        response = self.app.get("/api/v1/states", headers={
+            "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+        self.assertEqual(response.status_code, 200)
+        response.get_data()
+
+    def test_not_found(self):
+        """Test that errors are not validated"""
+        response = self.app.get("/api/v1/states/missing")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response.headers)
+
+    def test_stats(self):
+        """Test that hits and the bytes they saved are counted"""
+        before = self.app.get("/api/v1/internal/cache").get_json()
+        response = self.app.get("/api/v1/states")
+        size = len(response.get_data())
+        etag = response.headers["ETag"]
+        for _ in range(2):
+            self.assertEqual(self.app.get("/api/v1/states", headers={
+                "If-None-Match": etag}).status_code, 304)
+        after = self.app.get("/api/v1/internal/cache").get_json()
+        self.assertEqual(after["requests"] - before["requests"], 3)
+        self.assertEqual(after["hits"] - before["hits"], 2)
+        self.assertEqual(after["bytes_sent"] - before["bytes_sent"], size)
+        self.assertEqual(after["bytes_saved"] - before["bytes_saved"],
+                         2 * size)
+        self.assertGreater(after["hit_rate"], 0)
+
+    def test_versions_read_once(self):
+        """Test that the versions of all the classes of a view are read
+        at once"""
+        with mock.patch.object(caching.storage, "versions",
+                               wraps=caching.storage.versions) as versions:
+            response = self.app.get("/api/v1/stats")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(versions.call_count, 1)
+        self.assertEqual(len(versions.call_args[0][0]), 6)
+
+
+class TestResponses(unittest.TestCase):
+    """Test Class for the cache of the responses of the read endpoints"""
+
+    def setUp(self):
+        """Configure the app and store two amenities"""
+        self.app = app.test_client()
+        self.app.testing = True
+        self.internal = app.config["INTERNAL_VIEWS"]
+        app.config["INTERNAL_VIEWS"] = True
+        amenities = [Amenity(name="Cached {}".format(i)) for i in range(2)]
+        for amenity in amenities:
+            storage.new(amenity)
+        storage.save()
+        self.amenity_id = amenities[0].id
+
+    def tearDown(self):
+        """Tear down test environment"""
+        app.config["INTERNAL_VIEWS"] = self.internal
+        if storage_t == "db":
+            storage.rollback()
+        else:
+            storage.reload()
+
+    def counts(self):
+        """returns the counts of the response cache"""
+        return self.app.get("/api/v1/internal/cache").get_json()["responses"]
+
+    def test_hit(self):
+        """Test that a response is sent again from the cache"""
+        url = "/api/v1/amenities?limit=1"
+        before = self.counts()
+        # a streamed response is kept once all sent
+        first = self.app.get(url)
+        first.get_data()
+        second = self.app.get(url)
+        second.get_data()
+        after = self.counts()
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertLessEqual(after["bytes"], after["limit"])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.get_data(), first.get_data())
+        self.assertEqual(second.headers["ETag"], first.headers["ETag"])
+        self.assertEqual(second.headers["X-Next-Cursor"],
+                         first.headers["X-Next-Cursor"])
+        self.assertEqual(second.mimetype, "application/json")
+        pretty = self.app.get(url + "&pretty=1")
+        self.assertEqual(pretty.get_json(), first.get_json())
+        self.assertNotEqual(pretty.get_data(), first.get_data())
+
+    def test_hosts(self):
+        """Test that a response is not sent again to another host"""
+        url = "/api/v1/amenities?limit=1"
+        first = self.app.get(url, base_url="http://first.example")
+        first.get_data()
+        second = self.app.get(url, base_url="http://second.example")
+        second.get_data()
+        self.assertNotEqual(second.headers["ETag"], first.headers["ETag"])
+        self.assertIn("//first.example/", first.headers["Link"])
+        self.assertIn("//second.example/", second.headers["Link"])
+
+    def test_invalidate(self):
+        """Test that a write drops the responses of its class"""
+        url = "/api/v1/amenities/" + self.amenity_id
+        self.app.get(url).get_data()
+        self.app.get("/api/v1/states").get_data()
+        before = self.counts()
+        response = self.app.put(url, json={"name": "Renamed"})
+        self.assertEqual(response.status_code, 200)
+        after = self.counts()
+        self.assertGreaterEqual(
+            after["invalidations"] - before["invalidations"], 1)
+        self.assertEqual(self.app.get(url).get_json()["name"], "Renamed")
+        hits = self.counts()["hits"]
+        self.app.get("/api/v1/states").get_data()
+        self.assertEqual(self.counts()["hits"], hits + 1)
+
+    def test_evict(self):
+        """Test that the least recently used responses are evicted"""
+        cache = caching._Responses(10)
+        with app.test_request_context():
+            cache.put("a", {"State"}, b"aaaa", [], False)
+            cache.put("b", {"City"}, b"bbbb", [], True)
+            self.assertEqual(cache.get("a").get_data(), b"aaaa")
+            cache.put("c", {"City"}, b"cccc", [], False)
+            cache.put("d", {"City"}, b"d" * 11, [], False)
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNone(cache.get("d"))
+            self.assertEqual(cache.get("c").get_data(), b"cccc")
+            cache.invalidate({"City"})
+            self.assertIsNone(cache.get("c"))
+            self.assertEqual(cache.get("a").get_data(), b"aaaa")
+        self.assertEqual(cache.to_dict(), {
+            "entries": 1, "bytes": 4, "limit": 10, "hits": 3, "misses": 3,
+            "evictions": 1, "invalidations": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+"""Test Module for the internal statistics views"""
+import inspect
+import unittest
+from unittest import mock
+
+import pep8
+
+from api.v1.app import app
+from api.v1.views import internal
+
+
+class TestInternalViewPEP8(unittest.TestCase):
+    """Test Class for PEP8 conformance in the internal views"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.internal_f = inspect.getmembers(internal, inspect.isfunction)
+
+    def test_pep8_conformance_internal_view(self):
+        """Test that api/v1/views/internal.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(["api/v1/views/internal.py",
+                                    "test_api/test_v1/test_views/"
+                                    "test_internal.py"])
+        self.assertEqual(
+            result.total_errors, 0, "Found code style errors (and warnings)."
+        )
+
+    def test_internal_func_docstrings(self):
+        """Test for the presence of docstrings in internal functions"""
+        for func in self.internal_f:
+            self.assertTrue(
+                len(func[1].__doc__) >= 1,
+                "{:s} function needs a docstring".format(func[0]),
+            )
+
+
+class TestInternal(unittest.TestCase):
+    """Test Class for the internal views"""
+
+    def setUp(self):
+        """Configure the app with the internal views enabled"""
+        self.app = app.test_client()
+        self.app.testing = True
+        self.internal = app.config["INTERNAL_VIEWS"]
+        app.config["INTERNAL_VIEWS"] = True
+
+    def tearDown(self):
+        """Restore the configuration of the internal views"""
+        app.config["INTERNAL_VIEWS"] = self.internal
+
+    def test_get_pool_stats(self):
+        """Test pool route"""
+        stats = {"size": 5, "checked_out": 1, "wait_max": 0.5}
+        with mock.patch.object(internal.storage, "pool_stats", create=True,
+                               return_value=stats):
+            response = self.app.get("/api/v1/internal/pool")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), stats)
+
+    def test_get_pool_stats_without_pool(self):
+        """Test pool route with a storage that has no pool"""
+        with mock.patch.object(internal, "storage", object()):
+            response = self.app.get("/api/v1/internal/pool")
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_cache_stats(self):
+        """Test cache route"""
+        response = self.app.get("/api/v1/internal/cache")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hit_rate", response.get_json())
+        self.assertIn("responses", response.get_json())
+
+    def test_disabled(self):
+        """Test that the internal routes are not found unless enabled"""
+        app.config["INTERNAL_VIEWS"] = False
+        for url in ("/api/v1/internal/pool", "/api/v1/internal/cache"):
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.get_json(), {"error": "Not found"})
+
+    def test_remote(self):
+        """Test that the internal routes are not found from other hosts"""
+        response = self.app.get("/api/v1/internal/cache", environ_base={
+            "REMOTE_ADDR": "10.0.0.1"})
+        self.assertEqual(response.status_code, 404)
+        response = self.app.get("/api/v1/internal/cache", environ_base={
+            "REMOTE_ADDR": "::1"})
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+"""Test for Place view"""
+import inspect
+import unittest
+
+import pep8
+
+from api.v1.app import app
+from api.v1.views import places
+from models import storage, storage_t
+from models.city import City
+from models.place import Place
+from models.state import State
+from models.user import User
+
+
+class TestPlaceViewPEP8(unittest.TestCase):
+    """Test Class for PEP8 conformance in Place view"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.place_f = inspect.getmembers(places, inspect.isfunction)
+
+    def test_pep8_conformance_place_view(self):
+        """Test that api/v1/views/places.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(["api/v1/views/places.py",
+                                    "test_api/test_v1/test_views/"
+                                    "test_places.py"])
+        self.assertEqual(
+            result.total_errors, 0, "Found code style errors (and warnings)."
+        )
+
+    def test_place_func_docstrings(self):
+        """Test for the presence of docstrings in Place functions"""
+        for func in self.place_f:
+            self.assertTrue(
+                len(func[1].__doc__) >= 1,
+                "{:s} function needs a docstring".format(func[0]),
+            )
+
+
+class TestPlacesSearch(unittest.TestCase):
+    """Test Class for the places_search view"""
+
+    def setUp(self):
+        """Configure the app and store 4 places of a city"""
+        self.app = app.test_client()
+        self.app.testing = True
+        self.state = State(name="Search State")
+        self.city = City(name="Search City", state_id=self.state.id)
+        self.user = User(email="search@places", password="pwd")
+        self.places = [Place(name=str(i), city_id=self.city.id,
+                             user_id=self.user.id, number_rooms=i,
+                             price_by_night=(i * 3) % 4 * 10,
+                             latitude=float(i), longitude=0.0,
+                             description=" ".join(["Quiet"] * i))
+                       for i in range(4)]
+        for obj in [self.state, self.city, self.user] + self.places:
+            storage.new(obj)
+        storage.save()
+        self.state_id = self.state.id
+        self.city_id = self.city.id
+        self.ids = [place.id for place in self.places]
+
+    def tearDown(self):
+        """Tear down test environment"""
+        if storage_t == "db":
+            storage.rollback()
+        else:
+            storage.reload()
+
+    def search(self, **search):
+        """returns the ids of the places found in the state"""
+        search["states"] = [self.state_id]
+        response = self.app.post("/api/v1/places_search", json=search)
+        self.assertEqual(response.status_code, 200)
+        return [place["id"] for place in response.get_json()]
+
+    def test_search_state(self):
+        """Test searching the places of a state"""
+        self.assertEqual(sorted(self.search()), sorted(self.ids))
+
+    def test_search_ranges(self):
+        """Test searching places by ranges, ordered and limited"""
+        # prices: 0, 30, 20, 10 for places 0 to 3
+        self.assertEqual(self.search(price_by_night={"min": 10, "max": 20},
+                                     order_by="price_by_night"),
+                         [self.ids[3], self.ids[2]])
+        self.assertEqual(self.search(number_rooms={"min": 1},
+                                     order_by="-price_by_night", limit=2),
+                         [self.ids[1], self.ids[2]])
+
+    def test_search_geo(self):
+        """Test searching places in a box and around a point"""
+        # latitudes: 0, 1, 2, 3 for places 0 to 3, 111 km apart
+        self.assertEqual(sorted(self.search(bbox={
+            "south": 1.5, "west": -1, "north": 3, "east": 1})),
+            sorted(self.ids[2:]))
+        self.assertEqual(self.search(near={"latitude": 2.1,
+                                           "longitude": 0}, limit=2),
+                         [self.ids[2], self.ids[3]])
+        self.assertEqual(self.search(near={"latitude": 0, "longitude": 0,
+                                           "radius": 150},
+                                     number_rooms={"min": 1}),
+                         [self.ids[1]])
+
+    def test_search_text(self):
+        """Test searching places by words of their description"""
+        # place i holds the word i times
+        self.assertEqual(self.search(text="quiet"), self.ids[:0:-1])
+        self.assertEqual(self.search(text="quiet", limit=1), self.ids[3:])
+        self.assertEqual(self.search(text="quiet", order_by="-price_by_night"),
+                         self.ids[1:])
+        self.assertEqual(self.search(text="quiet noisy"), [])
+
+    def test_search_facets(self):
+        """Test counting all the places found along the first ones"""
+        response = self.app.post("/api/v1/places_search", json={
+            "states": [self.state_id], "number_rooms": {"min": 1},
+            "order_by": "price_by_night", "limit": 1, "facets": True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {
+            "facets": {"states": {self.state_id: 3},
+                       "cities": {self.city_id: 3},
+                       "amenities": {}},
+            "places": [response.get_json()["places"][0]]})
+        self.assertEqual(response.get_json()["places"][0]["id"],
+                         self.ids[3])
+
+    def test_search_invalid(self):
+        """Test searching with invalid ids, ranges, order or limit"""
+        for search in ({"states": "s"},
+                       {"states": [{}]},
+                       {"cities": [1]},
+                       {"amenities": [["a"]]},
+                       {"price_by_night": 10},
+                       {"max_guest": {"min": "1"}},
+                       {"number_rooms": {"least": 1}},
+                       {"order_by": "name"},
+                       {"order_by": "--max_guest"},
+                       {"limit": 0},
+                       {"limit": "1"},
+                       {"bbox": {"south": 0, "west": 0, "north": 1}},
+                       {"bbox": {"south": 1, "west": 0, "north": 0,
+                                 "east": 1}},
+                       {"near": {"latitude": 91, "longitude": 0}},
+                       {"near": {"latitude": 0, "longitude": 0,
+                                 "radius": 0}},
+                       {"near": {"latitude": 0, "longitude": 0},
+                        "order_by": "max_guest"},
+                       {"text": ["quiet"]},
+                       {"facets": "yes"}):
+            response = self.app.post("/api/v1/places_search", json=search)
+            self.assertEqual(response.status_code, 400, search)
+        response = self.app.post("/api/v1/places_search", json=[])
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+"""Test for Place_Reviews view"""
+import inspect
+import unittest
+
+import pep8
+
+from api.v1.app import app
+from api.v1.views import places_reviews
+from models import storage, storage_t
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+
+
+class TestPlaceReviewViewPEP8(unittest.TestCase):
+    """Test Class for PEP8 conformance in Place_Reviews view"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.review_f = inspect.getmembers(places_reviews, inspect.isfunction)
+
+    def test_pep8_conformance_review_view(self):
+        """Test that api/v1/views/places_reviews.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(["api/v1/views/places_reviews.py",
+                                    "test_api/test_v1/test_views/"
+                                    "test_places_reviews.py"])
+        self.assertEqual(
+            result.total_errors, 0, "Found code style errors (and warnings)."
+        )
+
+    def test_review_func_docstrings(self):
+        """Test for the presence of docstrings in Place_Reviews functions"""
+        for func in self.review_f:
+            self.assertTrue(
+                len(func[1].__doc__) >= 1,
+                "{:s} function needs a docstring".format(func[0]),
+            )
+
+
+class TestReviewsSearch(unittest.TestCase):
+    """Test Class for the reviews_search view"""
+
+    def setUp(self):
+        """Configure the app and store 4 reviews of 2 places"""
+        self.app = app.test_client()
+        self.app.testing = True
+        self.state = State(name="Review State")
+        self.city = City(name="Review City", state_id=self.state.id)
+        self.user = User(email="search@reviews", password="pwd")
+        self.places = [Place(name=str(i), city_id=self.city.id,
+                             user_id=self.user.id) for i in range(2)]
+        # review i holds the word "sunny" i times
+        self.reviews = [Review(place_id=self.places[i % 2].id,
+                               user_id=self.user.id,
+                               text=" ".join(["Sunny"] * i + ["terrace"]))
+                        for i in range(4)]
+        for obj in [self.state, self.city, self.user] + self.places + \
+                self.reviews:
+            storage.new(obj)
+        storage.save()
+        self.place_ids = [place.id for place in self.places]
+        self.ids = [review.id for review in self.reviews]
+
+    def tearDown(self):
+        """Tear down test environment"""
+        if storage_t == "db":
+            storage.rollback()
+        else:
+            storage.reload()
+
+    def search(self, **search):
+        """returns the ids of the reviews found"""
+        response = self.app.post("/api/v1/reviews_search", json=search)
+        self.assertEqual(response.status_code, 200)
+        return [review["id"] for review in response.get_json()]
+
+    def test_search(self):
+        """Test searching reviews by relevance"""
+        self.assertEqual(self.search(text="sunny terrace",
+                                     places=self.place_ids),
+                         self.ids[:0:-1])
+        self.assertEqual(self.search(text="sunny", places=self.place_ids,
+                                     limit=2), self.ids[:1:-1])
+        self.assertEqual(self.search(text="sunny",
+                                     places=self.place_ids[:1]),
+                         [self.ids[2]])
+        self.assertEqual(self.search(text="sunny", users=["missing"]), [])
+
+    def test_search_invalid(self):
+        """Test searching reviews without text or with invalid filters"""
+        for search in ({}, {"text": 1}, {"text": "a", "places": "p"},
+                       {"text": "a", "places": [{}]},
+                       {"text": "a", "users": [None]},
+                       {"text": "a", "limit": 0}):
+            response = self.app.post("/api/v1/reviews_search", json=search)
+            self.assertEqual(response.status_code, 400, search)
+        response = self.app.post("/api/v1/reviews_search", data="text")
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
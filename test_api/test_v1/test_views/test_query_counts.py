@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+"""Test the number of queries of the views reading relationships"""
+import contextlib
+import importlib
+import unittest
+
+import pep8
+import sqlalchemy
+
+from api.v1.app import app
+from models import storage, storage_t
+from models.amenity import Amenity
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+
+
+class TestQueryCountsPEP8(unittest.TestCase):
+    """Test Class for PEP8 conformance of the query count tests"""
+
+    def test_pep8_conformance_test_query_counts(self):
+        """Test that test_query_counts.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(
+                ["test_api/test_v1/test_views/test_query_counts.py"]
+                )
+        self.assertEqual(
+            result.total_errors, 0, "Found code style errors (and warnings)."
+        )
+
+
+@contextlib.contextmanager
+def count_queries():
+    """counts the statements sent to the database in the yielded list"""
+    count = [0]
+
+    def record(*args):
+        """counts one statement"""
+        count[0] += 1
+    engine = storage._DBStorage__engine
+    sqlalchemy.event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield count
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", record)
+
+
+@unittest.skipIf(storage_t != "db", "not testing db storage")
+class TestQueryCounts(unittest.TestCase):
+    """Test that views issue as many queries whatever the result size"""
+
+    def setUp(self):
+        """Configure the app"""
+        self.app = app.test_client()
+        self.app.testing = True
+        self.created = []
+
+    def tearDown(self):
+        """Delete the objects created, children first"""
+        for cls, id in reversed(self.created):
+            obj = storage.get(cls, id)
+            if obj is not None:
+                storage.delete(obj)
+                storage.save()
+        storage.close()
+
+    def create(self, obj):
+        """saves obj and returns it"""
+        storage.new(obj)
+        storage.save()
+        self.created.append((type(obj), obj.id))
+        return obj
+
+    def populate(self, size):
+        """creates size states, the first of size cities, the first city of
+        size places and the first place of size reviews and amenities, and
+        returns the ids of these first ones"""
+        user = self.create(User(email="query@count", password="pwd"))
+        states = [self.create(State(name="State")) for _ in range(size)]
+        cities = [self.create(City(name="City", state_id=state.id))
+                  for state in states[:1] * size]
+        places = [self.create(Place(name="Place", city_id=cities[0].id,
+                                    user_id=user.id))
+                  for _ in range(size)]
+        amenities = [self.create(Amenity(name="Amenity"))
+                     for _ in range(size)]
+        places[0].amenities.extend(amenities)
+        storage.save()
+        for _ in range(size):
+            self.create(Review(text="Review", place_id=places[0].id,
+                               user_id=user.id))
+        ids = states[0].id, cities[0].id, places[0].id, amenities[0].id
+        # start the requests from an empty session
+        storage.close()
+        return ids
+
+    def count(self, client, method, url, **kwargs):
+        """returns the number of queries of one request"""
+        with count_queries() as count:
+            response = getattr(client, method)(url, **kwargs)
+            # streamed bodies are read from storage as they are sent
+            response.get_data()
+        self.assertEqual(response.status_code, 200, url)
+        return count[0]
+
+    def counts(self, size):
+        """returns the number of queries of each view for size objects"""
+        state_id, city_id, place_id, amenity_id = self.populate(size)
+        pages = app.test_client(), importlib.import_module(
+            "web_flask.8-cities_by_states").app.test_client()
+        counts = {
+            "cities": self.count(
+                self.app, "get", "/api/v1/states/{}/cities".format(state_id)),
+            "places": self.count(
+                self.app, "get", "/api/v1/cities/{}/places".format(city_id)),
+            "reviews": self.count(
+                self.app, "get", "/api/v1/places/{}/reviews".format(place_id)),
+            "amenities": self.count(
+                self.app, "get",
+                "/api/v1/places/{}/amenities".format(place_id)),
+            "search": self.count(
+                self.app, "post", "/api/v1/places_search",
+                json={"states": [state_id], "amenities": [amenity_id]}),
+            "cities_by_states": self.count(
+                pages[1], "get", "/cities_by_states"),
+        }
+        self.tearDown()
+        self.created = []
+        return counts
+
+    def test_bounded_queries(self):
+        """Test that the queries do not grow with the number of objects"""
+        small = self.counts(1)
+        large = self.counts(8)
+        self.assertEqual(small, large)
+        for view, count in large.items():
+            self.assertLessEqual(count, 4, view)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,4 @@
-i#!/usr/bin/python3
+#!/usr/bin/python3
 """Test for State view"""
 import inspect
 import unittest
@@ -84,6 +84,48 @@ class TestStates(unittest.TestCase):
         for state in data:
             self.assertIsInstance(state, dict)
 
+    def test_get_states_by_pages(self):
+        """Test GET all states following the next page links"""
+        states = [State(name="Page State") for _ in range(3)]
+        for state in states:
+            storage.new(state)
+        storage.save()
+        expected = [state.id for state in states]
+        ids = []
+        url = "/api/v1/states?limit=2"
+        while url:
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.get_json()
+            self.assertLessEqual(len(page), 2)
+            ids += [state["id"] for state in page]
+            url = None
+            if "X-Next-Cursor" in response.headers:
+                link = response.headers["Link"]
+                self.assertIn(response.headers["X-Next-Cursor"], link)
+                url = link.partition(">")[0].lstrip("<")
+        self.assertEqual(len(ids), len(set(ids)))
+        for id in expected:
+            self.assertIn(id, ids)
+
+    def test_get_states_compact(self):
+        """Test GET all states is compact unless asked to be pretty"""
+        storage.new(State(name="Compact State"))
+        storage.save()
+        response = self.app.get("/api/v1/states")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertNotIn(b"\n ", response.data)
+        pretty = self.app.get("/api/v1/states?pretty=1")
+        self.assertIn(b'\n    "name": ', pretty.data)
+        self.assertEqual(pretty.get_json(), response.get_json())
+
+    def test_get_states_invalid_page(self):
+        """Test GET all states with an invalid limit or cursor"""
+        for query in ("limit=0", "limit=x", "limit=100000", "cursor=x"):
+            response = self.app.get("/api/v1/states?" + query)
+            self.assertEqual(response.status_code, 400, query)
+
     def test_get_state(self):
         """Test GET a specific state"""
         state = State(name="Test State")
@@ -96,6 +138,17 @@ class TestStates(unittest.TestCase):
         self.assertIsInstance(data, dict)
         self.assertEqual(data["id"], state.id)
 
+    def test_get_state_pretty(self):
+        """Test GET a specific state indented on request"""
+        state = State(name="Pretty State")
+        storage.new(state)
+        storage.save()
+        url = f"/api/v1/states/{state.id}"
+        response = self.app.get(url)
+        self.assertNotIn(b"\n", response.data.rstrip())
+        response = self.app.get(url + "?pretty=1")
+        self.assertIn(b'\n  "name": "Pretty State"', response.data)
+
     def test_delete_state(self):
         """Test DELETE a specific state"""
         state = State(name="Test State")
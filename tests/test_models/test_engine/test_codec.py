@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+"""
+Contains the tests of the FileStorage snapshot codecs
+"""
+
+from datetime import datetime
+import inspect
+import models
+from models.engine import codec
+from models.place import Place
+from models.state import State
+import os
+import pep8
+import pickle
+import tempfile
+import unittest
+
+
+class TestCodecDocs(unittest.TestCase):
+    """Tests to check the documentation and style of the codec module"""
+
+    def test_pep8_conformance_codec(self):
+        """Test that models/engine/codec.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/codec.py',
+                                    'tests/test_models/test_engine/'
+                                    'test_codec.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_codec_docstrings(self):
+        """Test for the presence of docstrings in the codec module"""
+        self.assertTrue(len(codec.__doc__) >= 1)
+        for name, obj in inspect.getmembers(codec, inspect.isclass):
+            if obj.__module__ == codec.__name__:
+                self.assertTrue(len(obj.__doc__) >= 1, name)
+                for func in inspect.getmembers(obj, inspect.isfunction):
+                    self.assertTrue(len(func[1].__doc__) >= 1, func[0])
+
+
+class TestCodecs(unittest.TestCase):
+    """Test the round trip of records through each codec"""
+
+    def setUp(self):
+        """Build records like FileStorage does"""
+        state = State(name="Nevada")
+        place = Place(name="Loft", city_id="c", number_rooms=3,
+                      latitude=None, amenity_ids=["a", "b"])
+        self.records = {}
+        for obj in (state, place):
+            attrs = obj.__dict__.copy()
+            attrs["__class__"] = obj.__class__.__name__
+            self.records[obj.__class__.__name__ + "." + obj.id] = attrs
+
+    def test_round_trip(self):
+        """Test that decode(encode(records)) gives the records back"""
+        for name, instance in codec.codecs.items():
+            with self.subTest(codec=name):
+                data = instance.encode(self.records)
+                self.assertIs(codec.sniff(data), instance)
+                decoded = dict(instance.decode(data))
+                self.assertEqual(decoded.keys(), self.records.keys())
+                for key, attrs in decoded.items():
+                    cls = models.engine.file_storage.classes[
+                        attrs["__class__"]]
+                    self.assertEqual(cls(**attrs).to_dict(),
+                                     cls(**self.records[key]).to_dict())
+
+    def test_json_is_to_dict(self):
+        """Test that the JSON codec writes what to_dict() returns"""
+        data = codec.codecs["json"].encode(self.records)
+        for key, attrs in codec.codecs["json"].decode(data):
+            self.assertIsInstance(attrs["created_at"], str)
+            self.assertEqual(
+                attrs, models.engine.file_storage.classes[
+                    attrs["__class__"]](**attrs).to_dict())
+
+    def test_columnar_refuses_globals(self):
+        """Test that a columnar snapshot cannot load arbitrary objects"""
+        data = codec.ColumnarCodec.magic + pickle.dumps([datetime.now()])
+        with self.assertRaises(pickle.UnpicklingError):
+            list(codec.codecs["columnar"].decode(data))
+
+    def test_convert(self):
+        """Test that convert() switches a snapshot between codecs"""
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "file.json")
+            target = os.path.join(tmp, "file.bin")
+            with open(source, "wb") as f:
+                f.write(codec.codecs["json"].encode(self.records))
+            codec.convert("columnar", source, target)
+            with open(target, "rb") as f:
+                data = f.read()
+            self.assertIs(codec.sniff(data), codec.codecs["columnar"])
+            self.assertEqual(dict(codec.sniff(data).decode(data)).keys(),
+                             self.records.keys())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,7 +18,9 @@ from models.user import User
 import json
 import os
 import pep8
+import sqlite3
 import unittest
+from unittest import mock
 from models import storage
 DBStorage = db_storage.DBStorage
 classes = {"Amenity": Amenity, "City": City, "Place": Place,
@@ -70,6 +72,26 @@ test_db_storage.py'])
                             "{:s} method needs a docstring".format(func[0]))
 
 
+class TestTimedQueuePool(unittest.TestCase):
+    """Test the checkout statistics of the DBStorage connection pool"""
+
+    def test_checkout_statistics(self):
+        """Test that checkouts and their timeouts are counted"""
+        pool = db_storage._TimedQueuePool(
+            lambda: sqlite3.connect(":memory:"), pool_size=1,
+            max_overflow=0, timeout=0.05)
+        conn = pool.connect()
+        with self.assertRaises(sqlalchemy.exc.TimeoutError):
+            pool.connect()
+        conn.close()
+        pool.connect().close()
+        self.assertEqual(pool.checkouts, 3)
+        self.assertEqual(pool.timeouts, 1)
+        self.assertGreaterEqual(pool.wait_max, 0.05)
+        self.assertGreaterEqual(pool.wait_total, pool.wait_max)
+        self.assertEqual(pool.checkedout(), 0)
+
+
 @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
 class TestDBStorage(unittest.TestCase):
     """Test the DBStorage class"""
@@ -119,11 +141,333 @@ class TestDBStorage(unittest.TestCase):
         retrieved_state = storage.get(State, self.state.id)
         self.assertEqual(retrieved_state, self.state)
 
+    def test_get_identity_map(self):
+        """Test that get returns loaded objects without a query"""
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            """records the statements sent to the database"""
+            statements.append(statement)
+        engine = storage._DBStorage__engine
+        sqlalchemy.event.listen(engine, "before_cursor_execute", record)
+        try:
+            self.assertIs(storage.get("State", self.state.id), self.state)
+        finally:
+            sqlalchemy.event.remove(engine, "before_cursor_execute", record)
+        self.assertEqual(statements, [])
+        self.assertIsNone(storage.get(State, "missing"))
+        self.assertIsNone(storage.get(BaseModel, self.state.id))
+
+    def test_get_many(self):
+        """Test that get_many returns the objects found in order of ids"""
+        self.assertEqual(
+            storage.get_many(City, [self.city.id, "missing", self.city.id]),
+            [self.city])
+        self.assertEqual(storage.get_many("State", [self.state.id]),
+                         [self.state])
+        self.assertEqual(storage.get_many(State, []), [])
+
+    def test_page(self):
+        """Test that page returns filtered objects by pages"""
+        objs, after = storage.page(City, 1, state_id=self.state.id)
+        self.assertEqual(objs, [self.city])
+        self.assertIsNone(after)
+        objs, after = storage.page("State", 1)
+        while after:
+            last = objs[-1]
+            objs, after = storage.page(State, 1, after)
+            self.assertLess((last.created_at, last.id),
+                            (objs[0].created_at, objs[0].id))
+        self.assertEqual(storage.page(City, 1, state_id="missing"),
+                         ([], None))
+
+    def test_search_places(self):
+        """Test that search_places filters by location and amenities"""
+        user = User(email="search@places", password="pwd")
+        amenities = [Amenity(name="Wifi"), Amenity(name="Pool")]
+        places = [Place(name=str(i), city_id=self.city.id, user_id=user.id,
+                        price_by_night=100 - i, number_rooms=i)
+                  for i in range(3)]
+        places[0].amenities.extend(amenities)
+        places[1].amenities.append(amenities[0])
+        for obj in [user] + amenities + places:
+            storage.new(obj)
+        storage.save()
+        try:
+            ids = [place.id for place in places]
+            self.assertEqual([p.id for p in storage.search_places(
+                [self.state.id], amenities=[amenities[0].id])], ids[:2])
+            self.assertEqual([p.id for p in storage.search_places(
+                cities=[self.city.id], amenities=[a.id for a in amenities],
+                batch=1)], ids[:1])
+            self.assertEqual(list(storage.search_places(
+                amenities=["missing"])), [])
+            self.assertEqual([p.id for p in storage.search_places(
+                cities=[self.city.id], ranges={"number_rooms": (1, None)},
+                order_by="price_by_night", batch=1)], ids[:0:-1])
+            self.assertEqual([p.id for p in storage.search_places(
+                cities=[self.city.id], order_by="-price_by_night",
+                limit=2, batch=1)], ids[:2])
+        finally:
+            for obj in places + amenities + [user]:
+                storage.delete(obj)
+            storage.save()
+
+    def test_search_places_geo(self):
+        """Test that search_places filters by box and distance"""
+        user = User(email="search@places", password="pwd")
+        # longitudes: 179, -179.5, 0 and none, 111 km apart per degree
+        places = [Place(name=str(i), city_id=self.city.id, user_id=user.id,
+                        latitude=None if longitude is None else 0.0,
+                        longitude=longitude)
+                  for i, longitude in enumerate((179.0, -179.5, 0.0, None))]
+        for obj in [user] + places:
+            storage.new(obj)
+        storage.save()
+        try:
+            ids = [place.id for place in places]
+            self.assertEqual(sorted(p.id for p in storage.search_places(
+                cities=[self.city.id], bbox=(-1, 178, 1, -179))),
+                sorted(ids[:2]))
+            self.assertEqual([p.id for p in storage.search_places(
+                cities=[self.city.id], near=(0, 179.9, None))], ids[1::-1] +
+                ids[2:3])
+            self.assertEqual([p.id for p in storage.search_places(
+                cities=[self.city.id], near=(0, 179.9, 100))], ids[1:2])
+            self.assertEqual([p.id for p in storage.search_places(
+                cities=[self.city.id], near=(0, 1, None), limit=2)],
+                ids[2::-2])
+        finally:
+            for obj in places + [user]:
+                storage.delete(obj)
+            storage.save()
+
+    def test_place_facets(self):
+        """Test that place_facets counts the places found by state, city
+        and amenity"""
+        user = User(email="search@facets", password="pwd")
+        city = City(name="Facet City", state_id=self.state.id)
+        amenities = [Amenity(name="Wifi"), Amenity(name="Pool")]
+        places = [Place(name=str(i), city_id=(self.city, city)[i % 2].id,
+                        user_id=user.id, number_rooms=i)
+                  for i in range(3)]
+        places[0].amenities.extend(amenities)
+        places[1].amenities.append(amenities[0])
+        for obj in [user, city] + amenities + places:
+            storage.new(obj)
+        storage.save()
+        try:
+            ids = [self.state.id, self.city.id, city.id] + \
+                [amenity.id for amenity in amenities]
+            counts = storage.place_facets(cities=[self.city.id, ids[2]])
+            self.assertEqual(counts, {
+                "states": {ids[0]: 3}, "cities": {ids[1]: 2, ids[2]: 1},
+                "amenities": {ids[3]: 2, ids[4]: 1}})
+            counts = storage.place_facets(
+                states=[self.state.id], amenities=[ids[3]],
+                ranges={"number_rooms": (1, None)})
+            self.assertEqual(counts, {
+                "states": {ids[0]: 1}, "cities": {ids[2]: 1},
+                "amenities": {ids[3]: 1}})
+        finally:
+            for obj in places + amenities + [city, user]:
+                storage.delete(obj)
+            storage.save()
+
+    def test_search_text(self):
+        """Test that search_places and search_reviews match all words and
+        rank by relevance"""
+        user = User(email="search@texts", password="pwd")
+        places = [Place(name=str(i), city_id=self.city.id, user_id=user.id,
+                        description=" ".join(["sea"] * i + ["view"]),
+                        price_by_night=i)
+                  for i in range(3)]
+        reviews = [Review(place_id=places[0].id, user_id=user.id,
+                          text=text) for text in ("Quiet", "quiet QUIET")]
+        for obj in [user] + places + reviews:
+            storage.new(obj)
+        storage.save()
+        try:
+            ids = [place.id for place in places]
+            review_ids = [review.id for review in reviews]
+            self.assertEqual([p.id for p in storage.search_places(
+                cities=[self.city.id], text="sea view", batch=1)],
+                ids[:0:-1])
+            self.assertEqual([p.id for p in storage.search_places(
+                cities=[self.city.id], text="sea", order_by="price_by_night",
+                limit=1)], ids[1:2])
+            self.assertEqual([r.id for r in storage.search_reviews(
+                "quiet", places=[places[0].id])], review_ids[::-1])
+            self.assertEqual([r.id for r in storage.search_reviews(
+                "quiet", users=[user.id], limit=1)], review_ids[1:])
+            self.assertEqual(list(storage.search_reviews("")), [])
+        finally:
+            for obj in reviews + places + [user]:
+                storage.delete(obj)
+            storage.save()
+
+    def test_fulltext_added(self):
+        """Test that the indexes missing from existing tables are added,
+        and that texts are searched by LIKE while they cannot be"""
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            """records the statements sent to the database"""
+            statements.append(statement)
+        engine = storage._DBStorage__engine
+        index = [index for index in Base.metadata.tables["reviews"].indexes
+                 if index.name == "ft_reviews_text"][0]
+        user = User(email="fulltext@texts", password="pwd")
+        place = Place(name="Added", city_id=self.city.id, user_id=user.id)
+        reviews = [Review(place_id=place.id, user_id=user.id, text=text)
+                   for text in ("quiet", "very quiet", "loud")]
+        for obj in [user, place] + reviews:
+            storage.new(obj)
+        storage.save()
+        index.drop(engine)
+        try:
+            denied = sqlalchemy.exc.OperationalError(
+                "CREATE INDEX", {}, Exception("denied"))
+            with mock.patch.object(sqlalchemy.Index, "create",
+                                   side_effect=denied), \
+                    self.assertLogs("models.engine.db_storage", "WARNING"):
+                storage._DBStorage__add_indexes()
+            sqlalchemy.event.listen(engine, "before_cursor_execute", record)
+            try:
+                found = storage.search_reviews("quiet", places=[place.id])
+                self.assertEqual({r.id for r in found},
+                                 {r.id for r in reviews[:2]})
+            finally:
+                sqlalchemy.event.remove(engine, "before_cursor_execute",
+                                        record)
+            self.assertIn("LIKE", statements[0])
+            self.assertNotIn("MATCH", statements[0])
+        finally:
+            storage._DBStorage__add_indexes()
+            for obj in reviews + [place, user]:
+                storage.delete(obj)
+            storage.save()
+        self.assertIn("ft_reviews_text", {
+            index["name"] for index in
+            sqlalchemy.inspect(engine).get_indexes("reviews")})
+
+    def test_version(self):
+        """Test that committed writes bump the version of their class"""
+        epoch, number, last = storage.version(State)
+        state = State(name="Versioned")
+        storage.new(state)
+        storage.count(State)
+        self.assertEqual(storage.version("State"), (epoch, number, last))
+        storage.save()
+        self.assertEqual(storage.version(State)[:2], (epoch, number + 1))
+        city = storage.version(City)
+        storage.delete(state)
+        storage.count(State)
+        storage.rollback()
+        self.assertEqual(storage.version(State)[:2], (epoch, number + 1))
+        storage.delete(state)
+        storage.save()
+        self.assertEqual(storage.version(State)[:2], (epoch, number + 2))
+        self.assertEqual(storage.version(City), city)
+
+    def test_versions(self):
+        """Test that the versions of several classes are read in one
+        query"""
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            """records the statements sent to the database"""
+            statements.append(statement)
+        expected = [storage.version(State), storage.version(City),
+                    storage.version(BaseModel)]
+        engine = storage._DBStorage__engine
+        sqlalchemy.event.listen(engine, "before_cursor_execute", record)
+        try:
+            versions = storage.versions([State, "City", BaseModel])
+        finally:
+            sqlalchemy.event.remove(engine, "before_cursor_execute", record)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(versions, expected)
+        self.assertEqual(storage.versions([]), [])
+
+    def test_version_shared(self):
+        """Test that the writes committed by another process are seen"""
+        version = storage.version(State)
+        storage.rollback()
+        table = db_storage.class_versions
+        # as another process would commit a write to State
+        with storage._DBStorage__engine.connect() as connection:
+            connection.execute(table.update().where(
+                table.c.name == "State").values(number=table.c.number + 1))
+        self.assertEqual(storage.version(State)[:2],
+                         (version[0], version[1] + 1))
+
     def test_count(self):
         """Test the count method"""
         self.assertEqual(storage.count(State), 1)
         self.assertEqual(storage.count(City), 1)
 
+    def test_count_all(self):
+        """Test the count method without class or with a class name"""
+        self.assertEqual(storage.count(), 2)
+        self.assertEqual(storage.count("State"), 1)
+        self.assertEqual(storage.count(BaseModel), 0)
+
+    def test_counts(self):
+        """Test that committed inserts and deletes update the counts"""
+        with mock.patch.object(DBStorage, "check_counts", True):
+            counts = storage.counts()
+            self.assertEqual(set(counts), set(classes))
+            self.assertEqual((counts["State"], counts["City"]), (1, 1))
+            state = State(name="Counted")
+            storage.new(state)
+            self.assertEqual(storage.counts()["State"], 1)
+            storage.save()
+            self.assertEqual(storage.counts()["State"], 2)
+            storage.delete(state)
+            storage.count(State)
+            storage.rollback()
+            self.assertEqual(storage.counts()["State"], 2)
+            storage.delete(state)
+            storage.save()
+            self.assertEqual(storage.counts()["State"], 1)
+
+    def test_check_counts(self):
+        """Test that counts differing from the database are reported"""
+        storage.counts()
+        counts = storage._DBStorage__counts
+        counts["State"] += 1
+        try:
+            with mock.patch.object(DBStorage, "check_counts", True):
+                self.assertRaises(RuntimeError, storage.counts)
+        finally:
+            counts["State"] -= 1
+
+    def test_counts_recounted(self):
+        """Test that the rows are counted again once another process
+        committed a write, and only then"""
+        storage.counts()
+        state = State(name="Counted")
+        storage.new(state)
+        storage.save()
+        try:
+            with mock.patch.object(DBStorage, "_DBStorage__recount") as \
+                    recount:
+                self.assertEqual(storage.counts()["State"], 2)
+            recount.assert_not_called()
+            # as if another process had inserted a State
+            storage._DBStorage__counts["State"] -= 1
+            self.assertEqual(storage.counts()["State"], 1)
+            table = db_storage.class_versions
+            with storage._DBStorage__engine.connect() as connection:
+                connection.execute(table.update().where(
+                    table.c.name == "State").values(
+                        number=table.c.number + 1))
+            self.assertEqual(storage.counts()["State"], 2)
+        finally:
+            storage.delete(state)
+            storage.save()
+
     def test_all_with_class(self):
         """Test the all method with class name argument"""
         states = storage.all(State)
@@ -7,6 +7,7 @@ from datetime import datetime
 import inspect
 import models
 from models.engine import file_storage
+from models.engine.codec import codecs, ColumnarCodec
 from models.amenity import Amenity
 from models.base_model import BaseModel
 from models.city import City
@@ -18,7 +19,13 @@ from models import storage
 import json
 import os
 import pep8
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 FileStorage = file_storage.FileStorage
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
@@ -127,8 +134,1246 @@ class TestFileStorage(unittest.TestCase):
         get_user = storage.get(User, users.id)
         self.assertAlmostEqual(users, get_user)
 
+    def test_get_many(self):
+        """test storage get_many method"""
+        first = State(name="First")
+        second = State(name="Second")
+        storage.new(first)
+        storage.new(second)
+        self.assertEqual(
+            storage.get_many(State, [second.id, "missing", first.id,
+                                     second.id]), [second, first])
+        self.assertEqual(storage.get_many("State", [first.id]), [first])
+        self.assertEqual(storage.get_many(City, [first.id]), [])
+        self.assertEqual(storage.get_many(State, []), [])
+
     def test_count_file_storage(self):
         """tset storage_count_method"""
         count = storage.count()
         total_count = len(storage.all())
         self.assertAlmostEqual(count, total_count)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_close_skips_reload_when_file_unchanged(self):
+        """Test that close() does not re-read an unchanged file.json"""
+        storage = FileStorage()
+        storage.save()
+        with mock.patch.object(FileStorage, "reload") as reload:
+            storage.close()
+        reload.assert_not_called()
+        self.assertTrue(storage.is_closed)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_close_reloads_when_file_changed(self):
+        """Test that close() picks up changes made to file.json on disk"""
+        storage = FileStorage()
+        storage.save()
+        state = State(name="Written elsewhere")
+        with open("file.json", "r") as f:
+            js = json.load(f)
+        js["State." + state.id] = state.to_dict()
+        with open("file.json", "w") as f:
+            json.dump(js, f)
+        self.assertTrue(storage.changed_on_disk())
+        storage.close()
+        self.assertFalse(storage.changed_on_disk())
+        self.assertIn("State." + state.id, storage.all())
+        storage.delete(storage.all()["State." + state.id])
+        storage.save()
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_class_index_follows_new_and_delete(self):
+        """Test that all(cls), get() and count(cls) track new and delete"""
+        storage = FileStorage()
+        save = FileStorage._FileStorage__objects
+        FileStorage._FileStorage__objects = {}
+        try:
+            state = State(name="Indexed")
+            city = City(name="Indexed", state_id=state.id)
+            storage.new(state)
+            storage.new(city)
+            self.assertEqual(storage.all(State),
+                             {"State." + state.id: state})
+            self.assertEqual(storage.all("City"), {"City." + city.id: city})
+            self.assertIs(storage.get("State", state.id), state)
+            self.assertIsNone(storage.get(City, state.id))
+            self.assertEqual(storage.count(State), 1)
+            storage.delete(state)
+            self.assertEqual(storage.all(State), {})
+            self.assertIsNone(storage.get(State, state.id))
+            self.assertEqual(storage.count(State), 0)
+            self.assertEqual(storage.count(), 1)
+        finally:
+            FileStorage._FileStorage__objects = save
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_class_index_rebuilt_when_objects_replaced(self):
+        """Test that the class index follows a replaced __objects dict"""
+        storage = FileStorage()
+        save = FileStorage._FileStorage__objects
+        amenity = Amenity(name="Wifi")
+        FileStorage._FileStorage__objects = {"Amenity." + amenity.id: amenity}
+        try:
+            self.assertEqual(storage.count(Amenity), 1)
+            self.assertIs(storage.get(Amenity, amenity.id), amenity)
+        finally:
+            FileStorage._FileStorage__objects = save
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_related_follows_foreign_keys(self):
+        """Test that related() tracks new, delete and reparenting on save"""
+        storage = FileStorage()
+        save = FileStorage._FileStorage__objects
+        FileStorage._FileStorage__objects = {}
+        try:
+            ca = State(name="California")
+            nv = State(name="Nevada")
+            city = City(name="Reno", state_id=ca.id)
+            for obj in (ca, nv, city):
+                storage.new(obj)
+            self.assertEqual(storage.related(City, "state_id", ca.id),
+                             [city])
+            self.assertEqual(ca.cities, [city])
+            city.state_id = nv.id
+            self.assertEqual(ca.cities, [])
+            storage.new(city)
+            self.assertEqual(nv.cities, [city])
+            storage.delete(city)
+            self.assertEqual(nv.cities, [])
+            self.assertEqual(storage.related(City, "name", "Reno"), [])
+        finally:
+            FileStorage._FileStorage__objects = save
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_place_relationship_properties(self):
+        """Test City.places, Place.reviews and Place.amenities"""
+        storage = FileStorage()
+        save = FileStorage._FileStorage__objects
+        FileStorage._FileStorage__objects = {}
+        try:
+            user = User(email="a@b.c", password="pwd")
+            city = City(name="Reno")
+            place = Place(name="Loft", city_id=city.id, user_id=user.id)
+            review = Review(text="Quiet", place_id=place.id, user_id=user.id)
+            amenity = Amenity(name="Wifi")
+            place.amenity_ids = [amenity.id, "missing"]
+            for obj in (user, city, place, review, amenity):
+                storage.new(obj)
+            self.assertEqual(city.places, [place])
+            self.assertEqual(place.reviews, [review])
+            self.assertEqual(place.amenities, [amenity])
+            self.assertEqual(user.places, [place])
+            self.assertEqual(user.reviews, [review])
+        finally:
+            FileStorage._FileStorage__objects = save
+
+
+class TemporaryFileStorage(unittest.TestCase):
+    """Base class running FileStorage tests against a temporary file"""
+
+    def setUp(self):
+        """Point FileStorage at an empty store in a temporary directory"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.patches = [
+            mock.patch.object(FileStorage, "_FileStorage__file_path",
+                              self.path),
+            mock.patch.object(FileStorage, "_FileStorage__objects", {}),
+            mock.patch.object(FileStorage, "_FileStorage__dirty", {}),
+            mock.patch.object(FileStorage, "_FileStorage__journal_len", 0),
+            mock.patch.object(FileStorage, "journal", True),
+            mock.patch.object(FileStorage, "journal_limit", 5),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.storage = FileStorage()
+
+    def tearDown(self):
+        """Restore the shared FileStorage state"""
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.tmp.cleanup()
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageJournal(TemporaryFileStorage):
+    """Test the journaled persistence mode of FileStorage"""
+
+    def journal(self):
+        """Return the records of the journal file"""
+        with open(self.path + ".log", "r") as f:
+            return [json.loads(line) for line in f]
+
+    def test_save_appends_changes_only(self):
+        """Test that save() appends upserts and deletes to the journal"""
+        state = State(name="California")
+        city = City(name="Fresno", state_id=state.id)
+        self.storage.new(state)
+        self.storage.new(city)
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.path))
+        self.storage.delete(city)
+        self.storage.save()
+        self.storage.save()
+        ops = [(r["op"], r["key"]) for r in self.journal()]
+        self.assertEqual(ops, [("upsert", "State." + state.id),
+                               ("upsert", "City." + city.id),
+                               ("delete", "City." + city.id)])
+
+    def test_reload_replays_journal(self):
+        """Test that reload() applies the journal over the JSON file"""
+        kept = State(name="Kept")
+        gone = State(name="Gone")
+        self.storage.new(kept)
+        self.storage.new(gone)
+        self.storage.compact()
+        kept.name = "Renamed"
+        self.storage.new(kept)
+        self.storage.delete(gone)
+        self.storage.save()
+        with open(self.path + ".log", "a") as f:
+            f.write('{"op": "upsert", "key": "State.torn"')
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(list(self.storage.all(State)), ["State." + kept.id])
+        self.assertEqual(self.storage.get(State, kept.id).name, "Renamed")
+
+    def test_compaction_folds_journal(self):
+        """Test that the journal is folded into file.json at the limit"""
+        for i in range(5):
+            self.storage.new(Amenity(name=str(i)))
+            self.storage.save()
+        self.assertFalse(os.path.exists(self.path + ".log"))
+        with open(self.path, "r") as f:
+            self.assertEqual(len(json.load(f)), 5)
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageDurability(TemporaryFileStorage):
+    """Test the crash safety of FileStorage writes"""
+
+    def test_failed_snapshot_keeps_previous_file(self):
+        """Test that a failing write leaves file.json and no temp file"""
+        self.storage.new(State(name="Saved"))
+        self.storage.compact()
+        with open(self.path, "r") as f:
+            before = f.read()
+        self.storage.new(State(name="Lost"))
+        with mock.patch("os.fsync", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.storage.compact()
+        with open(self.path, "r") as f:
+            self.assertEqual(f.read(), before)
+        self.assertEqual(os.listdir(self.tmp.name), ["file.json"])
+
+    def test_corrupt_snapshot_is_not_silently_emptied(self):
+        """Test that reload() refuses a file.json that does not parse"""
+        with open(self.path, "w") as f:
+            f.write('{"State.1": {"id": "1", "__cla')
+        with self.assertRaises(ValueError):
+            self.storage.reload()
+
+    def test_fsync_policy(self):
+        """Test that the fsync setting controls journal syncs"""
+        for policy, expected in (("always", 3), ("never", 0),
+                                 ("batched", 1)):
+            with self.subTest(policy=policy), \
+                    mock.patch.object(FileStorage, "fsync", policy), \
+                    mock.patch.object(FileStorage, "fsync_interval", 60), \
+                    mock.patch("os.fsync") as fsync:
+                FileStorage._FileStorage__journal_synced = -60
+                for i in range(3):
+                    self.storage.new(Amenity(name=str(i)))
+                    self.storage.save()
+                self.assertEqual(fsync.call_count, expected)
+
+    def test_batched_fsync_after_last_append(self):
+        """Test that the last batched appends are synced within the
+        interval even if nothing is appended after them"""
+        with mock.patch.object(FileStorage, "fsync", "batched"), \
+                mock.patch.object(FileStorage, "fsync_interval", 0.05), \
+                mock.patch("os.fsync") as fsync:
+            FileStorage._FileStorage__journal_synced = time.monotonic()
+            self.storage.new(Amenity(name="Last"))
+            self.storage.save()
+            self.assertEqual(fsync.call_count, 0)
+            deadline = time.monotonic() + 5
+            while fsync.call_count == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(fsync.call_count, 1)
+
+    def test_append_after_torn_record(self):
+        """Test that a record torn by a crash does not swallow the next"""
+        with open(self.path + ".log", "w") as f:
+            f.write('{"op": "delete", "ke')
+        state = State(name="After crash")
+        self.storage.new(state)
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertIn("State." + state.id, self.storage.all())
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageWriteBehind(TemporaryFileStorage):
+    """Test the write-behind mode of FileStorage"""
+
+    def setUp(self):
+        """Enable write-behind with a long coalescing interval"""
+        super().setUp()
+        self.patches += [
+            mock.patch.object(FileStorage, "journal", False),
+            mock.patch.object(FileStorage, "write_behind", True),
+            mock.patch.object(FileStorage, "flush_interval", 60),
+            mock.patch.object(FileStorage, "flush_batch", 3),
+        ]
+        for patch in self.patches[-4:]:
+            patch.start()
+
+    def tearDown(self):
+        """Flush what is left so no write outlives the test"""
+        self.storage.flush()
+        super().tearDown()
+
+    def wait_for_file(self):
+        """Wait for the flusher thread to write file.json"""
+        for i in range(200):
+            if os.path.exists(self.path):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_save_does_not_write(self):
+        """Test that save() leaves the write to the flusher"""
+        state = State(name="Pending")
+        self.storage.new(state)
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.path))
+        self.storage.flush()
+        with open(self.path, "r") as f:
+            self.assertIn("State." + state.id, json.load(f))
+
+    def test_batch_triggers_flush(self):
+        """Test that flush_batch pending changes are flushed early"""
+        for i in range(3):
+            self.storage.new(Amenity(name=str(i)))
+            self.storage.save()
+        self.assertTrue(self.wait_for_file())
+
+    def test_interval_triggers_flush(self):
+        """Test that a lone change is flushed after flush_interval"""
+        FileStorage.flush_interval = 0.05
+        self.storage.new(Amenity(name="Alone"))
+        self.storage.save()
+        self.assertTrue(self.wait_for_file())
+
+    def test_storage_usable_during_flush(self):
+        """Test that the storage lock is not held while writing files"""
+        writing = threading.Event()
+        release = threading.Event()
+        write = FileStorage._FileStorage__write_snapshot
+
+        def slow_write(storage, *args, **kwargs):
+            """writes once the test released the write"""
+            writing.set()
+            release.wait(5)
+            return write(storage, *args, **kwargs)
+
+        state = State(name="Flushed")
+        other = State(name="Added during the flush")
+        self.storage.new(state)
+        used = threading.Event()
+
+        def use():
+            """reads and writes the storage, then ends the request"""
+            self.storage.get(State, state.id)
+            self.storage.new(other)
+            self.storage.save()
+            self.storage.close()
+            used.set()
+
+        with mock.patch.object(FileStorage, "_FileStorage__write_snapshot",
+                               slow_write):
+            flusher = threading.Thread(target=self.storage.flush)
+            flusher.start()
+            self.assertTrue(writing.wait(5))
+            threading.Thread(target=use).start()
+            self.assertTrue(used.wait(5))
+            release.set()
+            flusher.join(5)
+        with open(self.path, "r") as f:
+            self.assertEqual(list(json.load(f)), ["State." + state.id])
+        self.assertIs(self.storage.get(State, other.id), other)
+        self.storage.flush()
+        with open(self.path, "r") as f:
+            self.assertIn("State." + other.id, json.load(f))
+
+    def test_failed_flush_retried(self):
+        """Test that a failed flush is logged and retried"""
+        FileStorage.flush_interval = 0.05
+        write = FileStorage._FileStorage__write_snapshot
+        calls = []
+
+        def failing_write(storage, *args, **kwargs):
+            """fails the first write"""
+            calls.append(1)
+            if len(calls) == 1:
+                raise OSError("disk full")
+            return write(storage, *args, **kwargs)
+
+        with mock.patch.object(FileStorage, "_FileStorage__write_snapshot",
+                               failing_write), \
+                self.assertLogs("models.engine.file_storage", "ERROR"):
+            self.storage.new(Amenity(name="Retried"))
+            self.storage.save()
+            self.assertTrue(self.wait_for_file())
+        self.assertEqual(len(calls), 2)
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageCodec(TemporaryFileStorage):
+    """Test the snapshot codecs of FileStorage"""
+
+    def test_reload_any_codec(self):
+        """Test that a snapshot loads whatever codec is configured"""
+        place = Place(name="Loft", number_rooms=2, amenity_ids=["x"])
+        self.storage.new(place)
+        with mock.patch.object(FileStorage, "codec", codecs["columnar"]):
+            self.storage.compact()
+        with open(self.path, "rb") as f:
+            self.assertTrue(f.read().startswith(ColumnarCodec.magic))
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        loaded = self.storage.get(Place, place.id)
+        self.assertIsNot(loaded, place)
+        self.assertEqual(loaded.to_dict(), place.to_dict())
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageLazy(TemporaryFileStorage):
+    """Test the lazy loading mode of FileStorage"""
+
+    def setUp(self):
+        """Save a small store then reload it lazily"""
+        super().setUp()
+        self.state = State(name="Nevada")
+        self.city = City(name="Reno", state_id=self.state.id)
+        self.amenity = Amenity(name="Wifi")
+        for obj in (self.state, self.city, self.amenity):
+            self.storage.new(obj)
+        self.storage.compact()
+        with open(self.path, "r") as f:
+            self.snapshot = json.load(f)
+        FileStorage._FileStorage__objects = {}
+        self.patches.append(mock.patch.object(FileStorage, "lazy", True))
+        self.patches[-1].start()
+        self.storage.reload()
+
+    def test_reload_builds_nothing(self):
+        """Test that reload() only counts the objects"""
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+        self.assertEqual(self.storage.count(), 3)
+        self.assertEqual(self.storage.count(City), 1)
+
+    def test_counts_build_nothing(self):
+        """Test that counts() counts the objects left to build"""
+        with mock.patch.object(FileStorage, "check_counts", True):
+            counts = self.storage.counts()
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+        self.assertEqual((counts["State"], counts["City"], counts["User"]),
+                         (1, 1, 0))
+
+    def test_objects_built_on_access(self):
+        """Test that get(), related() and all() build what they return"""
+        objects = FileStorage._FileStorage__objects
+        state = self.storage.get(State, self.state.id)
+        self.assertEqual(state.to_dict(), self.state.to_dict())
+        self.assertEqual(list(objects), ["State." + self.state.id])
+        self.assertIs(self.storage.get(State, self.state.id), state)
+        self.assertEqual([c.id for c in state.cities], [self.city.id])
+        self.assertEqual(len(objects), 2)
+        self.assertEqual(list(self.storage.all(Amenity)),
+                         ["Amenity." + self.amenity.id])
+        self.assertEqual(len(objects), 3)
+
+    def test_unbuilt_objects_saved_and_deleted(self):
+        """Test that compact() keeps and delete() drops unbuilt objects"""
+        self.storage.get(State, self.state.id)
+        self.storage.compact()
+        with open(self.path, "r") as f:
+            self.assertEqual(json.load(f), self.snapshot)
+        self.storage.delete(self.amenity)
+        self.assertEqual(self.storage.count(), 2)
+        self.assertIsNone(self.storage.get(Amenity, self.amenity.id))
+        self.assertEqual(len(self.storage.all()), 2)
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageMemoryMap(TemporaryFileStorage):
+    """Test the memory-mapped read path of FileStorage"""
+
+    def setUp(self):
+        """Save a small store as JSON lines then map it"""
+        super().setUp()
+        self.patches.append(
+            mock.patch.object(FileStorage, "memory_map", True))
+        self.patches[-1].start()
+        self.state = State(name="Nevada")
+        self.city = City(name="Reno", state_id=self.state.id)
+        self.amenity = Amenity(name="Wifi")
+        for obj in (self.state, self.city, self.amenity):
+            self.storage.new(obj)
+        self.storage.compact()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+
+    def tearDown(self):
+        """Drop the memory map before removing its file"""
+        FileStorage._FileStorage__objects = {}
+        self.storage.count()
+        super().tearDown()
+
+    def test_reads_from_map(self):
+        """Test that reads build objects without keeping them"""
+        self.assertTrue(os.path.exists(self.path + ".idx"))
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+        state = self.storage.get(State, self.state.id)
+        self.assertEqual(state.to_dict(), self.state.to_dict())
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+        self.assertEqual(self.storage.count(), 3)
+        self.assertEqual(list(self.storage.all(City)),
+                         ["City." + self.city.id])
+        self.assertEqual([c.id for c in state.cities], [self.city.id])
+
+    def test_changes_over_map(self):
+        """Test that new() and delete() shadow the mapped records"""
+        state = self.storage.get(State, self.state.id)
+        state.name = "Silver State"
+        self.storage.new(state)
+        self.assertEqual(self.storage.count(State), 1)
+        self.assertIs(self.storage.get(State, self.state.id), state)
+        self.storage.delete(self.amenity)
+        self.assertEqual(self.storage.count(), 2)
+        self.assertIsNone(self.storage.get(Amenity, self.amenity.id))
+        self.assertEqual(self.storage.all(Amenity), {})
+        self.storage.compact()
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+        self.assertEqual(self.storage.get(State, self.state.id).name,
+                         "Silver State")
+        self.assertEqual(self.storage.count(), 2)
+
+    def test_journal_replayed_over_map(self):
+        """Test that a reload replays the journal over the mapped records"""
+        self.storage.delete(self.amenity)
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.count(), 2)
+        self.assertIsNone(self.storage.get(Amenity, self.amenity.id))
+
+    def test_search_reviews_over_map(self):
+        """Test that the mapped reviews are searched by scanning them"""
+        review = Review(place_id="", user_id="", text="Quiet and clean")
+        self.storage.new(review)
+        self.storage.compact()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual([r.id for r in self.storage.search_reviews(
+            "QUIET")], [review.id])
+        self.assertEqual(self.storage.search_reviews(
+            "quiet", places=["other"]), [])
+
+    def test_counts_over_map(self):
+        """Test that counts() adds the changes to the mapped records"""
+        with mock.patch.object(FileStorage, "check_counts", True):
+            self.storage.new(self.storage.get(State, self.state.id))
+            self.storage.new(State(name="Utah"))
+            self.storage.delete(self.amenity)
+            counts = self.storage.counts()
+        self.assertEqual((counts["State"], counts["City"],
+                          counts["Amenity"]), (2, 1, 0))
+
+    def test_pages_over_map(self):
+        """Test that pages merge the mapped records with the changes"""
+        states = [State(name=str(i), created_at=datetime(2020, 1, i + 1))
+                  for i in range(4)]
+        for state in states:
+            self.storage.new(state)
+        self.storage.compact()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.storage.delete(self.storage.get(State, states[1].id))
+        changed = self.storage.get(State, states[2].id)
+        changed.name = "Changed"
+        self.storage.new(changed)
+        self.storage.new(State(name="New",
+                               created_at=datetime(2020, 1, 3, 12)))
+        names = []
+        after = None
+        with mock.patch.object(FileStorage, "all",
+                               side_effect=AssertionError("all() called")):
+            while True:
+                objs, after = self.storage.page(State, 2, after)
+                names += [state.name for state in objs]
+                if after is None:
+                    break
+        self.assertEqual(names, ["0", "Changed", "New", "3", "Nevada"])
+
+    def test_all_loads_everything(self):
+        """Test that all() builds the whole store"""
+        self.assertEqual(len(self.storage.all()), 3)
+        self.assertEqual(self.storage.count(), 3)
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageCounts(TemporaryFileStorage):
+    """Test the counts of the objects of every class"""
+
+    def setUp(self):
+        """Check every count against a scan of the store"""
+        super().setUp()
+        self.patches.append(
+            mock.patch.object(FileStorage, "check_counts", True))
+        self.patches[-1].start()
+
+    def test_counts(self):
+        """Test that new(), delete() and reload() update the counts"""
+        states = [State(name=str(i)) for i in range(3)]
+        for state in states:
+            self.storage.new(state)
+        self.storage.new(states[0])
+        self.storage.delete(states[1])
+        self.storage.delete(states[1])
+        counts = self.storage.counts()
+        self.assertEqual(set(counts), set(file_storage.classes))
+        self.assertEqual((counts["State"], counts["City"]), (2, 0))
+        self.assertEqual(sum(counts.values()), self.storage.count())
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(self.storage.counts()["State"], 0)
+        self.storage.reload()
+        self.assertEqual(self.storage.counts()["State"], 2)
+
+    def test_check_counts(self):
+        """Test that counts differing from the store are reported"""
+        self.storage.new(State(name="Nevada"))
+        FileStorage._FileStorage__by_class["State"]["State.missing"] = None
+        with self.assertRaises(RuntimeError):
+            self.storage.counts()
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageShards(TemporaryFileStorage):
+    """Test the sharded layout of FileStorage"""
+
+    def setUp(self):
+        """Split snapshots in 4 shards per class, without a journal"""
+        super().setUp()
+        self.patches += [mock.patch.object(FileStorage, "journal", False),
+                         mock.patch.object(FileStorage, "shards", 4)]
+        for patch in self.patches[-2:]:
+            patch.start()
+        self.states = [State(name="State {}".format(i)) for i in range(8)]
+        for state in self.states:
+            self.storage.new(state)
+        self.storage.save()
+
+    def tearDown(self):
+        """Forget the stale shards of the temporary store"""
+        FileStorage._FileStorage__stale = set()
+        FileStorage._FileStorage__obsolete = set()
+        super().tearDown()
+
+    def files(self):
+        """returns {file name: inode} of the temporary directory, but the
+        stamp of the shard files"""
+        return {name: os.stat(os.path.join(self.tmp.name, name)).st_ino
+                for name in os.listdir(self.tmp.name)
+                if name != "file.json.stamp"}
+
+    def test_one_file_per_shard(self):
+        """Test that objects are saved to the shard files of their class"""
+        files = self.files()
+        self.assertNotIn("file.json", files)
+        self.assertTrue(files)
+        self.assertTrue(set(files) <= {"file.State.{}.json".format(i)
+                                       for i in range(4)})
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.count(State), 8)
+        for state in self.states:
+            self.assertEqual(self.storage.get(State, state.id).name,
+                             state.name)
+
+    def test_save_rewrites_changed_shards(self):
+        """Test that a save leaves the shard files of other objects alone"""
+        before = self.files()
+        self.storage.new(Amenity(name="Wifi"))
+        self.storage.save()
+        after = self.files()
+        self.assertEqual(len(after), len(before) + 1)
+        for name, inode in before.items():
+            self.assertEqual(after[name], inode)
+        state = self.states[0]
+        state.name = "Renamed"
+        self.storage.new(state)
+        self.storage.save()
+        changed = [name for name, inode in self.files().items()
+                   if after[name] != inode]
+        self.assertEqual(len(changed), 1)
+
+    def test_empty_shard_removed(self):
+        """Test that a shard file is removed with its last object"""
+        for state in self.states:
+            self.storage.delete(state)
+        self.storage.save()
+        self.assertEqual(self.files(), {})
+
+    def test_lazy_reads_class_on_demand(self):
+        """Test that lazy reloads read the shard files of a class on use"""
+        self.storage.new(Amenity(name="Wifi"))
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        with mock.patch.object(FileStorage, "lazy", True):
+            self.storage.reload()
+            unread = FileStorage._FileStorage__unread
+            self.assertEqual(sorted(unread), ["Amenity", "State"])
+            self.assertEqual(self.storage.count(Amenity), 1)
+            self.assertEqual(sorted(unread), ["State"])
+            self.assertEqual(self.storage.get(State, self.states[0].id).name,
+                             "State 0")
+            self.assertEqual(unread, {})
+
+    def test_layout_change(self):
+        """Test that a store moves between single file and shard files"""
+        with mock.patch.object(FileStorage, "shards", 0):
+            FileStorage._FileStorage__objects = {}
+            self.storage.reload()
+            self.assertEqual(self.storage.count(State), 8)
+            self.storage.save()
+            self.assertEqual(list(self.files()), ["file.json"])
+            self.assertFalse(os.path.exists(self.path + ".stamp"))
+        with mock.patch.object(FileStorage, "shards", 1):
+            FileStorage._FileStorage__objects = {}
+            self.storage.reload()
+            self.storage.save()
+            self.assertEqual(list(self.files()), ["file.State.json"])
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.count(State), 8)
+
+    def test_unrelated_file_not_a_change(self):
+        """Test that other files next to the shard files change nothing"""
+        self.assertFalse(self.storage.changed_on_disk())
+        with open(os.path.join(self.tmp.name, "unrelated.log"), "w") as f:
+            f.write("unrelated")
+        self.assertFalse(self.storage.changed_on_disk())
+        self.storage.new(Amenity(name="Wifi"))
+        self.storage.save()
+        self.assertFalse(self.storage.changed_on_disk())
+
+    def test_close_keeps_pending_changes(self):
+        """Test that close() keeps the changes not flushed yet in
+        write-behind mode, whether it reloads or not"""
+        state = self.states[0]
+        with mock.patch.object(FileStorage, "write_behind", True), \
+                mock.patch.object(FileStorage, "flush_interval", 60), \
+                mock.patch.object(FileStorage, "flush_batch", 100):
+            state.name = "new"
+            self.storage.new(state)
+            self.storage.save()
+            with open(os.path.join(self.tmp.name, "unrelated.log"),
+                      "w") as f:
+                f.write("unrelated")
+            self.storage.close()
+            self.assertEqual(self.storage.get(State, state.id).name, "new")
+            self.assertIs(self.storage.get(State, self.states[1].id),
+                          self.states[1])
+            state.name = "newer"
+            self.storage.new(state)
+            self.storage.save()
+            with open(self.path + ".stamp", "w") as f:
+                f.write("written by another process")
+            self.storage.close()
+            self.assertIsNot(self.storage.get(State, self.states[1].id),
+                             self.states[1])
+            self.assertEqual(self.storage.get(State, state.id).name,
+                             "newer")
+            self.storage.flush()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.get(State, state.id).name, "newer")
+
+    def test_journal_marks_shards(self):
+        """Test that a journal replayed on reload reaches the shard files"""
+        with mock.patch.object(FileStorage, "journal", True):
+            self.storage.new(Amenity(name="Wifi"))
+            self.storage.save()
+            FileStorage._FileStorage__objects = {}
+            FileStorage._FileStorage__stale = set()
+            self.storage.reload()
+            self.storage.compact()
+        self.assertNotIn("file.json.log", self.files())
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.count(Amenity), 1)
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageShared(TemporaryFileStorage):
+    """Test FileStorage shared with other processes"""
+
+    def setUp(self):
+        """Share the temporary store, with one saved State"""
+        super().setUp()
+        self.patches += [
+            mock.patch.object(FileStorage, "shared", True),
+            mock.patch.object(FileStorage, "journal_limit", 1000),
+            mock.patch.object(FileStorage, "_FileStorage__generation", 0),
+            mock.patch.object(FileStorage, "_FileStorage__journal_pos", 0),
+            mock.patch.object(FileStorage, "_FileStorage__journal_ino", None),
+        ]
+        for patch in self.patches[-5:]:
+            patch.start()
+        self.state = State(name="Nevada")
+        self.storage.new(self.state)
+        self.storage.save()
+
+    def run_process(self, code, **env):
+        """runs code in another process sharing the temporary store"""
+        env = dict(os.environ, HBNB_FILE_SHARED="1", PYTHONPATH=os.getcwd(),
+                   **env)
+        env.pop("HBNB_TYPE_STORAGE", None)
+        subprocess.run([sys.executable, "-c", code], cwd=self.tmp.name,
+                       env=env, check=True, timeout=60)
+
+    def run_storage(self, code, **env):
+        """runs code using the models in another process"""
+        self.run_process("from models import storage\n"
+                         "from models.amenity import Amenity\n"
+                         "from models.state import State\n" + code, **env)
+
+    def test_sync_applies_journal(self):
+        """Test that sync() applies the records of another process"""
+        self.run_storage("Amenity(name='Wifi').save()\n"
+                         "storage.delete(storage.get(State, {!r}))\n"
+                         "storage.save()".format(self.state.id))
+        unsaved = State(name="Unsaved")
+        self.storage.new(unsaved)
+        self.storage.sync()
+        self.assertIsNone(self.storage.get(State, self.state.id))
+        self.assertEqual(
+            [a.name for a in self.storage.all(Amenity).values()], ["Wifi"])
+        self.assertIs(self.storage.get(State, unsaved.id), unsaved)
+        self.assertEqual(FileStorage._FileStorage__generation, 0)
+
+    def test_version_sees_other_writes(self):
+        """Test that version() counts the writes of another process"""
+        version = self.storage.version(Amenity)
+        self.run_storage("Amenity(name='Wifi').save()")
+        self.assertNotEqual(self.storage.version(Amenity), version)
+
+    def test_save_keeps_other_changes(self):
+        """Test that saves append to what other processes saved"""
+        self.run_storage("Amenity(name='Wifi').save()")
+        self.storage.new(Amenity(name="Pool"))
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(
+            sorted(a.name for a in self.storage.all(Amenity).values()),
+            ["Pool", "Wifi"])
+        self.assertEqual(self.storage.count(State), 1)
+
+    def test_compaction_caught_up(self):
+        """Test that a compaction of known records needs no reload"""
+        self.run_storage("storage.compact()")
+        self.storage.sync()
+        self.assertIs(self.storage.get(State, self.state.id), self.state)
+        self.assertEqual(FileStorage._FileStorage__generation, 1)
+        self.run_storage("Amenity(name='Wifi').save()")
+        self.storage.sync()
+        self.assertIs(self.storage.get(State, self.state.id), self.state)
+        self.assertEqual(self.storage.count(Amenity), 1)
+
+    def test_compaction_reloads(self):
+        """Test that a compaction of unknown records reloads the store"""
+        unsaved = State(name="Unsaved")
+        self.storage.new(unsaved)
+        self.run_storage("Amenity(name='Wifi').save()",
+                         HBNB_FILE_JOURNAL_LIMIT="1")
+        self.storage.sync()
+        self.assertEqual(FileStorage._FileStorage__generation, 1)
+        self.assertEqual(self.storage.count(Amenity), 1)
+        self.assertEqual(self.storage.get(State, self.state.id).name,
+                         "Nevada")
+        self.assertIs(self.storage.get(State, unsaved.id), unsaved)
+
+    def test_compaction_reusing_inode(self):
+        """Test that a journal of another generation is not tailed even if
+        it got the inode of the journal known"""
+        journal = self.storage._FileStorage__journal_path()
+        for code in ("storage.compact()\nstorage.compact()",
+                     "for i in range(5):\n    State(name=str(i)).save()"):
+            self.run_storage(code)
+            # as a file system reusing the inode of the replaced journal
+            FileStorage._FileStorage__journal_ino = os.stat(journal).st_ino
+            self.storage.sync()
+            self.assertEqual(FileStorage._FileStorage__generation, 2)
+        self.assertEqual(sorted(s.name for s in self.storage.all(
+            State).values()), ["0", "1", "2", "3", "4", "Nevada"])
+
+    def test_reload_keeps_changes_over_lazy_shards(self):
+        """Test that the changes not saved survive a reload leaving the
+        shard files to read"""
+        removed = State(name="Removed")
+        with mock.patch.object(FileStorage, "shards", 2), \
+                mock.patch.object(FileStorage, "lazy", True):
+            FileStorage._FileStorage__objects = {}
+            self.storage.reload()
+            self.storage.new(removed)
+            self.storage.compact()
+            FileStorage._FileStorage__objects = {}
+            self.storage.reload()
+            state = self.storage.get(State, self.state.id)
+            state.name = "Changed"
+            self.storage.new(state)
+            self.storage.delete(self.storage.get(State, removed.id))
+            self.run_storage("storage.compact()\nstorage.compact()",
+                             HBNB_FILE_SHARDS="2")
+            self.storage.sync()
+            self.assertEqual(self.storage.get(State, self.state.id).name,
+                             "Changed")
+            self.assertIsNone(self.storage.get(State, removed.id))
+
+    @unittest.skipIf(file_storage.fcntl is None, "no advisory locks")
+    def test_writes_locked(self):
+        """Test that writes hold the advisory lock of the store"""
+        check = ("import fcntl, os\n"
+                 "fd = os.open('file.json.lock', os.O_RDWR)\n"
+                 "fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)\n")
+        with self.storage._FileStorage__locked():
+            with self.assertRaises(subprocess.CalledProcessError):
+                self.run_process(check)
+        self.run_process(check)
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStoragePage(TemporaryFileStorage):
+    """Test reading FileStorage objects by pages"""
+
+    def setUp(self):
+        """Store a State of 7 cities created over 3 days, and another"""
+        super().setUp()
+        self.state = State(name="California")
+        self.other = State(name="Nevada")
+        self.cities = [City(name=str(i), state_id=self.state.id,
+                            created_at=datetime(2020, 1, 1 + i % 3))
+                       for i in range(7)]
+        for obj in [self.state, self.other] + self.cities:
+            self.storage.new(obj)
+
+    def pages(self, cls, limit, **filters):
+        """returns the ids of every page of cls"""
+        pages = []
+        after = None
+        while True:
+            objs, after = self.storage.page(cls, limit, after, **filters)
+            pages.append([obj.id for obj in objs])
+            if after is None:
+                return pages
+
+    def expected(self):
+        """returns the ids of the cities in page order"""
+        return [city.id for city in sorted(
+            self.cities, key=lambda city: (city.created_at, city.id))]
+
+    def test_pages(self):
+        """Test that pages follow (created_at, id) without overlap"""
+        pages = self.pages(City, 3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.expected())
+        self.assertEqual(self.pages("City", 7), [self.expected()])
+        self.assertEqual(self.pages(Amenity, 3), [[]])
+
+    def test_filtered_pages(self):
+        """Test pages of the objects with given attribute values"""
+        self.assertEqual(sum(self.pages(City, 2, state_id=self.state.id),
+                             []), self.expected())
+        self.assertEqual(self.pages(City, 2, state_id=self.other.id), [[]])
+        self.assertEqual(self.pages(City, 2, name="3"),
+                         [[self.cities[3].id]])
+
+    def test_changes_between_pages(self):
+        """Test that pages see the objects added and deleted meanwhile"""
+        expected = self.expected()
+        objs, after = self.storage.page(City, 2)
+        self.storage.delete(self.storage.get(City, expected[2]))
+        city = City(name="new", state_id=self.state.id)
+        self.storage.new(city)
+        objs, after = self.storage.page(City, 10, after)
+        self.assertEqual([obj.id for obj in objs], expected[3:] + [city.id])
+
+    def test_lazy_pages(self):
+        """Test pages of objects not built yet"""
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        with mock.patch.object(FileStorage, "lazy", True):
+            self.storage.reload()
+            self.assertEqual(sum(self.pages(City, 3), []), self.expected())
+
+    def test_iterate(self):
+        """Test that iterate yields every page in order"""
+        self.assertEqual([city.id for city in self.storage.iterate(
+            City, batch=2, state_id=self.state.id)], self.expected())
+        self.assertEqual(list(self.storage.iterate(Amenity)), [])
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageSearch(TemporaryFileStorage):
+    """Test searching places in FileStorage"""
+
+    def setUp(self):
+        """Store 2 states of 3 cities, and places in them with amenities"""
+        super().setUp()
+        self.states = [State(name=str(i)) for i in range(2)]
+        self.cities = [City(name=str(i), state_id=self.states[i % 2].id)
+                       for i in range(3)]
+        self.amenities = [Amenity(name=str(i)) for i in range(3)]
+        self.places = [Place(
+            name=str(i), city_id=self.cities[i % 3].id,
+            created_at=datetime(2020, 1, 12 - i),
+            amenity_ids=[a.id for a in self.amenities[:i % 4]],
+            price_by_night=i * 5 % 12 * 10, number_rooms=i % 5,
+            latitude=0.0, longitude=i * 1.5 - 6)
+            for i in range(12)]
+        for obj in self.states + self.cities + self.amenities + self.places:
+            self.storage.new(obj)
+
+    def search(self, states=(), cities=(), amenities=(), **kwargs):
+        """returns the names of the places found as numbers"""
+        return [int(place.name) for place in self.storage.search_places(
+            [self.states[i].id for i in states],
+            [self.cities[i].id for i in cities],
+            [self.amenities[i].id for i in amenities], **kwargs)]
+
+    def test_search(self):
+        """Test searching places by location and amenities"""
+        self.assertEqual(self.search(), list(range(11, -1, -1)))
+        self.assertEqual(self.search(states=[0]), [11, 9, 8, 6, 5, 3, 2, 0])
+        self.assertEqual(self.search(states=[1], cities=[2]),
+                         [11, 10, 8, 7, 5, 4, 2, 1])
+        self.assertEqual(self.search(amenities=[0, 1]), [11, 10, 7, 6, 3, 2])
+        self.assertEqual(self.search(cities=[0], amenities=[1, 2]), [3])
+        self.assertEqual(list(self.storage.search_places(
+            cities=["missing"])), [])
+        self.assertEqual(list(self.storage.search_places(
+            amenities=["missing"])), [])
+
+    def test_search_ranges(self):
+        """Test searching places by ranges of numeric attributes"""
+        # prices: 0 50 100 30 80 10 60 110 40 90 20 70 for places 0 to 11
+        # rooms: 0 1 2 3 4 0 1 2 3 4 0 1
+        self.assertEqual(self.search(ranges={"price_by_night": (30, 60)}),
+                         [8, 6, 3, 1])
+        self.assertEqual(self.search(ranges={"price_by_night": (None, 20),
+                                             "number_rooms": (0, 0)}),
+                         [10, 5, 0])
+        self.assertEqual(self.search(states=[0], ranges={
+            "number_rooms": (3, None)}), [9, 8, 3])
+        self.assertEqual(self.search(ranges={"max_guest": (1, None)}), [])
+
+    def test_search_order(self):
+        """Test ordering places, index walks and filters finding the same"""
+        self.assertEqual(self.search(order_by="price_by_night", limit=3),
+                         [0, 5, 10])
+        self.assertEqual(self.search(order_by="-price_by_night", limit=2),
+                         [7, 2])
+        self.assertEqual(self.search(states=[1], order_by="price_by_night"),
+                         [10, 1, 4, 7])
+        # walking the price index, as 1 * 12 prices < 4 * 4 places of 3
+        # and more rooms
+        self.assertEqual(self.search(
+            ranges={"number_rooms": (3, None)}, order_by="price_by_night",
+            limit=1), [3])
+        # filtering the places of 3 and more rooms
+        self.assertEqual(self.search(
+            ranges={"number_rooms": (3, None)}, order_by="price_by_night",
+            limit=3), [3, 8, 4])
+        # ties are ordered by id
+        self.assertEqual([i % 5 for i in self.search(
+            order_by="-number_rooms", limit=3)], [4, 4, 3])
+        self.assertEqual(self.search(limit=2), [11, 10])
+        self.assertEqual(self.search(amenities=[0], limit=2), [11, 10])
+
+    def test_search_geo(self):
+        """Test searching places in boxes and around points"""
+        # longitudes: -6 -4.5 -3 -1.5 0 1.5 3 4.5 6 7.5 9 10.5 on the
+        # equator, so 111 km apart per degree
+        self.assertEqual(self.search(bbox=(-1, -2, 1, 2)), [5, 4, 3])
+        self.assertEqual(self.search(bbox=(-1, -2, 1, 2),
+                                     order_by="price_by_night"), [5, 3, 4])
+        self.assertEqual(self.search(bbox=(1, -2, 2, 2)), [])
+        near = (0, 0.1, None)
+        self.assertEqual(self.search(near=near, limit=3), [4, 5, 3])
+        self.assertEqual(self.search(near=(0, 0.1, 200)), [4, 5, 3])
+        self.assertEqual(self.search(states=[0], near=near),
+                         [5, 3, 6, 2, 8, 0, 9, 11])
+        self.assertEqual(self.search(amenities=[0], near=near, limit=2),
+                         [5, 3])
+        self.assertEqual(self.search(near=(60, 0.1, None), limit=2), [4, 5])
+        self.assertEqual(self.search(bbox=(-1, 2, 1, 8), near=near,
+                                     limit=2), [6, 7])
+
+    def test_search_geo_antimeridian(self):
+        """Test searching places across the antimeridian and moved ones"""
+        places = [Place(name=str(i), city_id=self.cities[0].id,
+                        latitude=0.0, longitude=longitude)
+                  for i, longitude in ((12, 179.5), (13, -179.5))]
+        for place in places:
+            self.storage.new(place)
+        self.assertEqual(sorted(self.search(bbox=(-1, 179, 1, -179))),
+                         [12, 13])
+        self.assertEqual(sorted(self.search(near=(0, 180, 100))), [12, 13])
+        self.assertEqual(sorted(self.search(near=(0, 180, None),
+                                            limit=2)), [12, 13])
+        self.places[4].latitude = 50.0
+        self.places[4].save()
+        places[1].latitude = None
+        places[1].save()
+        self.assertEqual(self.search(near=(0, 0.1, None), limit=1), [5])
+        self.assertEqual(self.search(near=(0, 180, 100)), [12])
+
+    def test_search_text(self):
+        """Test searching places by words of their description"""
+        for i, description in enumerate(["Sea view, quiet street",
+                                         "sea VIEW sea view sea",
+                                         "Quiet house",
+                                         "View of the mountains"]):
+            self.places[i].description = description
+            self.places[i].save()
+        self.assertEqual(self.search(text="sea view"), [1, 0])
+        self.assertEqual(self.search(text="Quiet"), [2, 0])
+        self.assertEqual(self.search(text="view", limit=1), [1])
+        self.assertEqual(self.search(text="view", order_by="price_by_night"),
+                         [0, 3, 1])
+        self.assertEqual(sorted(self.search(states=[0], text="view")),
+                         [0, 3])
+        self.assertEqual(self.search(text="castle"), [])
+        self.assertEqual(len(self.search(text="!")), 12)
+        # a change not saved yet is not indexed but still filtered
+        self.places[2].description = "noisy"
+        self.assertEqual(self.search(text="quiet"), [0])
+
+    def test_place_facets(self):
+        """Test counting the places found by state, city and amenity"""
+        def facets(**kwargs):
+            """returns the facets of the search as lists of numbers"""
+            counts = self.storage.place_facets(**kwargs)
+            return [[counts[facet].get(obj.id, 0) for obj in objs]
+                    for facet, objs in (("states", self.states),
+                                        ("cities", self.cities),
+                                        ("amenities", self.amenities))]
+        self.assertEqual(facets(), [[8, 4], [4, 4, 4], [9, 6, 3]])
+        self.assertEqual(facets(amenities=[self.amenities[1].id]),
+                         [[4, 2], [2, 2, 2], [6, 6, 3]])
+        # places 3, 4 and 5
+        self.assertEqual(facets(bbox=(-1, -2, 1, 2)),
+                         [[2, 1], [1, 1, 1], [2, 1, 1]])
+        self.assertEqual(facets(near=(0, 0.1, 200)),
+                         [[2, 1], [1, 1, 1], [2, 1, 1]])
+        self.assertEqual(facets(near=(0, 0.1, None)),
+                         [[8, 4], [4, 4, 4], [9, 6, 3]])
+        self.assertEqual(self.storage.place_facets(text="castle"),
+                         {"states": {}, "cities": {}, "amenities": {}})
+
+    def test_version(self):
+        """Test that writes bump the version of their class and reloads
+        change the epoch"""
+        epoch, number, last = self.storage.version(Place)
+        self.assertEqual(self.storage.version("Place"), (epoch, number, last))
+        self.places[0].save()
+        self.assertEqual(self.storage.version(Place)[:2], (epoch, number + 1))
+        self.assertGreaterEqual(self.storage.version(Place)[2], last)
+        city = self.storage.version(City)
+        self.storage.delete(self.places[1])
+        self.storage.delete(self.places[1])
+        self.assertEqual(self.storage.version(Place)[:2], (epoch, number + 2))
+        self.assertEqual(self.storage.version(City), city)
+        self.assertEqual(self.storage.versions([Place, "City"]),
+                         [self.storage.version(Place), city])
+        self.storage.save()
+        self.storage.reload()
+        self.assertNotEqual(self.storage.version(Place)[0], epoch)
+
+    def test_search_reviews(self):
+        """Test searching reviews by words of their text"""
+        reviews = [Review(place_id=self.places[i % 2].id, user_id=str(i),
+                          text=text)
+                   for i, text in enumerate(["Quiet and clean",
+                                             "Not quiet at all",
+                                             "quiet, QUIET",
+                                             "Clean"])]
+        for review in reviews:
+            self.storage.new(review)
+
+        def search(text, **kwargs):
+            """returns the numbers of the reviews found"""
+            return [reviews.index(review) for review in
+                    self.storage.search_reviews(text, **kwargs)]
+        self.assertEqual(search("quiet"), [2, 0, 1])
+        self.assertEqual(search("quiet", limit=1), [2])
+        self.assertEqual(search("clean quiet"), [0])
+        self.assertEqual(search("quiet", places=[self.places[1].id]), [1])
+        self.assertEqual(search("quiet", users=["0", "1"]), [0, 1])
+        self.assertEqual(search(""), [])
+        self.storage.delete(reviews[2])
+        self.assertEqual(search("quiet"), [0, 1])
+
+    def test_search_changes(self):
+        """Test that searches see the places changed, added and deleted"""
+        self.places[3].amenity_ids = []
+        self.places[3].save()
+        self.storage.delete(self.places[7])
+        place = Place(name="12", city_id=self.cities[0].id,
+                      amenity_ids=[self.amenities[2].id])
+        self.storage.new(place)
+        self.assertEqual(self.search(amenities=[2]), [11, 12])
+        # a change not saved yet is not indexed but still filtered
+        self.places[11].amenity_ids = []
+        self.assertEqual(self.search(amenities=[2]), [12])
+        self.places[0].price_by_night = 1000
+        self.places[0].save()
+        self.assertEqual(self.search(order_by="price_by_night", limit=2),
+                         [12, 5])
+
+    def test_search_lazy(self):
+        """Test searching places not built yet"""
+        self.places[5].description = "Quiet"
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        with mock.patch.object(FileStorage, "lazy", True):
+            self.storage.reload()
+            self.assertEqual(self.search(cities=[0], amenities=[1, 2]), [3])
+            self.assertEqual(self.search(amenities=[0, 1, 2]), [11, 7, 3])
+            self.assertEqual(self.search(near=(0, 0.1, None), limit=3),
+                             [4, 5, 3])
+            self.assertEqual(self.search(text="quiet"), [5])
+
+    def test_indexes_built_on_first_use(self):
+        """Test that reload leaves the search indexes to the first search"""
+        self.places[5].description = "Quiet"
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        with mock.patch.object(FileStorage, "lazy", True):
+            self.storage.reload()
+            for attr in ("bitsets", "sorted", "geo", "texts"):
+                self.assertEqual(
+                    getattr(FileStorage, "_FileStorage__" + attr), {})
+            self.assertEqual(self.search(text="quiet"), [5])
+            self.assertEqual(list(FileStorage._FileStorage__texts),
+                             ["Place"])
+            self.assertEqual(FileStorage._FileStorage__geo, {})
+            place = Place(name="12", description="quiet")
+            self.storage.new(place)
+            self.assertEqual(sorted(self.search(text="quiet")), [5, 12])
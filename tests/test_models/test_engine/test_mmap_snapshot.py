@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+"""
+Contains the tests of the MappedSnapshot class
+"""
+
+import inspect
+from models.engine import mmap_snapshot
+from models.engine.codec import codecs
+from models.engine.mmap_snapshot import MappedSnapshot, write_index
+import os
+import pep8
+import tempfile
+import unittest
+
+
+class TestMappedSnapshotDocs(unittest.TestCase):
+    """Tests to check the documentation and style of mmap_snapshot"""
+
+    def test_pep8_conformance_mmap_snapshot(self):
+        """Test that models/engine/mmap_snapshot.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/mmap_snapshot.py',
+                                    'tests/test_models/test_engine/'
+                                    'test_mmap_snapshot.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_mmap_snapshot_docstrings(self):
+        """Test for the presence of docstrings in mmap_snapshot"""
+        self.assertTrue(len(mmap_snapshot.__doc__) >= 1)
+        for func in inspect.getmembers(MappedSnapshot, inspect.isfunction):
+            self.assertTrue(len(func[1].__doc__) >= 1, func[0])
+
+
+class TestMappedSnapshot(unittest.TestCase):
+    """Test reading records through MappedSnapshot"""
+
+    def setUp(self):
+        """Write a JSON lines snapshot of a few hundred records"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+        self.records = {}
+        for name, count in (("Amenity", 3), ("Place", 300), ("State", 1)):
+            for i in range(count):
+                key = "{}.{}".format(name, i)
+                self.records[key] = {"id": str(i), "__class__": name,
+                                     "name": "{} {}".format(name, i)}
+        with open(self.path, "wb") as f:
+            f.write(codecs["jsonl"].encode(self.records))
+        self.snapshot = MappedSnapshot(self.path)
+
+    def tearDown(self):
+        """Unmap and remove the snapshot"""
+        self.snapshot.close()
+        self.tmp.cleanup()
+
+    def test_get(self):
+        """Test that every record is found by key, and only those"""
+        for key, attrs in self.records.items():
+            self.assertEqual(self.snapshot.get(key), attrs)
+        self.assertIsNone(self.snapshot.get("Place.300"))
+        self.assertIsNone(self.snapshot.get("City.0"))
+        self.assertTrue(self.snapshot.has("State.0"))
+        self.assertFalse(self.snapshot.has("State.1"))
+
+    def test_classes(self):
+        """Test the count and records of each class"""
+        self.assertEqual(sorted(self.snapshot.names()),
+                         ["Amenity", "Place", "State"])
+        self.assertEqual(self.snapshot.count(), 304)
+        self.assertEqual(self.snapshot.count("Place"), 300)
+        self.assertEqual(self.snapshot.count("City"), 0)
+        self.assertEqual(dict(self.snapshot.items("Amenity")),
+                         {key: attrs for key, attrs in self.records.items()
+                          if attrs["__class__"] == "Amenity"})
+        self.assertEqual(list(self.snapshot.items("City")), [])
+
+    def test_stale_index_rebuilt(self):
+        """Test that an index older than its snapshot is rebuilt"""
+        self.snapshot.close()
+        del self.records["Place.7"]
+        with open(self.path, "wb") as f:
+            f.write(codecs["jsonl"].encode(self.records))
+        self.snapshot = MappedSnapshot(self.path)
+        self.assertIsNone(self.snapshot.get("Place.7"))
+        self.assertEqual(self.snapshot.count("Place"), 299)
+
+    def test_not_json_lines(self):
+        """Test that other snapshots are refused"""
+        with open(self.path, "wb") as f:
+            f.write(codecs["json"].encode(self.records))
+        with self.assertRaises(ValueError):
+            write_index(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,252 @@
+#!/usr/bin/python3
+"""
+Contains the tests of the search indexes
+"""
+
+import inspect
+from models.engine import search
+from models.engine.search import Bitsets, GeoGrid, SortedIndex, TextIndex
+import pep8
+import unittest
+
+
+class TestSearchDocs(unittest.TestCase):
+    """Tests to check the documentation and style of search"""
+
+    def test_pep8_conformance_search(self):
+        """Test that models/engine/search.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/search.py',
+                                    'tests/test_models/test_engine/'
+                                    'test_search.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_search_docstrings(self):
+        """Test for the presence of docstrings in search"""
+        self.assertTrue(len(search.__doc__) >= 1)
+        for cls in (Bitsets, SortedIndex, GeoGrid, TextIndex):
+            for func in inspect.getmembers(cls, inspect.isfunction):
+                self.assertTrue(len(func[1].__doc__) >= 1, func[0])
+
+
+class TestBitsets(unittest.TestCase):
+    """Test finding keys by values through Bitsets"""
+
+    def setUp(self):
+        """Index 20 keys under the values dividing their number"""
+        self.bitsets = Bitsets()
+        for i in range(1, 21):
+            self.bitsets.add("Place.{}".format(i),
+                             [d for d in (2, 3, 5) if i % d == 0])
+
+    def keys(self, *values):
+        """returns the sorted numbers of the keys holding all values"""
+        bitsets = self.bitsets
+        return sorted(int(key.split(".")[1])
+                      for key in bitsets.keys(bitsets.match(values)))
+
+    def test_match(self):
+        """Test that match intersects the keys of every value"""
+        self.assertEqual(self.keys(2), [2, 4, 6, 8, 10, 12, 14, 16, 18, 20])
+        self.assertEqual(self.keys(2, 3), [6, 12, 18])
+        self.assertEqual(self.keys(2, 3, 5), [])
+        self.assertEqual(self.keys(7), [])
+        self.assertEqual(self.keys(5, 5), [5, 10, 15, 20])
+
+    def test_has(self):
+        """Test that has tests the bit of a key"""
+        bitset = self.bitsets.match([3])
+        self.assertTrue(self.bitsets.has(bitset, "Place.9"))
+        self.assertFalse(self.bitsets.has(bitset, "Place.10"))
+        self.assertFalse(self.bitsets.has(bitset, "Place.1"))
+        self.assertFalse(self.bitsets.has(bitset, "Place.21"))
+
+    def test_counts(self):
+        """Test that counts counts the keys of a bitset holding each
+        value"""
+        bitset = self.bitsets.bitset(["Place.{}".format(i)
+                                      for i in range(1, 11)] +
+                                     ["Place.missing"])
+        self.assertEqual(self.bitsets.counts(bitset), {2: 5, 3: 3, 5: 2})
+        self.assertEqual(self.bitsets.counts(self.bitsets.bitset(
+            ["Place.1", "Place.7"])), {})
+        self.assertEqual(self.bitsets.counts(self.bitsets.match([2, 3])),
+                         {2: 3, 3: 3})
+
+    def test_add_remove(self):
+        """Test that keys are reindexed, removed and their slots reused"""
+        self.bitsets.add("Place.6", [5])
+        self.bitsets.remove("Place.10")
+        self.bitsets.remove("Place.missing")
+        self.assertEqual(self.keys(2, 3), [12, 18])
+        self.assertEqual(self.keys(5), [5, 6, 15, 20])
+        self.bitsets.add("Place.30", [2, 3, 5])
+        self.assertEqual(self.keys(2, 3, 5), [30])
+        self.bitsets.add("Place.30", [])
+        self.assertEqual(self.keys(2, 3, 5), [])
+
+
+class TestSortedIndex(unittest.TestCase):
+    """Test finding keys by ranges of values through SortedIndex"""
+
+    def setUp(self):
+        """Index 10 keys under their number modulo 4"""
+        self.index = SortedIndex()
+        for i in range(10):
+            self.index.add("Place.{}".format(i), i % 4)
+
+    def keys(self, low=None, high=None, reverse=False):
+        """returns the numbers of the keys between low and high"""
+        return [int(key.split(".")[1])
+                for key in self.index.keys(low, high, reverse)]
+
+    def test_keys(self):
+        """Test that keys are listed by value then key within bounds"""
+        self.assertEqual(self.keys(), [0, 4, 8, 1, 5, 9, 2, 6, 3, 7])
+        self.assertEqual(self.keys(1, 2), [1, 5, 9, 2, 6])
+        self.assertEqual(self.keys(2.5), [3, 7])
+        self.assertEqual(self.keys(high=0), [0, 4, 8])
+        self.assertEqual(self.keys(3, 1), [])
+        self.assertEqual(self.keys(1, 2, reverse=True), [6, 2, 9, 5, 1])
+
+    def test_count(self):
+        """Test that count counts the keys within bounds"""
+        self.assertEqual(self.index.count(), 10)
+        self.assertEqual(self.index.count(1, 2), 5)
+        self.assertEqual(self.index.count(4), 0)
+
+    def test_add_remove(self):
+        """Test that keys are reindexed and removed, and non numbers not
+        indexed"""
+        self.index.add("Place.0", 3.5)
+        self.index.remove("Place.3")
+        self.index.remove("Place.missing")
+        self.index.add("Place.1", "1")
+        self.index.add("Place.5", None)
+        self.index.add("Place.9", True)
+        self.assertEqual(self.keys(3), [7, 0])
+        self.assertEqual(self.keys(high=1), [4, 8])
+        self.assertEqual(len(self.index), 6)
+
+
+class TestDistances(unittest.TestCase):
+    """Test the distance functions"""
+
+    def test_haversine(self):
+        """Test distances along the equator, a meridian and to antipodes"""
+        distances = search.haversine(0, 0, [0, 1, 0, 0], [0, 0, 1, 180])
+        for distance, expected in zip(distances, [0, 111.195, 111.195,
+                                                  search.MAX_DISTANCE]):
+            self.assertAlmostEqual(distance, expected, 3)
+        self.assertAlmostEqual(search.haversine(0, 179.5, [0], [-179.5])[0],
+                               111.195, 3)
+        self.assertEqual(search.haversine(0, 0, [], []), [])
+
+    def test_bounding_box(self):
+        """Test boxes around points, across the antimeridian and a pole"""
+        south, west, north, east = search.bounding_box(0, 0, 111.195)
+        for value, expected in zip((south, west, north, east),
+                                   (-1, -1, 1, 1)):
+            self.assertAlmostEqual(value, expected, 3)
+        south, west, north, east = search.bounding_box(0, 179.5, 111.195)
+        self.assertAlmostEqual(west, 178.5, 3)
+        self.assertAlmostEqual(east, -179.5, 3)
+        self.assertTrue(search.in_box((south, west, north, east), 0, 180))
+        self.assertFalse(search.in_box((south, west, north, east), 0, 0))
+        self.assertEqual(search.bounding_box(89.5, 0, 111.195)[1:],
+                         (-180, 90, 180))
+
+
+class TestGeoGrid(unittest.TestCase):
+    """Test finding keys by location through GeoGrid"""
+
+    def setUp(self):
+        """Index 10 keys on the equator, 1 degree of longitude apart"""
+        self.grid = GeoGrid()
+        for i in range(10):
+            self.grid.add("Place.{}".format(i), 0.0, i - 5.0)
+
+    def test_within(self):
+        """Test that within lists the keys in a box"""
+        self.assertEqual(sorted(self.grid.within(-1, -1.5, 1, 1.5)),
+                         ["Place.4", "Place.5", "Place.6"])
+        self.assertEqual(self.grid.within(0.5, -5, 1, 5), [])
+        self.assertEqual(len(self.grid.within(-90, -180, 90, 180)), 10)
+        self.assertEqual(sorted(self.grid.within(-1, 3.5, 1, -4.5)),
+                         ["Place.0", "Place.9"])
+
+    def test_around(self):
+        """Test that around lists the keys within a radius with their
+        distances"""
+        found = sorted(self.grid.around(0, 0.25, 120))
+        self.assertEqual([key for _, key in found], ["Place.5", "Place.6"])
+        self.assertAlmostEqual(found[0][0], 27.799, 3)
+        self.assertEqual(len(self.grid.around(0, 0, search.MAX_DISTANCE)),
+                         10)
+
+    def test_add_remove(self):
+        """Test that keys are moved and removed, and invalid points not
+        indexed"""
+        self.grid.add("Place.0", 0.0, 179.9)
+        self.grid.remove("Place.5")
+        self.grid.remove("Place.missing")
+        self.grid.add("Place.1", None, 0.0)
+        self.grid.add("Place.2", 91.0, 0.0)
+        self.grid.add("Place.3", 0.0, "1")
+        self.assertEqual(len(self.grid), 6)
+        self.assertEqual([key for _, key in self.grid.around(0, -179.9, 50)],
+                         ["Place.0"])
+        self.assertEqual(sorted(self.grid.within(-1, -5, 1, 0)),
+                         ["Place.4"])
+
+
+class TestTextIndex(unittest.TestCase):
+    """Test finding and ranking keys by words through TextIndex"""
+
+    def setUp(self):
+        """Index 4 texts"""
+        self.index = TextIndex()
+        self.index.add("Place.0", "Sea view, quiet street")
+        self.index.add("Place.1", "sea VIEW sea view sea")
+        self.index.add("Place.2", "Quiet house")
+        self.index.add("Place.3", "View of the mountains")
+
+    def ranked(self, *words):
+        """returns the numbers of the keys holding all words, by score
+        then key"""
+        scores = self.index.scores(words)
+        return [int(key.split(".")[1]) for key in sorted(
+            scores, key=lambda key: (-scores[key], key))]
+
+    def test_tokenize(self):
+        """Test that texts are split in lowercase words"""
+        self.assertEqual(search.tokenize("Sea-view, 2 rooms!"),
+                         ["sea", "view", "2", "rooms"])
+        self.assertEqual(search.tokenize(None), [])
+
+    def test_scores(self):
+        """Test that texts holding all words are ranked by BM25"""
+        # more occurrences rank higher
+        self.assertEqual(self.ranked("sea", "view"), [1, 0])
+        # shorter texts rank higher
+        self.assertEqual(self.ranked("quiet"), [2, 0])
+        self.assertEqual(self.ranked("view", "view"), [1, 0, 3])
+        self.assertEqual(self.ranked("sea", "house"), [])
+        self.assertEqual(self.ranked("castle"), [])
+        self.assertEqual(self.ranked(), [])
+        scores = self.index.scores(["quiet", "street"])
+        # the rarer word adds to the score of the only text holding it
+        self.assertGreater(scores["Place.0"],
+                           self.index.scores(["quiet"])["Place.2"])
+
+    def test_add_remove(self):
+        """Test that texts are reindexed and removed"""
+        self.index.add("Place.1", "a quiet place")
+        self.index.remove("Place.2")
+        self.index.remove("Place.missing")
+        self.index.add("Place.3", None)
+        self.assertEqual(self.ranked("quiet"), [1, 0])
+        self.assertEqual(self.ranked("view"), [0])
+        self.assertEqual(self.ranked("house"), [])
+        self.assertEqual(len(self.index), 2)
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+"""
+Contains the tests of the Versions class
+"""
+
+import inspect
+from models.engine import versions
+from models.engine.versions import Versions
+import pep8
+import unittest
+
+
+class TestVersionsDocs(unittest.TestCase):
+    """Tests to check the documentation and style of Versions"""
+
+    def test_pep8_conformance_versions(self):
+        """Test that models/engine/versions.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/versions.py',
+                                    'tests/test_models/test_engine/'
+                                    'test_versions.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_versions_docstrings(self):
+        """Test for the presence of docstrings in Versions"""
+        self.assertTrue(len(versions.__doc__) >= 1)
+        self.assertTrue(len(Versions.__doc__) >= 1)
+        for func in inspect.getmembers(Versions, inspect.isfunction):
+            self.assertTrue(len(func[1].__doc__) >= 1, func[0])
+
+
+class TestVersions(unittest.TestCase):
+    """Test counting the writes to each class"""
+
+    def test_bump(self):
+        """Test that writes are counted per class with their time"""
+        versions = Versions()
+        epoch, number, last = versions.get("State")
+        self.assertEqual((epoch, number, last),
+                         (versions.epoch, 0, versions.started))
+        versions.bump(["State", "City", "State"])
+        versions.bump(["State"])
+        epoch, number, last = versions.get("State")
+        self.assertEqual(number, 2)
+        self.assertGreaterEqual(last, versions.started)
+        self.assertEqual(versions.get("City")[1], 1)
+        self.assertEqual(versions.get("Place")[1], 0)
+
+    def test_listeners(self):
+        """Test that listeners are told the classes of every write"""
+        written = []
+        Versions.listeners.append(written.append)
+        try:
+            Versions().bump(["State", "City", "State"])
+        finally:
+            Versions.listeners.remove(written.append)
+        self.assertEqual(written, [{"State", "City"}])
+
+    def test_epoch(self):
+        """Test that every start has its own epoch"""
+        self.assertNotEqual(Versions().epoch, Versions().epoch)